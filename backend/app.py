@@ -1,28 +1,55 @@
 import os
-from flask import Flask, render_template, request, Response, redirect, url_for, jsonify
+from flask import Flask, render_template, request, Response, redirect, url_for, jsonify, stream_with_context, g
 from dotenv import load_dotenv
 from flask_cors import CORS
 import socket
 import threading
-import subprocess
-import platform
-import requests
-import json
 import time
-import websocket
 import paramiko
-from flask import Flask, request, jsonify
 import queue
+import uuid
 #from execution import run_multi_map_navigation_no_tts  # Import this function (see below)
 from execution import run_multi_map_navigation_with_charging
 
 from execution import emergency_exit_event, trigger_emergency_exit
+from execution import forget_loaded_map, forget_last_arrival, get_navigation_metrics
+from robot_session import get_session
+from event_bus import event_bus, format_sse
+from telemetry import get_collector
+from discovery import discovery_cache, find_robot, scan_networks, validate_robot_ip
+from wifi_check2 import get_robot_wifi_info
+from network_info import network_info
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Family, registry
+from waypoint_cache import waypoint_cache
+from mission_journal import mission_journal, resume_position
+from map_registry import fetch_map_list, map_registry
+from engine_control import engine_control
+from robot_logging import get_logger
 
 load_dotenv()
+log = get_logger("app")
 
 app = Flask(__name__)
 CORS(app)
 
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Flask request latency by route", ["route", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get("request_started")
+    if started is not None:
+        # The route pattern, not the path, so /api/robot/jobs/<job_id> stays one series
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method, status=response.status_code)
+    return response
+
 @app.after_request
 def add_no_cache_headers(response):
     """Prevent client/proxy caching so refreshed status reflects current network."""
@@ -52,18 +79,20 @@ device_ip = None
 
 navigation_paused = False
 
-# Discovery guard and robot websocket signature
+# Serializes network scans so concurrent requests do not sweep the subnet twice
 discovery_lock = threading.Lock()
-KNOWN_ROBOT_CMDS = {
-    "notify_heart_beat",
-    "notify_battery_info",
-    "notify_emr_status",
-    "notify_robot_status",
-    "response_set_map",
-    "response_map_list",
-    "notify_map_list",
-    "response_get_map_list"
+
+# Network state behind /api/robot/status, refreshed in the background rather than per request
+STATUS_REFRESH_INTERVAL = int(os.getenv("STATUS_REFRESH_INTERVAL", "60"))  # Seconds between background checks
+ROBOT_WIFI_TTL = int(os.getenv("ROBOT_WIFI_TTL", "3600"))  # Seconds before the robot's WiFi name is probed again
+network_state = {
+    'robot_wifi_name': None,
+    'robot_checked_at': None,
+    'robot_checked_network': None,  # (robot ip, device WiFi, device ip) the WiFi name was probed for
+    'refreshing': False
 }
+network_state_lock = threading.Lock()
+status_refresher_thread = None
 
 # Navigation manager globals
 navigation_queue = queue.Queue()
@@ -77,154 +106,32 @@ navigation_status = {
     'error': None,
     'completed': False
 }
-# Thread-safe navigation control
+# Mission jobs submitted through /api/robot/execute, consumed one at a time by navigation_thread
+navigation_jobs = {}
+navigation_jobs_lock = threading.Lock()
+current_job_id = None
+JOB_HISTORY_LIMIT = 50  # Finished jobs kept for inspection
+# Thread-safe navigation control; 'paused' is the engine's own pause flag, so
+# /api/robot/stop and /api/robot/resume wake the engine immediately
 navigation_control = {
     #'force_stop': threading.Event(),
     #'quit': threading.Event(),
-    'paused': threading.Event()
+    'paused': engine_control.paused
 }
 
-def get_device_wifi_info():
-    """Get current device's WiFi name and IP address"""
+def get_device_wifi_info(force=False):
+    """Get current device's WiFi name and IP address (cached; see network_info)"""
     global device_wifi_name, device_ip
-    # Reset cached values to avoid showing stale network names
-    device_wifi_name = None
-    device_ip = None
-    
-    try:
-        # Get local IP address
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        device_ip = s.getsockname()[0]
-        s.close()
-        print(f"🔍 Device IP detected: {device_ip}")
-        
-        # Get WiFi name based on operating system
-        system = platform.system()
-        print(f"🔍 Operating System: {system}")
-        
-        if system == "Windows":
-            # Method 1: Try netsh wlan show interfaces (more reliable)
-            try:
-                result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'], 
-                                      capture_output=True, text=True, encoding='utf-8')
-                print(f"🔍 Netsh command output:")
-                print(result.stdout)
-                
-                if result.returncode == 0:
-                    lines = result.stdout.split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        # Look for SSID line (not BSSID)
-                        if line.startswith('SSID') and 'BSSID' not in line and ':' in line:
-    # Only pick the SSID line, not Signal or other lines
-                            device_wifi_name = line.split(':', 1)[1].strip()
-                            print(f"✅ WiFi name found: {device_wifi_name}")
-                            break
-                        # Alternative pattern
-                        elif 'Profile' in line and ':' in line:
-                            potential_name = line.split(':', 1)[1].strip()
-                            if potential_name and potential_name != "":
-                                device_wifi_name = potential_name
-                                print(f"✅ WiFi profile found: {device_wifi_name}")
-                                print(f"SSID parsed: '{device_wifi_name}'")
-                                break
-            except Exception as e:
-                print(f"⚠️ Method 1 failed: {e}")
-            
-            # Method 2: If method 1 failed, try PowerShell
-            if not device_wifi_name:
-                try:
-                    ps_command = 'Get-NetConnectionProfile | Where-Object {$_.NetworkCategory -ne "DomainAuthenticated"} | Select-Object -First 1 -ExpandProperty Name'
-                    result = subprocess.run(['powershell', '-Command', ps_command], 
-                                          capture_output=True, text=True, encoding='utf-8')
-                    if result.returncode == 0 and result.stdout.strip():
-                        # Use the full line as SSID; do not split to keep spaces in SSID
-                        device_wifi_name = result.stdout.strip()
-                        print(f"✅ WiFi name found via PowerShell: {device_wifi_name}")
-                except Exception as e:
-                    print(f"⚠️ Method 2 failed: {e}")
-            
-            # Method 3: Try another netsh approach
-            if not device_wifi_name:
-                try:
-                    result = subprocess.run(['netsh', 'wlan', 'show', 'profile'], 
-                                          capture_output=True, text=True, encoding='utf-8')
-                    if result.returncode == 0:
-                        # Get the connected profile by checking interfaces again
-                        interface_result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'], 
-                                                        capture_output=True, text=True, encoding='utf-8')
-                        for line in interface_result.stdout.split('\n'):
-                            if 'State' in line and 'connected' in line.lower():
-                                # Found connected interface, now get its SSID
-                                for ssid_line in interface_result.stdout.split('\n'):
-                                    if 'SSID' in ssid_line and 'BSSID' not in ssid_line:
-                                        parts = ssid_line.split(':', 1)
-                                        if len(parts) > 1:
-                                            device_wifi_name = parts[1].strip()
-                                            print(f"✅ WiFi name found via method 3: {device_wifi_name}")
-                                            break
-                                break
-                except Exception as e:
-                    print(f"⚠️ Method 3 failed: {e}")
-        
-        elif system == "Darwin":  # macOS
-            try:
-                result = subprocess.run(['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-I'], 
-                                      capture_output=True, text=True)
-                for line in result.stdout.split('\n'):
-                    if ' SSID:' in line:
-                        device_wifi_name = line.split(':')[1].strip()
-                        break
-            except:
-                # Alternative for macOS
-                try:
-                    result = subprocess.run(['networksetup', '-getairportnetwork', 'en0'], 
-                                          capture_output=True, text=True)
-                    if 'Current Wi-Fi Network:' in result.stdout:
-                        device_wifi_name = result.stdout.split('Current Wi-Fi Network:')[1].strip()
-                except:
-                    pass
-        
-        elif system == "Linux":
-            # Try multiple methods for Linux
-            methods = [
-                ['iwgetid', '-r'],
-                ['nmcli', '-t', '-f', 'active,ssid', 'dev', 'wifi'],
-                ['iwconfig']
-            ]
-            
-            for method in methods:
-                try:
-                    result = subprocess.run(method, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        if method[0] == 'iwgetid':
-                            device_wifi_name = result.stdout.strip()
-                            break
-                        elif method[0] == 'nmcli':
-                            for line in result.stdout.split('\n'):
-                                if line.startswith('yes:'):
-                                    device_wifi_name = line.split(':')[1]
-                                    break
-                        elif method[0] == 'iwconfig':
-                            for line in result.stdout.split('\n'):
-                                if 'ESSID:' in line:
-                                    device_wifi_name = line.split('ESSID:"')[1].split('"')[0]
-                                    break
-                    if device_wifi_name:
-                        break
-                except:
-                    continue
-                
-    except Exception as e:
-        print(f"❌ Error getting device info: {e}")
-        import traceback
-        traceback.print_exc()
+    info = network_info.get(force=force)
+    device_wifi_name = info["wifi_name"]
+    device_ip = info["ip"]
+    return info
+
 found_port = None
 
 def test_robot_connection(robot_ip):
     """Test various connection methods to the robot"""
-    print(f"🔍 Testing robot connection methods for {robot_ip}...")
+    log.info(f"🔍 Testing robot connection methods for {robot_ip}...")
     
     # Test common ports
     common_ports = [5000, 8080, 80, 443, 3000, 8000, 9090, 22, 23]
@@ -235,131 +142,139 @@ def test_robot_connection(robot_ip):
             sock = socket.create_connection((robot_ip, port), timeout=1)
             sock.close()
             open_ports.append(port)
-            print(f"   ✅ Port {port} is open")
+            log.info(f"   ✅ Port {port} is open")
         except:
             pass
     
     if open_ports:
-        print(f"   Open ports found: {open_ports}")
+        log.info(f"   Open ports found: {open_ports}")
     else:
-        print("   No common ports found open")
+        log.info("   No common ports found open")
     
     return open_ports
 
 def set_navigation_status(**kwargs):
     global navigation_status
     navigation_status.update(kwargs)
+    event_bus.publish("navigation_status", kwargs, merge=True)
 
-def validate_robot_ip(ip, ws_port=5000, handshake_timeout=2.0, listen_timeout=2.0):
-    """Validate that the given IP belongs to the robot by performing a WebSocket handshake and
-    checking for expected messages. Returns True if validated, False otherwise."""
-    try:
-        ws = websocket.create_connection(f"ws://{ip}:{ws_port}", timeout=handshake_timeout)
-        ws.settimeout(listen_timeout)
-        try:
-            ws.send(json.dumps({"cmd": "request_heart_beat"}))
-        except Exception:
-            pass
-        start_time = time.time()
-        while time.time() - start_time < listen_timeout:
-            try:
-                res = ws.recv()
-                data = json.loads(res)
-                cmd = data.get("cmd")
-                if cmd and cmd in KNOWN_ROBOT_CMDS:
-                    ws.close()
-                    return True
-                # Some firmware replies with a generic structure but valid data
-                if cmd and isinstance(data.get("data", {}), dict):
-                    ws.close()
-                    return True
-            except Exception:
-                continue
-        ws.close()
-        return False
-    except Exception:
-        return False
+# Default max_age (seconds) of telemetry served without asking the robot
+BATTERY_MAX_AGE = 30
+EMERGENCY_MAX_AGE = 5
 
-def get_robot_wifi_info(robot_ip):
-    """Enhanced robot WiFi information retrieval"""
-    print(f"🔍 Attempting to get WiFi info from robot at {robot_ip}...")
-    
-    # First, test what ports are available
-    open_ports = test_robot_connection(robot_ip)
-    
-    # Try HTTP endpoints on discovered ports (restrict to expected WS/http bridge port only)
-    http_ports = [port for port in open_ports if port in [5000]]
-    if not http_ports:
-        http_ports = [5000]  # Default fallback
-    
-    # Common API endpoints to try
-    api_endpoints = [
-        "/api/network",
-        "/api/wifi",
-        "/api/status",
-        "/network-info",
-        "/wifi-info", 
-        "/status",
-        "/info",
-        "/config",
-        "/system/info",
-        "/v1/network",
-        "/v1/status"
-    ]
-    
-    for port in http_ports:
-        print(f"   🔍 Trying port {port}...")
-        for endpoint in api_endpoints:
-            try:
-                url = f"http://{robot_ip}:{port}{endpoint}"
-                print(f"      Testing: {url}")
-                response = requests.get(url, timeout=2)
-                print(f"      Status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        print(f"      Response: {json.dumps(data, indent=2)[:200]}...")
-                        
-                        # Try to extract WiFi info from response
-                        ssid = (data.get('wifi_ssid') or 
-                               data.get('ssid') or 
-                               data.get('network_name') or
-                               data.get('network', {}).get('ssid') if isinstance(data.get('network'), dict) else None)
-                        
-                        ip = (data.get('wifi_ip') or 
-                             data.get('ip') or 
-                             data.get('local_ip') or
-                             data.get('network', {}).get('ip') if isinstance(data.get('network'), dict) else None)
-                        
-                        if ssid:
-                            print(f"      ✅ Found WiFi SSID: {ssid}")
-                            return ssid, ip or robot_ip
-                            
-                    except json.JSONDecodeError:
-                        # Ignore non-JSON responses to avoid false positives like Express welcome pages
-                        print("      ⚠️ Non-JSON HTTP 200 response ignored")
-                        continue
-            except requests.exceptions.RequestException as e:
-                print(f"      ❌ Request failed: {e}")
-                continue
-            except Exception as e:
-                print(f"      ❌ Unexpected error: {e}")
+def ensure_telemetry_collector():
+    """Start the in-memory telemetry collector for the discovered robot (it also feeds /api/robot/events)"""
+    if not found_ip:
+        return None
+    return get_collector(found_ip, found_port or ROBOT_PORT)
+
+def job_summary(job):
+    return {key: value for key, value in job.items() if key not in ("result", "resume")}
+
+def update_job(job_id, **kwargs):
+    with navigation_jobs_lock:
+        job = navigation_jobs.get(job_id)
+        if job is not None:
+            job.update(kwargs)
+        return job
+
+def prune_finished_jobs():
+    """Drop the oldest finished jobs beyond JOB_HISTORY_LIMIT (caller holds navigation_jobs_lock)"""
+    finished = [job for job in navigation_jobs.values() if job["status"] in ("completed", "failed", "cancelled")]
+    finished.sort(key=lambda job: job["created_at"])
+    for job in finished[:max(len(finished) - JOB_HISTORY_LIMIT, 0)]:
+        del navigation_jobs[job["id"]]
+
+def submit_navigation_job(robot_ip, port, stitched_map_ids, charge_map_id, resume=None):
+    """Queue a mission for the executor thread and return its job record.
+
+    resume is a journaled mission's state; the job then continues that mission
+    (same mission id) from its last completed leg.
+    """
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        "id": job_id,
+        "mission_id": resume["mission_id"] if resume else job_id,
+        "resume": resume,
+        "status": "queued",
+        "robot_ip": robot_ip,
+        "port": port,
+        "stitched_map_ids": list(stitched_map_ids),
+        "charge_map_id": charge_map_id,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "message": None,
+        "result": None
+    }
+    with navigation_jobs_lock:
+        prune_finished_jobs()
+        navigation_jobs[job["id"]] = job
+    navigation_queue.put(job["id"])
+    ensure_navigation_worker()
+    return job
+
+def ensure_navigation_worker():
+    global navigation_thread
+    with navigation_jobs_lock:
+        if navigation_thread is None or not navigation_thread.is_alive():
+            navigation_thread = threading.Thread(target=navigation_worker, name="navigation-executor", daemon=True)
+            navigation_thread.start()
+
+def navigation_worker():
+    """Run queued missions one after another; the robot can only follow one at a time"""
+    global current_job_id
+    import execution
+    while True:
+        job_id = navigation_queue.get()
+        with navigation_jobs_lock:
+            job = navigation_jobs.get(job_id)
+            if job is None or job["status"] != "queued":
                 continue
-    
-    # Try simple TCP connection to get basic info
-    try:
-        print(f"   🔍 Trying simple TCP connection...")
-        sock = socket.create_connection((robot_ip, 5000), timeout=2)
-        sock.send(b"GET /info HTTP/1.1\r\nHost: " + robot_ip.encode() + b"\r\r")
-        response = sock.recv(1024).decode('utf-8', errors='ignore')
-        sock.close()
-        if response:
-            print(f"      Raw response: {response[:200]}...")
-    except Exception as e:
-        print(f"      TCP connection failed: {e}")
-    
-    return None, robot_ip
+            job.update(status="running", started_at=time.time())
+            current_job_id = job_id
+        log.info(f"🚀 [JOBS] Starting mission {job_id} with maps {job['stitched_map_ids']}")
+        execution.reset_navigation_events()
+        set_navigation_status(active=True, paused=False, stopped=False, error=None, completed=False, job_id=job_id)
+        try:
+            result = run_multi_map_navigation_with_charging(
+                job["robot_ip"], job["stitched_map_ids"], job["charge_map_id"], job["port"],
+                navigation_status=navigation_status,
+                navigation_control=navigation_control,
+                mission_id=job["mission_id"],
+                resume=job["resume"]
+            ) or {}
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        with navigation_jobs_lock:
+            current_job_id = None
+            if job["status"] == "cancelling":
+                status = "cancelled"
+            else:
+                status = "completed" if result.get("success") else "failed"
+            job.update(status=status, finished_at=time.time(), result=result,
+                       message=result.get("message", "Navigation completed" if result.get("success") else "Navigation failed"))
+        set_navigation_status(active=False, completed=status == "completed",
+                              error=None if status == "completed" else job["message"])
+        log.info(f"🏁 [JOBS] Mission {job_id} {status}: {job['message']}")
+
+def cancel_navigation_job(job_id):
+    """Cancel a queued job outright, or ask the engine to quit a running one"""
+    import execution
+    with navigation_jobs_lock:
+        job = navigation_jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == "queued":
+            job.update(status="cancelled", finished_at=time.time(), message="Cancelled before start")
+        elif job["status"] == "running":
+            job["status"] = "cancelling"
+        else:
+            return job
+        running = job_id == current_job_id
+    if running:
+        execution.quit_navigation()
+    return job
 
 def check_same_network(device_ip, robot_ip):
     """Check if both devices are likely on the same network"""
@@ -367,28 +282,12 @@ def check_same_network(device_ip, robot_ip):
     robot_subnet = '.'.join(robot_ip.split('.')[:-1])
     
     if device_subnet == robot_subnet:
-        print(f"✅ NETWORK MATCH: Both devices are on subnet {device_subnet}.x")
+        log.info(f"✅ NETWORK MATCH: Both devices are on subnet {device_subnet}.x")
         return True
     else:
-        print(f"⚠️ SUBNET MISMATCH: Device on {device_subnet}.x, Robot on {robot_subnet}.x")
+        log.warning(f"⚠️ SUBNET MISMATCH: Device on {device_subnet}.x, Robot on {robot_subnet}.x")
         return False
 
-def check_ip(ip):
-    global found_ip
-    try:
-        s = socket.create_connection((ip, ROBOT_PORT), timeout=0.5)
-        s.close()
-        # Only mark as found if IP validates as robot via WebSocket
-        if validate_robot_ip(ip, ws_port=ROBOT_PORT):
-            with discovery_lock:
-                if not found_ip:
-                    print(f"✅ Robot validated at {ip}")
-                    found_ip = ip
-        else:
-            print(f"⚠️ Skipping {ip}: open port but not a robot")
-    except:
-        pass
-
 @app.route("/")
 def home():
     return "Hello, Flask!"
@@ -396,12 +295,11 @@ def home():
 @app.route("/api/login", methods=["POST"])
 def login():
     data = request.get_json()
-    print(data)
     email = data.get("email")
     password = data.get("password")
 
     if email == env_username and password == env_password:
-        print('cvbbcvb')
+        log.info(f"🔑 [AUTH] Login succeeded for {email}")
         return jsonify({"success": True, "message": "Login successful"})
     else:
         return jsonify({"success": False, "message": "Invalid credentials"})
@@ -410,9 +308,9 @@ def login():
 
 @app.route("/api/network/status", methods=["GET"])
 def get_network_status():
-    """Get current device network status"""
+    """Get current device network status (cached; ?refresh=1 re-probes the interfaces)"""
     try:
-        get_device_wifi_info()
+        info = get_device_wifi_info(force=request_flag("refresh"))
         
         if device_wifi_name and device_ip:
             return jsonify({
@@ -420,6 +318,7 @@ def get_network_status():
                 "connected": True,
                 "network_name": device_wifi_name,
                 "device_ip": device_ip,
+                "age": info["age"],
                 "message": "Successfully connected to network"
             })
         else:
@@ -428,6 +327,7 @@ def get_network_status():
                 "connected": False,
                 "network_name": None,
                 "device_ip": device_ip,
+                "age": info["age"],
                 "message": "Not connected to any network"
             })
     except Exception as e:
@@ -439,37 +339,44 @@ def get_network_status():
             "message": f"Error getting network status: {str(e)}"
         })
 
+def ensure_robot_found(force_scan=False, known=True):
+    """Return the robot IP from memory, the discovery cache, or (last resort) a network scan.
+
+    known=False skips the in-memory found_ip so the cached address gets its TTL check.
+    """
+    global found_ip, found_port
+    if known and found_ip and not force_scan:
+        return found_ip
+    
+    def networks():
+        get_device_wifi_info()
+        return scan_networks(device_ip)
+    
+    with discovery_lock:
+        ip, port, source = discovery_cache.resolve(networks, ROBOT_PORT, force_scan=force_scan)
+        if ip:
+            found_ip, found_port = ip, port
+            log.info(f"✅ Robot at {ip}:{port} ({source})")
+        else:
+            found_ip = None
+    return found_ip
+
+@app.route("/api/robot/discovery_cache", methods=["GET"])
+def api_robot_discovery_cache():
+    return jsonify({"success": True, **discovery_cache.stats()})
+
 @app.route("/api/robot/discover", methods=["GET"])
 def discover_robot():
     """Discover robot on the network"""
-    global found_ip
+    global found_ip, found_port
     
     try:
-        # Reset found_ip
-        found_ip = None
-        
         # Get device info first
-        # ...existing code...
         get_device_wifi_info()
 
-        # Dynamically determine subnet prefix from device_ip
-        if device_ip:
-            subnet_prefix = '.'.join(device_ip.split('.')[:3]) + '.'
-        else:
-            subnet_prefix = "192.168.0."  # fallback
-
-        # Scan for robot
-        print("🔍 Scanning for robot on port 5000 with validation...")
-        threads = []
-        for i in range(1, 255):
-            ip = f"{subnet_prefix}{i}"
-            t = threading.Thread(target=check_ip, args=(ip,))
-            threads.append(t)
-            t.start()
-        # ...existing code...
-        
-        for t in threads:
-            t.join()
+        # Cached robot address first; ?refresh=1 forces a sweep of the configured CIDRs
+        force_scan = request_flag("refresh")
+        ensure_robot_found(force_scan=force_scan, known=False)
         
         if found_ip:
             # Check if they're on the same subnet
@@ -479,7 +386,8 @@ def discover_robot():
             
             # Get robot WiFi information
             robot_wifi_name, robot_ip = get_robot_wifi_info(found_ip)
-            found_port = 5000  # validated port
+            found_port = found_port or ROBOT_PORT  # validated port
+            remember_robot_wifi(found_ip, robot_wifi_name)
 
             return jsonify({
                 "success": True,
@@ -518,6 +426,37 @@ def discover_robot():
             "message": f"Error discovering robot: {str(e)}"
         })
 
+@app.route("/api/robot/discover/stream", methods=["GET"])
+def discover_robot_stream():
+    """Run a discovery sweep and stream every responsive host as Server-Sent Events"""
+    results = queue.Queue()
+    
+    def sweep():
+        global found_ip, found_port
+        get_device_wifi_info()
+        networks = scan_networks(device_ip)
+        results.put(("scan", {"networks": [str(network) for network in networks], "port": ROBOT_PORT}))
+        with discovery_lock:
+            ip = find_robot(networks, ROBOT_PORT, first=[found_ip], on_result=lambda result: results.put(("host", result)))
+            if ip:
+                found_ip, found_port = ip, ROBOT_PORT
+                discovery_cache.remember(ip, ROBOT_PORT)
+        results.put(("done", {"robot_found": bool(ip), "robot_ip": ip}))
+        results.put(None)
+    
+    threading.Thread(target=sweep, name="discovery-stream", daemon=True).start()
+    
+    def stream():
+        event_id = 0
+        while True:
+            item = results.get()
+            if item is None:
+                return
+            event_id += 1
+            yield format_sse(event_id, *item)
+    
+    return Response(stream_with_context(stream()), mimetype="text/event-stream", headers={"X-Accel-Buffering": "no"})
+
 @app.route("/api/robot/upcoming_map", methods=["GET"])
 def api_robot_upcoming_map():
     try:
@@ -535,6 +474,24 @@ def api_robot_upcoming_map():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
+@app.route("/api/robot/telemetry", methods=["GET"])
+def api_robot_telemetry():
+    """Latest battery, emergency, pose and heartbeat values with their ages, straight from memory"""
+    collector = ensure_telemetry_collector()
+    if collector is None:
+        return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
+    return jsonify({"success": True, **collector.snapshot()})
+
+@app.route("/api/robot/events", methods=["GET"])
+def api_robot_events():
+    """Server-Sent Events stream of battery, emergency, map tracking and navigation_status changes"""
+    ensure_telemetry_collector()
+    return Response(
+        stream_with_context(event_bus.stream(on_idle=ensure_telemetry_collector)),
+        mimetype="text/event-stream",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
 @app.route("/api/robot/current_map", methods=["GET"])
 def api_robot_current_map():
     try:
@@ -560,23 +517,16 @@ def api_robot_current_map():
 @app.route("/api/robot/refresh_maps_cache", methods=["POST"])
 def api_robot_refresh_maps_cache():
     try:
-        import execution
         global found_ip
         
-        if not found_ip:
-            discover_robot()
-            robot_ip = found_ip
-        else:
-            robot_ip = found_ip
+        robot_ip = ensure_robot_found()
             
         if not robot_ip:
             return jsonify({"success": False, "message": "Robot not found"})
         
-        # Get fresh maps from robot
+        # Get fresh maps from robot (get_robot_maps updates the map registry)
         maps_result = get_robot_maps(robot_ip)
         if maps_result.get("success") and maps_result.get("maps"):
-            # Update the cache in execution module
-            execution.update_robot_maps_cache(maps_result["maps"])
             return jsonify({
                 "success": True, 
                 "message": f"Maps cache refreshed with {len(maps_result['maps'])} maps",
@@ -588,6 +538,57 @@ def api_robot_refresh_maps_cache():
         return jsonify({"success": False, "message": str(e)})
     
 
+def collect_app_metrics():
+    jobs = Family("robot_navigation_jobs", "gauge", "Mission jobs by status")
+    with navigation_jobs_lock:
+        statuses = [job["status"] for job in navigation_jobs.values()]
+    for status in ("queued", "running", "completed", "failed", "cancelled"):
+        jobs.add(statuses.count(status), status=status)
+    subscribers = Family("robot_event_stream_clients", "gauge", "Connected /api/robot/events clients")
+    subscribers.add(event_bus.subscriber_count)
+    cache = Family("robot_waypoint_cache_events_total", "counter", "Waypoint cache lookups and refreshes")
+    stats = waypoint_cache.stats()
+    for event in ("hits", "misses", "refreshes", "refresh_failures"):
+        cache.add(stats[event], event=event)
+    cached_maps = Family("robot_waypoint_cache_maps", "gauge", "Maps with cached points")
+    cached_maps.add(len(stats["maps"]))
+    known_maps = Family("robot_map_registry_maps", "gauge", "Robot maps known to the map registry")
+    known_maps.add(map_registry.stats()["maps"])
+    probes = Family("device_network_probes_total", "counter", "Device network info probes")
+    probes.add(network_info.probes)
+    return [jobs, subscribers, cache, cached_maps, known_maps, probes]
+
+registry.add_collector(collect_app_metrics)
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of the backend, engine and robot session metrics"""
+    return Response(registry.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/api/robot/navigation_metrics", methods=["GET"])
+def api_robot_navigation_metrics():
+    return jsonify({"success": True, **get_navigation_metrics()})
+
+@app.route("/api/robot/navigation_metrics/reset", methods=["POST"])
+def api_robot_navigation_metrics_reset():
+    """Start the phase timing histograms afresh, e.g. before measuring a change"""
+    from phase_timing import phase_timings
+    phase_timings.reset()
+    return jsonify({"success": True, "message": "Phase timings reset"})
+
+@app.route("/api/robot/waypoint_cache", methods=["GET"])
+def api_robot_waypoint_cache():
+    from waypoint_cache import waypoint_cache
+    return jsonify({"success": True, **waypoint_cache.stats()})
+
+@app.route("/api/robot/waypoint_cache/invalidate", methods=["POST"])
+def api_robot_waypoint_cache_invalidate():
+    """Drop cached points for one map (JSON body {"map_id": ...}) or for every map"""
+    from waypoint_cache import waypoint_cache
+    data = request.get_json(silent=True) or {}
+    removed = waypoint_cache.invalidate(data.get("map_id"))
+    return jsonify({"success": True, "message": f"Invalidated {removed} cached map(s)", "invalidated": removed})
+
 @app.route("/api/robot/quit", methods=["POST"])
 def api_robot_quit():
     try:
@@ -598,10 +599,11 @@ def api_robot_quit():
         # Clear stitchedMapIds list (if stored globally)
         global stitched_map_ids
         stitched_map_ids = []
-        # Also clear navigation queue if used
-        if 'navigation_queue' in globals():
-            while not navigation_queue.empty():
-                navigation_queue.get()
+        # Cancel every queued or running mission
+        with navigation_jobs_lock:
+            pending_ids = [job_id for job_id, job in navigation_jobs.items() if job["status"] in ("queued", "running")]
+        for job_id in pending_ids:
+            cancel_navigation_job(job_id)
         # Optionally reset navigation status
         set_navigation_status(active=False, paused=False, stopped=True, error="Navigation quit by user", completed=False, current_map=None, step=None)
         return jsonify({"success": True, "message": "Quit command sent, navigation cancelled, stitchedMapIds cleared"})
@@ -613,25 +615,22 @@ def api_robot_quit():
 def api_robot_undock():
     global found_ip, found_port
     if not found_ip:
-        discover_robot()
+        ensure_robot_found()
     if not found_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
     if not found_port:
         found_port = 5000
     try:
-        ws = websocket.create_connection(f"ws://{found_ip}:{found_port}")
         # Send undock command (as per your API spec)
-        ws.send(json.dumps({"cmd": "request_cancel_charge"}))
-        start_time = time.time()
-        success = False
-        while time.time() - start_time < 30:
-            res = ws.recv()
-            print("✅✅✅Undock response:", res)
-            data = json.loads(res)
-            if data.get("cmd") == "response_dock_ctrl" and data.get("code") == 0:
-                success = True
-                break
-        ws.close()
+        forget_last_arrival()
+        data = get_session(found_ip, found_port).request(
+            "request_cancel_charge",
+            expect="response_dock_ctrl",
+            match=lambda d: d.get("code") == 0,
+            timeout=30
+        )
+        log.info(f"✅ [UNDOCK] Undock response: {data}")
+        success = data is not None
         if success:
             return jsonify({"success": True, "message": "Robot undocked from charging pile."})
         else:
@@ -652,13 +651,13 @@ def api_robot_stop():
 def api_robot_auto_charge():
     global found_ip, found_port
     if not found_ip:
-        discover_robot()
+        ensure_robot_found()
     if not found_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
     if not found_port:
         found_port = 5000
     try:
-        ws = websocket.create_connection(f"ws://{found_ip}:{found_port}")
+        session = get_session(found_ip, found_port)
         # Set map (use your CHARGE_POINT map id, or get from request)
         MAP_ID = "be6e76e5-3612-4eb7-89ee-6bc09f222634"
         CHARGE_POINT = {
@@ -666,53 +665,29 @@ def api_robot_auto_charge():
             "y": -0.017879863624663088,
             "theta": -0.016518184324892632
         }
-        # Set map
-        ws.send(json.dumps({"cmd": "request_set_map", "data": {"mapId": MAP_ID}}))
-        while True:
-            res = ws.recv()
-            data = json.loads(res)
-            if data.get("cmd") == "response_set_map" and data.get("code") == 1000:
-                break
+        # Set map (outside the navigation engine, so its loaded-map record is no longer valid)
+        forget_loaded_map()
+        if not session.request("request_set_map", {"mapId": MAP_ID}, expect="response_set_map",
+                               match=lambda d: d.get("code") == 1000, timeout=60):
+            return jsonify({"success": False, "message": "Robot did not confirm the charge map."})
         # Get current location
-        ws.send(json.dumps({"cmd": "request_heart_beat"}))
-        location = None
-        start_time = time.time()
-        while time.time() - start_time < 10:
-            res = ws.recv()
-            data = json.loads(res)
-            if data.get("cmd") == "notify_heart_beat" and "x" in data.get("data", {}):
-                location = data["data"]
-                break
+        data = session.request("request_heart_beat", expect="notify_heart_beat",
+                               match=lambda d: "x" in d.get("data", {}), timeout=10)
+        location = data["data"] if data else None
         if not location:
-            ws.close()
             return jsonify({"success": False, "message": "Could not get current location."})
         # Force relocate
-        ws.send(json.dumps({
-            "cmd": "request_force_relocate",
-            "data": {"x": location["x"], "y": location["y"], "theta": location["theta"], "mode": 0}
-        }))
-        while True:
-            res = ws.recv()
-            data = json.loads(res)
-            if data.get("cmd") == "response_relocate_position" and data.get("code") == 0:
-                break
+        if not session.request("request_force_relocate",
+                               {"x": location["x"], "y": location["y"], "theta": location["theta"], "mode": 0},
+                               expect="response_relocate_position",
+                               match=lambda d: d.get("code") == 0, timeout=30):
+            return jsonify({"success": False, "message": "Relocation at the charge map failed."})
         # Dock charge
-        ws.send(json.dumps({
-            "cmd": "request_dock_charge",
-            "data": {"mapId": MAP_ID, "x": CHARGE_POINT["x"], "y": CHARGE_POINT["y"], "theta": CHARGE_POINT["theta"]}
-        }))
-        docked = False
-        start_time = time.time()
-        while time.time() - start_time < 90:
-            res = ws.recv()
-            data = json.loads(res)
-            if data.get("cmd") == "response_dock_ctrl":
-                if data.get("code") == 0:
-                    docked = True
-                    break
-                elif data.get("code") == 6016:
-                    break
-        ws.close()
+        data = session.request("request_dock_charge",
+                               {"mapId": MAP_ID, "x": CHARGE_POINT["x"], "y": CHARGE_POINT["y"], "theta": CHARGE_POINT["theta"]},
+                               expect="response_dock_ctrl",
+                               match=lambda d: d.get("code") in [0, 6016], timeout=90)
+        docked = bool(data) and data.get("code") == 0
         if docked:
             return jsonify({"success": True, "message": "Robot is charging."})
         else:
@@ -729,55 +704,107 @@ def api_robot_resume():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
+def remember_robot_wifi(robot_ip, robot_wifi_name):
+    with network_state_lock:
+        network_state.update(robot_wifi_name=robot_wifi_name, robot_checked_at=time.time(),
+                             robot_checked_network=(robot_ip, device_wifi_name, device_ip))
+
+def robot_wifi_is_current(robot_ip):
+    """True while the cached robot WiFi name was probed for this robot and device network within ROBOT_WIFI_TTL"""
+    with network_state_lock:
+        checked_at = network_state['robot_checked_at']
+        checked_network = network_state['robot_checked_network']
+    return (checked_at is not None and time.time() - checked_at < ROBOT_WIFI_TTL
+            and checked_network == (robot_ip, device_wifi_name, device_ip))
+
+def refresh_network_state(force_scan=False, force_device=False, force_probe=False):
+    """Refresh the cached network state behind /api/robot/status.
+
+    The device and discovery lookups are cached and cheap; the robot WiFi
+    probe (HTTP endpoints on several ports) only runs when force_probe is set
+    or the cached name is stale or was probed for another robot or network.
+    """
+    with network_state_lock:
+        if network_state['refreshing']:
+            return False
+        network_state['refreshing'] = True
+    try:
+        get_device_wifi_info(force=force_device)
+        robot_ip = ensure_robot_found(force_scan=force_scan, known=False)
+        if force_probe or not robot_wifi_is_current(robot_ip):
+            remember_robot_wifi(robot_ip, get_robot_wifi_info(robot_ip)[0] if robot_ip else None)
+        return True
+    except Exception as e:
+        log.warning(f"⚠️ [STATUS] Network refresh failed: {e}")
+        return False
+    finally:
+        with network_state_lock:
+            network_state['refreshing'] = False
+
+def status_refresher():
+    while True:
+        time.sleep(STATUS_REFRESH_INTERVAL)
+        refresh_network_state()
+
+def ensure_status_refresher():
+    global status_refresher_thread
+    if status_refresher_thread is None or not status_refresher_thread.is_alive():
+        status_refresher_thread = threading.Thread(target=status_refresher, name="status-refresher", daemon=True)
+        status_refresher_thread.start()
+
+def build_robot_status():
+    """Assemble status from cached network state and the live robot session, without probing anything"""
+    now = time.time()
+    device = get_device_wifi_info()
+    with network_state_lock:
+        state = dict(network_state)
+    robot_ip, robot_port = found_ip, found_port or ROBOT_PORT
+    robot_wifi_name = state['robot_wifi_name'] if robot_ip else None
+    same_network = check_same_network(device_ip, robot_ip) if device_ip and robot_ip else False
+
+    session_info = {"connected": False, "connected_since": None}
+    if robot_ip:
+        session = get_session(robot_ip, robot_port)
+        session_info = {"connected": session.is_connected(), "connected_since": session.connected_since}
+
+    def age(stamp):
+        return None if stamp is None else round(now - stamp, 1)
+
+    return {
+        "success": True,
+        "device": {
+            "wifi_name": device_wifi_name,
+            "ip": device_ip,
+            "connected": True if device_wifi_name else False,
+            "age": device["age"]
+        },
+        "robot": {
+            "ip": robot_ip,
+            "port": robot_port if robot_ip else None,
+            "wifi_name": robot_wifi_name,
+            "found": bool(robot_ip),
+            "age": age(state['robot_checked_at'])
+        },
+        "network": {
+            "same_network": same_network,
+            "connected": device_wifi_name == robot_wifi_name if robot_wifi_name else same_network
+        },
+        "session": session_info,
+        "refreshing": state['refreshing'],
+        "message": "Robot and network status retrieved successfully" if robot_ip else "Device connected but robot not found"
+    }
+
 @app.route("/api/robot/status", methods=["GET"])
 def get_robot_status():
-    """Get comprehensive robot and network status"""
+    """Get comprehensive robot and network status (served from cache; see /api/robot/status/refresh)"""
     try:
-        # Get device info
-        get_device_wifi_info()
-        
-        # Discover robot
-        discovery_result = discover_robot()
-        discovery_data = discovery_result.get_json()
-        
-        if discovery_data["success"] and discovery_data["robot_found"]:
-            return jsonify({
-                "success": True,
-                "device": {
-                    "wifi_name": device_wifi_name,
-                    "ip": device_ip,
-                    "connected": True if device_wifi_name else False
-                },
-                "robot": {
-                    "ip": discovery_data["robot_ip"],
-                    "wifi_name": discovery_data["robot_wifi_name"],
-                    "found": True
-                },
-                "network": {
-                    "same_network": discovery_data["same_network"],
-                    "connected": discovery_data["connected"]
-                },
-                "message": "Robot and network status retrieved successfully"
-            })
-        else:
-            return jsonify({
-                "success": True,
-                "device": {
-                    "wifi_name": device_wifi_name,
-                    "ip": device_ip,
-                    "connected": True if device_wifi_name else False
-                },
-                "robot": {
-                    "ip": None,
-                    "wifi_name": None,
-                    "found": False
-                },
-                "network": {
-                    "same_network": False,
-                    "connected": False
-                },
-                "message": "Device connected but robot not found"
-            })
+        ensure_status_refresher()
+        with network_state_lock:
+            never_checked = network_state['robot_checked_at'] is None
+        if never_checked:
+            # First call after startup: nothing cached yet, so probe once synchronously
+            refresh_network_state()
+        return jsonify(build_robot_status())
     except Exception as e:
         return jsonify({
             "success": False,
@@ -798,26 +825,46 @@ def get_robot_status():
             "message": f"Error getting status: {str(e)}"
         })
 
-def get_robot_battery_status(robot_ip, ws_port=5000, listen_duration=10):
-    """Connect to robot via WebSocket and get battery status"""
+@app.route("/api/robot/status/refresh", methods=["POST"])
+def api_robot_status_refresh():
+    """Re-run the network probes now; ?scan=1 also forces a subnet sweep"""
+    force_scan = request_flag("scan")
     try:
-        ws = websocket.create_connection(f"ws://{robot_ip}:{ws_port}")
-        ws.settimeout(listen_duration)
-        start_time = time.time()
-        while time.time() - start_time < listen_duration:
-            try:
-                res = ws.recv()
-                data = json.loads(res)
-                if data.get("cmd") == "notify_battery_info":
-                    battery = data["data"].get("battery")
-                    status = data["data"].get("status")
-                    charging = status
-                    ws.close()
-                    return {"success": True, "battery": battery, "charging": charging}
-            except Exception as e:
-                continue
-        ws.close()
-        return {"success": False, "message": "No battery info received in time."}
+        ensure_status_refresher()
+        refreshed = refresh_network_state(force_scan=force_scan, force_device=True, force_probe=True)
+        status = build_robot_status()
+        status["refreshed"] = refreshed
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error refreshing status: {str(e)}"})
+
+def request_flag(name):
+    """A boolean query parameter: ?name=1, true or yes"""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+def request_max_age(default):
+    """The max_age query parameter in seconds; max_age=0 forces a fresh reading from the robot"""
+    try:
+        return max(float(request.args.get("max_age", default)), 0)
+    except (TypeError, ValueError):
+        return default
+
+def get_robot_battery_status(robot_ip, ws_port=5000, listen_duration=10, max_age=BATTERY_MAX_AGE):
+    """Battery status from the telemetry snapshot, asking the robot only when it is older than max_age"""
+    try:
+        collector = get_collector(robot_ip, ws_port)
+        snapshot = collector.snapshot()
+        if snapshot["battery_age"] is None or snapshot["battery_age"] > max_age:
+            previous = snapshot["battery_at"]
+            snapshot = collector.refresh_battery(listen_duration)
+            if snapshot["battery_at"] == previous:
+                return {"success": False, "message": "No battery info received in time."}
+        return {
+            "success": True,
+            "battery": snapshot["battery"],
+            "charging": snapshot["charging_status"],
+            "age": snapshot["battery_age"]
+        }
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -827,56 +874,18 @@ def api_robot_battery():
     # Use the last discovered robot IP
     robot_ip = found_ip
     if not robot_ip:
-        # Try to discover robot if not already found
-        discover_robot()
-        robot_ip = found_ip
+        robot_ip = ensure_robot_found()
     if not robot_ip:
         return jsonify({"success": False, "message": "Robot not found on the network."}), 404
-    result = get_robot_battery_status(robot_ip)
+    result = get_robot_battery_status(robot_ip, found_port or ROBOT_PORT, max_age=request_max_age(BATTERY_MAX_AGE))
     return jsonify(result)
 
 def get_robot_maps(robot_ip, ws_port=5000, timeout=10):
-    import time
     try:
-        ws = websocket.create_connection(f"ws://{robot_ip}:{ws_port}")
-        ws.settimeout(timeout)
-        # Try all known map list commands
-        test_commands = [
-            {"cmd": "request_list_maps"},
-            {"cmd": "request_map_list"},
-            {"cmd": "get_map_list"},
-            {"cmd": "request_get_map_list"},
-        ]
-        for cmd in test_commands:
-            ws.send(json.dumps(cmd))
-            time.sleep(1)
-        start_time = time.time()
-        found_maps = []
-        while time.time() - start_time < timeout:
-            try:
-                response = ws.recv()
-                data = json.loads(response)
-                # Look for a map list inside the message
-                if "maps" in data.get("data", {}):
-                    maps = data["data"]["maps"]
-                    for m in maps:
-                        found_maps.append({
-                            "name": m.get("name"),
-                            "id": m.get("id")
-                        })
-                    break
-                elif "mapList" in data.get("data", {}):
-                    maps = data["data"]["mapList"]
-                    for m in maps:
-                        found_maps.append({
-                            "name": m.get("name"),
-                            "id": m.get("mapId")
-                        })
-                    break
-            except Exception as e:
-                break
-        ws.close()
+        found_maps = fetch_map_list(get_session(robot_ip, ws_port), timeout=timeout)
         if found_maps:
+            # Keep the engine's name lookups in step with what the UI was shown
+            map_registry.update(found_maps)
             return {"success": True, "maps": found_maps}
         else:
             return {"success": False, "message": "No maps found on robot."}
@@ -888,13 +897,20 @@ def api_robot_maps():
     global found_ip
     robot_ip = found_ip
     if not robot_ip:
-        discover_robot()
-        robot_ip = found_ip
+        robot_ip = ensure_robot_found()
     if not robot_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
+    # The on-disk catalogue answers until its TTL passes; ?refresh=1 always asks the robot
+    if map_registry.is_fresh() and map_registry.maps() and not request_flag("refresh"):
+        return jsonify({"success": True, "maps": map_registry.maps(), "cached": True, "age": map_registry.stats()["age"]})
     result = get_robot_maps(robot_ip)
     return jsonify(result)
 
+@app.route("/api/robot/maps/catalogue", methods=["GET"])
+def api_robot_maps_catalogue():
+    """Catalogued maps with their names and cached point versions, plus catalogue stats"""
+    return jsonify({"success": True, **map_registry.stats(), "maps": map_registry.catalogue()})
+
 # Manual override to set/validate robot IP
 @app.route("/api/robot/set_ip", methods=["POST"])
 def api_robot_set_ip():
@@ -941,29 +957,17 @@ def check_storage(ip, username, password):
 
 # --- Relocation logic (from relocate.py, simplified) ---
 def force_relocate_ws(robot_ip, x, y, theta, mode=0):
+    forget_last_arrival()
     try:
-        ws = websocket.create_connection(f"ws://{robot_ip}:5000")
-        ws.settimeout(10)
-        ws.send(json.dumps({
-            "cmd": "request_force_relocate",
-            "data": {
-                "x": x,
-                "y": y,
-                "theta": theta,
-                "mode": mode
-            }
-        }))
-        start_time = time.time()
-        while time.time() - start_time < 10:
-            try:
-                res = ws.recv()
-                data = json.loads(res)
-                if data.get("cmd") == "response_relocate_position" and data.get("code") in [0, 1001]:
-                    ws.close()
-                    return True, "Relocation started successfully."
-            except Exception:
-                continue
-        ws.close()
+        data = get_session(robot_ip, 5000).request(
+            "request_force_relocate",
+            {"x": x, "y": y, "theta": theta, "mode": mode},
+            expect="response_relocate_position",
+            match=lambda d: d.get("code") in [0, 1001],
+            timeout=10
+        )
+        if data:
+            return True, "Relocation started successfully."
         return False, "Relocation failed or timed out."
     except Exception as e:
         return False, str(e)
@@ -991,23 +995,25 @@ def api_robot_force_relocate():
 def api_robot_emergency_status():
     global found_ip, found_port
     if not found_ip:
-        discover_robot()
+        ensure_robot_found()
     if not found_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
     try:
-        ws = websocket.create_connection(f"ws://{found_ip}:{found_port or 5000}")
-        ws.send(json.dumps({"cmd": "get_emr_status"}))
-        res = ws.recv()
-        ws.close()
-        data = json.loads(res)
-        if data.get("cmd") == "notify_emr_status":
-            return jsonify({
-                "success": True,
-                "status": data.get("data", {}).get("status", 0),
-                "msg": data.get("msg", ""),
-            })
-        else:
-            return jsonify({"success": False, "message": "Unexpected response", "raw": data})
+        # Answer from the telemetry snapshot; only ask the robot when it is older than max_age
+        collector = get_collector(found_ip, found_port or ROBOT_PORT)
+        snapshot = collector.snapshot()
+        max_age = request_max_age(EMERGENCY_MAX_AGE)
+        if snapshot["emergency_age"] is None or snapshot["emergency_age"] > max_age:
+            previous = snapshot["emergency_at"]
+            snapshot = collector.refresh_emergency(5)
+            if snapshot["emergency_at"] == previous:
+                return jsonify({"success": False, "message": "No emergency status received from robot"})
+        return jsonify({
+            "success": True,
+            "status": snapshot["emergency_status"],
+            "msg": snapshot["emergency_msg"],
+            "age": snapshot["emergency_age"]
+        })
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
@@ -1016,8 +1022,7 @@ def api_robot_storage():
     global found_ip
     robot_ip = found_ip
     if not robot_ip:
-        discover_robot()
-        robot_ip = found_ip
+        robot_ip = ensure_robot_found()
     if not robot_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
     
@@ -1046,7 +1051,7 @@ def api_robot_execute():
     if not stitched_map_ids:
         return jsonify({"success": False, "message": "No map IDs provided."}), 400
     if not found_ip:
-        discover_robot()
+        ensure_robot_found()
     if not found_ip:
         return jsonify({"success": False, "message": "Robot not found or not connected."}), 404
     if not found_port:
@@ -1055,19 +1060,93 @@ def api_robot_execute():
         return jsonify({"success": False, "message": "No charge map ID provided."}), 400
 
     try:
-        # This function checks battery before navigation and charges if needed
-        result = run_multi_map_navigation_with_charging(
-            found_ip, stitched_map_ids, charge_map_id, found_port,
-            navigation_status=navigation_status,
-            navigation_control=navigation_control
-        )
-        if result.get("success"):
-            return jsonify({"success": True, "message": "Navigation completed"})
-        else:
-            return jsonify({"success": False, "message": result.get("message", "Navigation failed")})
+        # The mission (battery check, charging and patrol) runs on the executor thread
+        job = submit_navigation_job(found_ip, found_port, stitched_map_ids, charge_map_id)
+        with navigation_jobs_lock:
+            ahead = sum(1 for other in navigation_jobs.values()
+                        if other["id"] != job["id"] and other["status"] in ("queued", "running", "cancelling")
+                        and other["created_at"] <= job["created_at"])
+        message = "Navigation started" if ahead == 0 else f"Navigation queued behind {ahead} mission(s)"
+        return jsonify({"success": True, "message": message, "job_id": job["id"], "job": job_summary(job)}), 202
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
+def describe_resumable(state):
+    cycle, phase, index = resume_position(state)
+    map_ids = state["map_ids"]
+    return {
+        "mission_id": state["mission_id"],
+        "map_ids": map_ids,
+        "charge_map_id": state["charge_map_id"],
+        "started_at": state.get("started_at"),
+        "updated_at": state.get("updated_at"),
+        "last_leg": state.get("last_leg"),
+        "resume_at": {"cycle": cycle, "phase": phase, "leg": None if index is None else index + 1,
+                      "map_id": state["charge_map_id"] if index is None else map_ids[index] if phase == "forward" else map_ids[-1 - index]},
+    }
+
+def pending_mission_journal():
+    """The unfinished journaled mission, unless a job is already queued or running"""
+    state = mission_journal.resumable()
+    if state is None:
+        return None
+    with navigation_jobs_lock:
+        if any(job["status"] in ("queued", "running", "cancelling") for job in navigation_jobs.values()):
+            return None
+    return state
+
+@app.route("/api/robot/missions/resumable", methods=["GET"])
+def api_robot_mission_resumable():
+    state = pending_mission_journal()
+    return jsonify({"success": True, "mission": describe_resumable(state) if state else None})
+
+@app.route("/api/robot/missions/resumable", methods=["DELETE"])
+def api_robot_mission_discard():
+    state = mission_journal.discard()
+    if state is None:
+        return jsonify({"success": False, "message": "No unfinished mission to discard."}), 404
+    return jsonify({"success": True, "message": f"Mission {state['mission_id']} discarded"})
+
+@app.route("/api/robot/missions/resume", methods=["POST"])
+def api_robot_mission_resume():
+    """Continue the mission a restarted backend left unfinished, from its last completed leg"""
+    global found_ip, found_port
+    state = pending_mission_journal()
+    if state is None:
+        return jsonify({"success": False, "message": "No unfinished mission to resume."}), 404
+    if not found_ip:
+        ensure_robot_found()
+    # The robot may have a new address since the mission was journaled
+    robot_ip = found_ip or state["robot_ip"]
+    port = found_port or state["port"] or ROBOT_PORT
+    job = submit_navigation_job(robot_ip, port, state["map_ids"], state["charge_map_id"], resume=state)
+    mission = describe_resumable(state)
+    resume_at = mission["resume_at"]
+    return jsonify({"success": True, "message": f"Resuming mission {state['mission_id']} at {resume_at['phase']} leg {resume_at['leg']}",
+                    "job_id": job["id"], "job": job_summary(job), "mission": mission}), 202
+
+@app.route("/api/robot/jobs", methods=["GET"])
+def api_robot_jobs():
+    with navigation_jobs_lock:
+        jobs = sorted((job_summary(job) for job in navigation_jobs.values()), key=lambda job: job["created_at"], reverse=True)
+    return jsonify({"success": True, "jobs": jobs, "current_job_id": current_job_id})
+
+@app.route("/api/robot/jobs/<job_id>", methods=["GET"])
+def api_robot_job(job_id):
+    with navigation_jobs_lock:
+        job = navigation_jobs.get(job_id)
+        job = dict(job) if job else None
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route("/api/robot/jobs/<job_id>/cancel", methods=["POST"])
+def api_robot_job_cancel(job_id):
+    job = cancel_navigation_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    return jsonify({"success": True, "message": f"Job {job_id} is {job['status']}", "job": job_summary(job)})
+
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""End-to-end benchmark of run_multi_map_navigation_with_charging against the robot simulator.
+
+    python benchmark_navigation.py --maps 3 --cycles 2 --battery 15 --json results.json
+
+Runs M cycles over N simulated maps and reports wall time per engine phase,
+robot activity (navigating / docked / idle), WebSocket message counts and
+throughput in missions (map legs) and cycles per hour.
+"""
+import argparse
+import collections
+import functools
+import json
+import statistics
+import threading
+import time
+
+import execution
+from map_registry import map_registry
+from mission_journal import mission_journal
+from phase_timing import phase_timings
+from robot_simulator import RobotSimulator, demo_maps
+from waypoint_cache import waypoint_cache
+
+# Engine functions timed by the harness, with the phase name they are reported under.
+# Phases nest (relocate_with_retry includes wait_for_localization, charging includes
+# dock_charge), so totals are not meant to add up to the wall time.
+PHASES = [
+    ("set_map", "set_map"),
+    ("get_map_points", "get_points"),
+    ("relocate_with_retry", "relocate_with_retry"),
+    ("wait_for_localization", "wait_for_localization"),
+    ("start_navigation_and_wait_completion", "navigation"),
+    ("wait_for_robot_idle", "inter_map_wait"),
+    ("get_battery_status", "battery_check"),
+    ("execute_charging_phase", "charging"),
+    ("dock_charge", "dock_and_charge"),
+    ("undock_from_pile", "undock"),
+]
+
+
+class PhaseTimer:
+    """Wraps execution.py's module-level phase functions and records each call's duration"""
+
+    def __init__(self):
+        self.samples = collections.defaultdict(list)
+        self._originals = {}
+
+    def install(self):
+        for attr, phase in PHASES:
+            original = getattr(execution, attr)
+            self._originals[attr] = original
+            setattr(execution, attr, self._wrap(original, phase))
+
+    def uninstall(self):
+        for attr, original in self._originals.items():
+            setattr(execution, attr, original)
+        self._originals = {}
+
+    def _wrap(self, fn, phase):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[phase].append(time.perf_counter() - started)
+        return timed
+
+    def report(self, wall_time):
+        report = {}
+        for _, phase in PHASES:
+            samples = sorted(self.samples.get(phase, ()))
+            if not samples:
+                continue
+            total = sum(samples)
+            report[phase] = {
+                "count": len(samples),
+                "total": round(total, 3),
+                "mean": round(total / len(samples), 3),
+                "p50": round(statistics.median(samples), 3),
+                "p95": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+                "max": round(samples[-1], 3),
+                "share": round(total / wall_time, 3) if wall_time else None,
+            }
+        return report
+
+
+def run_benchmark(maps=3, cycles=1, timeout=600, keep_waypoint_cache=False, **sim_options):
+    """Run the engine for the given number of cycles against a fresh simulator and return the results"""
+    map_ids = [f"sim-map-{i}" for i in range(1, maps + 1)]
+    leg_length = sim_options.pop("leg_length", 3.0)
+    simulator = RobotSimulator(port=0, maps=demo_maps(maps, leg_length=leg_length), **sim_options)
+    timer = PhaseTimer()
+    navigation_status = {}
+    finished = {}
+
+    # The simulator's point lists must never reach the snapshot the backend loads on start
+    waypoint_cache.snapshot_path = None
+    if not keep_waypoint_cache:
+        waypoint_cache.invalidate()  # Cold start
+    mission_journal.path = None  # Never replace the backend's resumable mission
+    map_registry.snapshot_path = None  # Nor its map catalogue with the simulator's maps
+
+    # The engine announces each new cycle through update_navigation_status; stop at cycles + 1
+    original_update = execution.update_navigation_status
+
+    def watch_cycles(status, **changes):
+        original_update(status, **changes)
+        if changes.get("cycle", 0) > cycles and "at" not in finished:
+            finished["at"] = time.perf_counter()
+            execution.navigation_quit_event.set()
+
+    execution.update_navigation_status = watch_cycles
+    execution.navigation_quit_event.clear()
+    execution.navigation_stop_event.clear()
+    phase_timings.reset()
+    simulator.start()
+    timer.install()
+    result = {}
+    started = time.perf_counter()
+    try:
+        runner = threading.Thread(
+            target=lambda: result.update(outcome=execution.run_multi_map_navigation_with_charging(
+                "127.0.0.1", map_ids, "sim-charge", simulator.port, navigation_status=navigation_status)),
+            name="benchmark-engine", daemon=True
+        )
+        runner.start()
+        runner.join(timeout)
+        if runner.is_alive():
+            print(f"⏰ [BENCH] Timed out after {timeout}s, stopping the engine")
+            execution.navigation_quit_event.set()
+            runner.join(30)
+    finally:
+        execution.update_navigation_status = original_update
+        timer.uninstall()
+        wall_time = finished.get("at", time.perf_counter()) - started
+        sim_stats = simulator.stats()
+        simulator.stop()
+        execution.navigation_quit_event.clear()
+
+    completed = cycles if "at" in finished else max(0, navigation_status.get("cycle", 1) - 1)
+    engine_phases = phase_timings.snapshot()
+    # The engine files every patrol leg under map_leg, failed ones as failures
+    map_legs = engine_phases.get("map_leg", {})
+    legs = collections.Counter(succeeded=map_legs.get("count", 0) - map_legs.get("failures", 0), failed=map_legs.get("failures", 0))
+    hours = wall_time / 3600
+    return {
+        "maps": maps,
+        "cycles_requested": cycles,
+        "cycles_completed": completed,
+        "wall_time": round(wall_time, 3),
+        "missions": dict(legs),
+        "missions_per_hour": round(legs["succeeded"] / hours, 1) if hours else None,
+        "cycles_per_hour": round(completed / hours, 2) if hours else None,
+        "phases": timer.report(wall_time),
+        "engine_phases": engine_phases,  # The engine's own spans, per map
+        "time_in_state": {phase[len("state_"):]: data["sum"] for phase, data in engine_phases.items() if phase.startswith("state_")},
+        "robot_activity": sim_stats["activity"],
+        "messages": {
+            "received_by_robot": sim_stats["received"],
+            "sent_by_robot": sim_stats["sent"],
+            "dropped": sim_stats["dropped"],
+            "total_received": sum(sim_stats["received"].values()),
+            "total_sent": sum(sim_stats["sent"].values()),
+        },
+        "simulator": {
+            "latency": simulator.latency,
+            "jitter": simulator.jitter,
+            "drop_rate": simulator.drop_rate,
+            "nav_speed": simulator.nav_speed,
+            "connections": sim_stats["connections"],
+        },
+        "outcome": result.get("outcome"),
+    }
+
+
+def print_report(results):
+    print()
+    print(f"📊 [BENCH] {results['cycles_completed']}/{results['cycles_requested']} cycle(s) over {results['maps']} map(s) "
+          f"in {results['wall_time']:.1f}s")
+    print(f"📊 [BENCH] Missions: {results['missions']}  ->  {results['missions_per_hour']} missions/h, "
+          f"{results['cycles_per_hour']} cycles/h")
+    print(f"{'phase':<24}{'count':>7}{'total s':>10}{'mean s':>9}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'share':>8}")
+    for phase, row in results["phases"].items():
+        print(f"{phase:<24}{row['count']:>7}{row['total']:>10.2f}{row['mean']:>9.3f}{row['p50']:>9.3f}"
+              f"{row['p95']:>9.3f}{row['max']:>9.3f}{row['share']:>8.1%}")
+    states = ", ".join(f"{state} {seconds:.1f}s" for state, seconds in sorted(results["time_in_state"].items(), key=lambda item: -item[1]))
+    print(f"🔀 [BENCH] Engine time in state: {states}")
+    activity = results["robot_activity"]
+    print(f"🤖 [BENCH] Robot navigating {activity['navigating']:.1f}s, docked {activity['docked']:.1f}s, idle {activity['idle']:.1f}s")
+    messages = results["messages"]
+    print(f"✉️ [BENCH] Robot received {messages['total_received']} frames, sent {messages['total_sent']}, "
+          f"dropped {sum(messages['dropped'].values())}")
+    for cmd, count in sorted(messages["received_by_robot"].items(), key=lambda item: -item[1]):
+        print(f"    {cmd:<32}{count:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the navigation engine against the robot simulator")
+    parser.add_argument("--maps", type=int, default=3, help="number of maps in the sequence")
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600, help="give up after this many seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--battery", type=float, default=100.0, help="starting battery level (below 20 forces a charge)")
+    parser.add_argument("--charge-rate", type=float, default=5.0)
+    parser.add_argument("--nav-speed", type=float, default=1.0)
+    parser.add_argument("--leg-length", type=float, default=3.0, help="metres from anchor to destination")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-waypoint-cache", action="store_true", help="start with the on-disk waypoint cache (never written back)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        maps=args.maps, cycles=args.cycles, timeout=args.timeout, keep_waypoint_cache=args.keep_waypoint_cache,
+        latency=args.latency, jitter=args.jitter, drop_rate=args.drop_rate, battery=args.battery,
+        charge_rate=args.charge_rate, nav_speed=args.nav_speed, leg_length=args.leg_length, seed=args.seed
+    )
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"💾 [BENCH] Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import threading
+
+# One lock per snapshot path, so writes to a file land one at a time and in order
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+
+def _write_lock(path):
+    with _write_locks_lock:
+        return _write_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def write_atomically(path, content, fsync=False):
+    """Replace path with content (str) in one step.
+
+    The text goes to a unique temporary file next to path that is then
+    swapped in with os.replace, so a crash mid-write never leaves a truncated
+    file and concurrent writers never share a temporary file. content may be
+    a function returning the text; it is called under the path's write lock,
+    so the last write to land always carries the newest state.
+    """
+    with _write_lock(path):
+        text = content() if callable(content) else content
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def save_json_snapshot(path, snapshot):
+    """write_atomically for JSON; snapshot is the data or a function returning it"""
+    write_atomically(path, lambda: json.dumps(snapshot() if callable(snapshot) else snapshot))
+
+
+class SingleFlight:
+    """Background jobs on daemon threads, at most one running per key.
+
+    Used by the caches' refresh_async so a slow robot query is never issued
+    twice for the same entry.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._running = set()
+
+    def start(self, key, job):
+        """Run job() on a daemon thread unless one for key is still running; returns whether it started"""
+        with self._lock:
+            if key in self._running:
+                return False
+            self._running.add(key)
+
+        def worker():
+            try:
+                job()
+            finally:
+                with self._lock:
+                    self._running.discard(key)
+
+        thread_name = self.name if key is None else f"{self.name}-{key}"
+        threading.Thread(target=worker, name=thread_name, daemon=True).start()
+        return True
@@ -0,0 +1,328 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import ipaddress
+import json
+import os
+import threading
+import time
+
+import websocket
+
+from cache_support import save_json_snapshot
+from metrics import Family, registry
+from robot_logging import get_logger
+
+log = get_logger("discovery")
+
+# --- DISCOVERY CONFIGURATION ---
+ROBOT_PORT = 5000
+# Comma separated CIDR ranges to scan, e.g. "192.168.0.0/22,10.0.5.0/24".
+# When unset the device's own /24 is scanned.
+DISCOVERY_CIDRS = os.getenv("DISCOVERY_CIDRS", "")
+FALLBACK_CIDR = "192.168.0.0/24"
+SCAN_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", "256"))  # Simultaneous TCP probes
+CONNECT_TIMEOUT = 0.5  # Seconds per TCP probe
+VALIDATION_CONCURRENCY = 8  # Simultaneous WebSocket validations of hosts with the port open
+DISCOVERY_CACHE_TTL = int(os.getenv("DISCOVERY_CACHE_TTL", "300"))  # Seconds a validated address is trusted without a check
+DISCOVERY_CACHE_FILE = os.getenv(
+    "DISCOVERY_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery_cache.json")
+)
+REVALIDATE_TIMEOUT = 1.0  # Handshake/listen timeout when re-checking the cached address
+
+SCAN_SECONDS = registry.histogram(
+    "robot_discovery_scan_seconds", "Duration of network sweeps for the robot", ["result"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+# Robot websocket signature
+KNOWN_ROBOT_CMDS = {
+    "notify_heart_beat",
+    "notify_battery_info",
+    "notify_emr_status",
+    "notify_robot_status",
+    "response_set_map",
+    "response_map_list",
+    "notify_map_list",
+    "response_get_map_list"
+}
+
+
+def validate_robot_ip(ip, ws_port=ROBOT_PORT, handshake_timeout=2.0, listen_timeout=2.0):
+    """Validate that the given IP belongs to the robot by performing a WebSocket handshake and
+    checking for expected messages. Returns True if validated, False otherwise."""
+    try:
+        ws = websocket.create_connection(f"ws://{ip}:{ws_port}", timeout=handshake_timeout)
+        ws.settimeout(listen_timeout)
+        try:
+            ws.send(json.dumps({"cmd": "request_heart_beat"}))
+        except Exception:
+            pass
+        start_time = time.time()
+        while time.time() - start_time < listen_timeout:
+            try:
+                res = ws.recv()
+                data = json.loads(res)
+                cmd = data.get("cmd")
+                if cmd and cmd in KNOWN_ROBOT_CMDS:
+                    ws.close()
+                    return True
+                # Some firmware replies with a generic structure but valid data
+                if cmd and isinstance(data.get("data", {}), dict):
+                    ws.close()
+                    return True
+            except Exception:
+                continue
+        ws.close()
+        return False
+    except Exception:
+        return False
+
+
+def scan_networks(device_ip=None, cidrs=DISCOVERY_CIDRS):
+    """Networks to sweep: configured CIDRs, else the device's /24, else the fallback range"""
+    networks = []
+    for cidr in (c.strip() for c in (cidrs or "").split(",")):
+        if not cidr:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(cidr, strict=False))
+        except ValueError:
+            log.warning(f"⚠️ [DISCOVERY] Ignoring invalid CIDR: {cidr}")
+    if networks:
+        return networks
+    if device_ip:
+        try:
+            return [ipaddress.ip_network(f"{device_ip}/24", strict=False)]
+        except ValueError:
+            pass
+    return [ipaddress.ip_network(FALLBACK_CIDR)]
+
+
+def iter_hosts(networks, first=None):
+    """Host addresses of the networks without duplicates, optionally starting with likely candidates"""
+    seen = set()
+    for ip in first or ():
+        if ip and ip not in seen:
+            seen.add(ip)
+            yield ip
+    for network in networks:
+        for host in network.hosts():
+            ip = str(host)
+            if ip not in seen:
+                seen.add(ip)
+                yield ip
+
+
+async def probe_port(ip, port, timeout):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def scan(networks, port=ROBOT_PORT, concurrency=SCAN_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+               first=None, stop_on_first=True, executor=None):
+    """Async generator of scan results, streamed as soon as each is known.
+
+    Yields {"ip", "port", "open": True, "robot": bool} for every host with the
+    port open, after validating it with a WebSocket handshake. Probes run with
+    bounded concurrency (so a /22 needs no more sockets than a /24) and, with
+    stop_on_first, everything outstanding is cancelled once a robot validates.
+    Validation is blocking, so it runs on executor (the loop's default if None).
+    """
+    hosts = iter_hosts(networks, first)
+    probe_slots = asyncio.Semaphore(concurrency)
+    validation_slots = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+    results = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+
+    async def check(ip):
+        try:
+            if not await probe_port(ip, port, connect_timeout):
+                return
+            async with validation_slots:
+                robot = await loop.run_in_executor(executor, validate_robot_ip, ip, port)
+            await results.put({"ip": ip, "port": port, "open": True, "robot": robot})
+        finally:
+            probe_slots.release()
+
+    async def feed():
+        for ip in hosts:
+            await probe_slots.acquire()
+            task = asyncio.ensure_future(check(ip))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        await results.put(None)
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+            if result["robot"] and stop_on_first:
+                break
+    finally:
+        feeder.cancel()
+        for task in list(in_flight):
+            task.cancel()
+
+
+def find_robot(networks, port=ROBOT_PORT, first=None, on_result=None, **scan_options):
+    """Blocking sweep returning the first validated robot IP, or None.
+
+    on_result(result) is called for every responsive host as it is found.
+    """
+    # Own pool so a validation still running after the robot is found does not hold up the return
+    executor = concurrent.futures.ThreadPoolExecutor(VALIDATION_CONCURRENCY, thread_name_prefix="discovery")
+
+    async def run():
+        async with contextlib.aclosing(scan(networks, port, first=first, executor=executor, **scan_options)) as results:
+            async for result in results:
+                if on_result is not None:
+                    on_result(result)
+                if result["robot"]:
+                    return result["ip"]
+        return None
+
+    started = time.time()
+    try:
+        ip = asyncio.run(run())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    SCAN_SECONDS.observe(time.time() - started, result="found" if ip else "not_found")
+    ranges = ", ".join(str(network) for network in networks)
+    log.info(f"🔍 [DISCOVERY] Scan of {ranges} finished in {time.time() - started:.2f}s: {ip or 'no robot found'}")
+    return ip
+
+
+class DiscoveryCache:
+    """The last validated robot address, persisted across restarts.
+
+    Within the TTL the cached address is returned without touching the network.
+    After that it is re-checked with a single WebSocket handshake, and only if
+    that fails does resolve() fall back to a full scan.
+    """
+
+    def __init__(self, ttl=DISCOVERY_CACHE_TTL, snapshot_path=DISCOVERY_CACHE_FILE):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self._entry = None  # {"ip", "port", "validated_at"}
+        self._lock = threading.Lock()
+
+        # Cache statistics
+        self.hits = 0
+        self.revalidations = 0
+        self.scans = 0
+
+        self.load()
+
+    def get(self):
+        """Return the cached entry with its age in seconds, or None"""
+        with self._lock:
+            if self._entry is None:
+                return None
+            return {**self._entry, "age": time.time() - self._entry["validated_at"]}
+
+    def remember(self, ip, port):
+        with self._lock:
+            self._entry = {"ip": ip, "port": port, "validated_at": time.time()}
+        self.save()
+
+    def forget(self):
+        with self._lock:
+            self._entry = None
+        self.save()
+
+    def resolve(self, networks, port=ROBOT_PORT, max_age=None, force_scan=False):
+        """Return (ip, port, source) for the robot, or (None, None, None) when it cannot be found.
+
+        networks is a list of ip_network or a callable returning one, so the
+        (possibly expensive) range lookup only happens when a scan is needed.
+        source tells how the answer was obtained: "cache", "revalidated" or "scan".
+        """
+        max_age = self.ttl if max_age is None else max_age
+        entry = self.get()
+        if entry and not force_scan:
+            if entry["age"] < max_age:
+                self.hits += 1
+                return entry["ip"], entry["port"], "cache"
+            if validate_robot_ip(entry["ip"], entry["port"], handshake_timeout=REVALIDATE_TIMEOUT, listen_timeout=REVALIDATE_TIMEOUT):
+                self.revalidations += 1
+                self.remember(entry["ip"], entry["port"])
+                return entry["ip"], entry["port"], "revalidated"
+            log.warning(f"⚠️ [DISCOVERY] Cached robot at {entry['ip']}:{entry['port']} did not answer, scanning")
+
+        self.scans += 1
+        ip = find_robot(networks() if callable(networks) else networks, port, first=[entry and entry["ip"]])
+        if ip:
+            self.remember(ip, port)
+            return ip, port, "scan"
+        self.forget()
+        return None, None, None
+
+    def load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry and entry.get("ip") and entry.get("port") and "validated_at" in entry:
+                with self._lock:
+                    self._entry = {"ip": entry["ip"], "port": int(entry["port"]), "validated_at": float(entry["validated_at"])}
+                log.info(f"🔍 [DISCOVERY] Last known robot: {entry['ip']}:{entry['port']}")
+        except Exception as e:
+            log.warning(f"⚠️ [DISCOVERY] Ignoring unreadable discovery cache: {e}")
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+
+        def snapshot():
+            with self._lock:
+                return dict(self._entry) if self._entry else None
+
+        try:
+            save_json_snapshot(self.snapshot_path, snapshot)
+        except Exception as e:
+            log.warning(f"⚠️ [DISCOVERY] Could not write discovery cache: {e}")
+
+    def stats(self):
+        entry = self.get()
+        return {
+            "ttl": self.ttl,
+            "robot_ip": entry["ip"] if entry else None,
+            "robot_port": entry["port"] if entry else None,
+            "age": round(entry["age"], 1) if entry else None,
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "scans": self.scans,
+        }
+
+
+discovery_cache = DiscoveryCache()
+
+
+def collect_discovery_metrics():
+    stats = discovery_cache.stats()
+    resolves = Family("robot_discovery_resolves_total", "counter", "Robot address lookups by how they were answered")
+    for source, key in (("cache", "hits"), ("revalidated", "revalidations"), ("scan", "scans")):
+        resolves.add(stats[key], source=source)
+    age = Family("robot_discovery_cache_age_seconds", "gauge", "Seconds since the cached robot address was validated")
+    age.add(stats["age"])
+    return [resolves, age]
+
+
+registry.add_collector(collect_discovery_metrics)
@@ -0,0 +1,80 @@
+import contextlib
+import threading
+
+
+class ControlFlag:
+    """threading.Event look-alike whose changes wake every waiter on the engine's control condition"""
+
+    def __init__(self, control, name):
+        self._control = control
+        self.name = name
+        self._value = False
+
+    def is_set(self):
+        return self._value
+
+    def set(self):
+        self._control.change(self, True)
+
+    def clear(self):
+        self._control.change(self, False)
+
+    def wait(self, timeout=None):
+        return self._control.wait_for(self.is_set, timeout)
+
+
+class EngineControl:
+    """Pause, stop, quit and emergency state of the navigation engine behind one Condition.
+
+    Setting or clearing a flag notifies the condition and runs the registered
+    wakers, so threads blocked in wait_for (or in a subscription read a waker
+    interrupts) react at once instead of polling. Reply futures notify the
+    same condition when they complete (see execution.await_reply).
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.paused = ControlFlag(self, "paused")
+        self.stop = ControlFlag(self, "stop")
+        self.quit = ControlFlag(self, "quit")
+        self.emergency = ControlFlag(self, "emergency")
+        self._wakers = set()
+
+    def change(self, flag, value):
+        with self.condition:
+            flag._value = value
+            self.condition.notify_all()
+            wakers = list(self._wakers)
+        for waker in wakers:
+            waker()
+
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate() is true or timeout elapses; returns the predicate's last value"""
+        with self.condition:
+            return self.condition.wait_for(predicate, timeout)
+
+    def wait_while_paused(self):
+        """Block while paused; False if stop or quit ended the wait instead of a resume"""
+        self.wait_for(lambda: not self.paused.is_set() or self.quit.is_set() or self.stop.is_set())
+        return not (self.quit.is_set() or self.stop.is_set())
+
+    @contextlib.contextmanager
+    def wakeup(self, waker):
+        """Call waker() on every flag change while the block runs (e.g. Subscription.wake)"""
+        with self.condition:
+            self._wakers.add(waker)
+        try:
+            yield
+        finally:
+            with self.condition:
+                self._wakers.discard(waker)
+
+    def snapshot(self):
+        return {flag.name: flag.is_set() for flag in (self.paused, self.stop, self.quit, self.emergency)}
+
+
+engine_control = EngineControl()
@@ -0,0 +1,105 @@
+import itertools
+import json
+import queue
+import threading
+
+# --- EVENT STREAM CONFIGURATION ---
+SUBSCRIBER_BACKLOG = 256  # Events buffered per client before the oldest are dropped
+KEEPALIVE_INTERVAL = 15  # Seconds between SSE comments that keep idle connections open
+
+
+def format_sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventBus:
+    """Fan-out of named state events to Server-Sent Events clients.
+
+    Each event name carries a piece of state (battery, map tracking, ...). The
+    latest value is retained so a client that connects later starts from the
+    current state, and publishing an unchanged value is a no-op. With
+    merge=True only the changed keys are sent while the retained value is the
+    merged whole.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._latest = {}  # event -> (event_id, data)
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data, merge=False):
+        """Send an event to every client; returns False when nothing changed"""
+        with self._lock:
+            _, previous = self._latest.get(event, (None, None))
+            if merge and isinstance(previous, dict):
+                delta = {key: value for key, value in data.items() if previous.get(key) != value}
+                if not delta:
+                    return False
+                state = {**previous, **delta}
+            else:
+                if data == previous:
+                    return False
+                delta = state = data
+            event_id = next(self._ids)
+            self._latest[event] = (event_id, state)
+            subscribers = list(self._subscribers)
+        message = format_sse(event_id, event, delta)
+        for inbox in subscribers:
+            self._deliver(inbox, message)
+        return True
+
+    def latest(self, event):
+        with self._lock:
+            return self._latest.get(event, (None, None))[1]
+
+    @staticmethod
+    def _deliver(inbox, message):
+        while True:
+            try:
+                inbox.put_nowait(message)
+                return
+            except queue.Full:
+                # Slow client: drop its oldest event rather than block the publisher
+                try:
+                    inbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def subscribe(self):
+        """Register a client; returns its inbox primed with the current state"""
+        inbox = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        with self._lock:
+            for event, (event_id, data) in sorted(self._latest.items(), key=lambda item: item[1][0]):
+                inbox.put_nowait(format_sse(event_id, event, data))
+            self._subscribers.add(inbox)
+        return inbox
+
+    def unsubscribe(self, inbox):
+        with self._lock:
+            self._subscribers.discard(inbox)
+
+    def stream(self, keepalive=KEEPALIVE_INTERVAL, on_idle=None):
+        """Generator of SSE text for one client; unsubscribes when the client goes away.
+
+        on_idle is called whenever keepalive seconds pass without an event.
+        """
+        inbox = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield inbox.get(timeout=keepalive)
+                except queue.Empty:
+                    if on_idle is not None:
+                        on_idle()
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(inbox)
+
+
+event_bus = EventBus()
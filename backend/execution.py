@@ -1,11 +1,23 @@
-import websocket
-import json
 import time
 import threading
 from enum import Enum
 import queue
-from datetime import datetime
-import sys
+import math
+import functools
+import inspect
+import uuid
+
+from robot_session import get_session
+from waypoint_cache import waypoint_cache
+from event_bus import event_bus
+from phase_timing import phase_timings
+from mission_journal import mission_journal, resume_position
+from map_registry import fetch_map_list, map_registry
+from engine_control import engine_control
+from metrics import Family, registry
+from robot_logging import get_logger
+
+log = get_logger("execution")
 
 # Try to import pyttsx3, but handle the case where it's not available
 try:
@@ -13,11 +25,11 @@ try:
     PYTTSX3_AVAILABLE = True
 except ImportError:
     PYTTSX3_AVAILABLE = False
-    print("⚠ [TTS] pyttsx3 not available. TTS functionality will be disabled.")
+    log.warning("⚠ [TTS] pyttsx3 not available. TTS functionality will be disabled.")
 
 # --- EMERGENCY EXIT CONFIGURATION ---
 EMERGENCY_EXIT_MAP_ID = "c2606e61-7e0d-410a-b618-c43c523ebb33"  # This should be map2 (emergency map)
-emergency_exit_event = threading.Event()
+emergency_exit_event = engine_control.emergency
 current_map_position = 0  # Track current map position in sequence
 map_sequence = []  # Will store the current map sequence being navigated
 emergency_exit_in_progress = False  # Flag to prevent recursive emergency exits
@@ -28,8 +40,65 @@ current_map_id = None  # Current map ID being navigated
 current_map_name = None  # Current map name being navigated
 upcoming_map_ids = [None, None]  # Next two upcoming map IDs
 upcoming_map_names = [None, None]  # Next two upcoming map names
-robot_maps_cache = []  # Cache for robot maps to get names by ID
 
+# --- LOADED MAP TRACKING ---
+# What the robot has loaded, as last confirmed by response_set_map on a given
+# session connection. A reconnect may mean a robot reboot, so it voids the record.
+loaded_map = {"map_id": None, "session": None, "connects": None}
+# Where the last completed leg left the robot, so the next leg can skip relocation
+last_arrival = {"map_id": None, "point": None}
+map_switch_stats = {"requested": 0, "performed": 0, "avoided": 0, "relocations_avoided": 0}
+RELOCATE_SKIP_TOLERANCE = 0.3  # Metres between heartbeat pose and start point to trust current localization
+POSE_MAX_AGE = 5  # Seconds a heartbeat pose stays trustworthy
+
+# --- ENGINE METRICS ---
+NAVIGATION_ATTEMPTS = registry.counter("robot_navigation_attempts_total", "Map leg attempts", ["map_id"])
+NAVIGATION_RETRIES = registry.counter("robot_navigation_retries_total", "Map leg attempts that had to be retried", ["map_id", "reason"])
+NAVIGATION_TIMEOUTS = registry.counter("robot_navigation_timeouts_total", "Navigations abandoned after the 180s limit", ["map_id"])
+
+# --- PHASE TIMING ---
+def timed_phase(phase):
+    """Record a timing span per call under phase_timings.
+
+    phase is a name or a function of the call's bound arguments. The span is
+    filed under the call's map_id argument, else the currently loaded map, and
+    counts as failed when the function returns a falsy value or raises.
+    """
+    def decorate(fn):
+        signature = inspect.signature(fn)
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            name = phase(arguments) if callable(phase) else phase
+            with phase_timings.span(name, arguments.get("map_id") or loaded_map["map_id"]) as span:
+                result = fn(*args, **kwargs)
+                span.ok = bool(result)
+                return result
+        return wrapper
+    return decorate
+
+
+# --- ROBOT CALL TIMEOUTS ---
+SET_MAP_TIMEOUT = 60  # Upper bound for the robot to confirm a map switch (response_set_map 1000)
+
+# --- WAIT UPPER BOUNDS (seconds) ---
+# The engine waits on robot events (heartbeat codes, response_* frames) and on
+# control signals; these are only the ceilings used when the event never shows up.
+WAIT_TIMEOUTS = {
+    "navigation_idle": 1,      # NAVI_IDLE heartbeat (2006) after request_stop_navigation
+    "reset_map": 2,            # response_reset_map after request_reset_map
+    "relocate_retry": 5,       # Back-off before retrying a failed relocation
+    "navigation_retry": 10,    # Back-off before retrying a failed map leg
+    "between_maps": 3,         # Robot idle before the next map leg starts
+    "between_cycles": 10,      # Robot idle before the next cycle starts
+    "emergency_step": 2,       # Robot idle between emergency exit legs
+    "charge_confirm": 15,      # Battery reports charging after a successful dock
+    "dock_retry": 5,           # Back-off before retrying a failed dock
+    "undock": 5,               # Battery reports not charging after request_dock_charge_off
+    "battery_poll": 30,        # Active battery query when no notify_battery_info arrives
+    "cycle_retry": 30,         # Back-off after a cycle could not be set up
+}
 
 # --- BATTERY AND CHARGING CONFIGURATION ---
 MAP_ID = "be6e76e5-3612-4eb7-89ee-6bc09f222634"
@@ -42,17 +111,18 @@ CHARGE_POINT = {
 def trigger_emergency_exit():
     """Trigger emergency exit procedure"""
     global emergency_exit_in_progress
-    print("🚨 [EMERGENCY] Emergency exit triggered by user!")
+    log.info("🚨 [EMERGENCY] Emergency exit triggered by user!")
     if not emergency_exit_in_progress:
         emergency_exit_event.set()
 
 def clear_emergency_exit():
     """Clear emergency exit state"""
     global emergency_exit_in_progress
-    print("✅ [EMERGENCY] Emergency exit state cleared.")
-    emergency_exit_event.clear()
+    log.info("✅ [EMERGENCY] Emergency exit state cleared.")
     emergency_exit_in_progress = False
+    emergency_exit_event.clear()
 
+@timed_phase("emergency_exit")
 def execute_emergency_exit_navigation(ws, map_ids, navigation_control=None):
     """
     Execute emergency exit navigation based on the specified logic:
@@ -66,141 +136,127 @@ def execute_emergency_exit_navigation(ws, map_ids, navigation_control=None):
     """
     global current_map_position, map_sequence, emergency_exit_in_progress, navigation_phase
     
-    print("🚨 [EMERGENCY] Starting emergency exit navigation process...")
-    print(f"📍 [EMERGENCY] Current position: Map {current_map_position + 1} (index {current_map_position})")
-    print(f"🔄 [EMERGENCY] Current navigation phase: {navigation_phase}")
+    log.info("🚨 [EMERGENCY] Starting emergency exit navigation process...")
+    log.info(f"📍 [EMERGENCY] Current position: Map {current_map_position + 1} (index {current_map_position})")
+    log.info(f"🔄 [EMERGENCY] Current navigation phase: {navigation_phase}")
     
     emergency_exit_in_progress = True
 
     # Find emergency exit map position (should be map2, index 1)
     try:
         emergency_exit_position = map_sequence.index(EMERGENCY_EXIT_MAP_ID)
-        print(f"📍 [EMERGENCY] Emergency exit map found at position {emergency_exit_position + 1} (index {emergency_exit_position})")
+        log.info(f"📍 [EMERGENCY] Emergency exit map found at position {emergency_exit_position + 1} (index {emergency_exit_position})")
     except ValueError:
-        print("❌ [EMERGENCY] Emergency exit map ID not found in current sequence!")
+        log.error("❌ [EMERGENCY] Emergency exit map ID not found in current sequence!")
         emergency_exit_in_progress = False
         return False
 
     # CASE 1: Already at emergency exit map (map2) → stop immediately
     if current_map_position == emergency_exit_position:
-        print("🟢 [EMERGENCY] Already at emergency exit map (Map2). Stopping immediately...")
+        log.info("🟢 [EMERGENCY] Already at emergency exit map (Map2). Stopping immediately...")
         
-        # Immediately stop navigation
-        cancel_current_navigation(ws)
-        time.sleep(1)
-        
-        # Send multiple stop commands to ensure robot stops
-        for _ in range(3):
-            send(ws, {"cmd": "request_stop_navigation"})
-            time.sleep(0.5)
+        # Immediately stop navigation, repeating the stop until the robot reports idle
+        stop_robot_firmly(ws)
         
-        print("🛑 [EMERGENCY] Robot stopped at emergency exit map.")
+        log.info("🛑 [EMERGENCY] Robot stopped at emergency exit map.")
         navigation_stop_event.set()
         emergency_exit_in_progress = False
         return True
 
     # CASE 2: Before emergency exit map (map1) → go forward to map2 destination
     elif current_map_position < emergency_exit_position:
-        print(f"➡ [EMERGENCY] Currently in Map{current_map_position + 1}, going forward to emergency exit Map{emergency_exit_position + 1}")
+        log.info(f"➡ [EMERGENCY] Currently in Map{current_map_position + 1}, going forward to emergency exit Map{emergency_exit_position + 1}")
         
         # Navigate forward through each map until reaching emergency exit
         for seq_pos in range(current_map_position + 1, emergency_exit_position + 1):
             map_id = map_sequence[seq_pos]
             map_name = f"emergency_forward_map{seq_pos + 1}"
             
-            print(f"🗺 [EMERGENCY] Forward navigation to {map_name} (ID: {map_id})...")
+            log.info(f"🗺 [EMERGENCY] Forward navigation to {map_name} (ID: {map_id})...")
             
             # Use forward mode (anchor → destination)
             success = execute_map_navigation(ws, map_name, map_id, navigation_control=navigation_control, reverse_mode=False, emergency_mode=True)
             
             if not success:
-                print(f"❌ [EMERGENCY] Failed to navigate forward to {map_name}. Stopping emergency exit.")
+                log.error(f"❌ [EMERGENCY] Failed to navigate forward to {map_name}. Stopping emergency exit.")
                 emergency_exit_in_progress = False
                 return False
             
-            print(f"✅ [EMERGENCY] Arrived at {map_name}")
+            log.info(f"✅ [EMERGENCY] Arrived at {map_name}")
             current_map_position = seq_pos
             
             # If we reached the emergency exit map, stop here
             if seq_pos == emergency_exit_position:
-                print("🏁 [EMERGENCY] Reached emergency exit map destination. Stopping immediately.")
-                cancel_current_navigation(ws)
-                time.sleep(1)
-                for _ in range(3):
-                    send(ws, {"cmd": "request_stop_navigation"})
-                    time.sleep(0.5)
-                print("🛑 [EMERGENCY] Robot stopped at emergency exit.")
+                log.info("🏁 [EMERGENCY] Reached emergency exit map destination. Stopping immediately.")
+                stop_robot_firmly(ws)
+                log.info("🛑 [EMERGENCY] Robot stopped at emergency exit.")
                 navigation_stop_event.set()
                 break
             
-            print("⏳ [EMERGENCY] Waiting 2 seconds before next step...")
-            time.sleep(2)
+            log.info("⏳ [EMERGENCY] Waiting for robot to settle before next step...")
+            wait_for_robot_idle(ws, WAIT_TIMEOUTS["emergency_step"])
 
     # CASE 3: After emergency exit map (map3, map4, etc.) → go backward through anchors
     else:
-        print(f"⬅ [EMERGENCY] Currently in Map{current_map_position + 1}, going backward to emergency exit Map{emergency_exit_position + 1}")
-        print("🔄 [EMERGENCY] Emergency navigation sequence:")
-        print(f"🔄 [EMERGENCY] Step 1: Current position (destination) → Current map anchor")
-        print(f"🔄 [EMERGENCY] Step 2: Navigate through intermediate map anchors")
-        print(f"🔄 [EMERGENCY] Step 3: Map2 anchor → Map2 destination (stop)")
+        log.info(f"⬅ [EMERGENCY] Currently in Map{current_map_position + 1}, going backward to emergency exit Map{emergency_exit_position + 1}")
+        log.info("🔄 [EMERGENCY] Emergency navigation sequence:")
+        log.info(f"🔄 [EMERGENCY] Step 1: Current position (destination) → Current map anchor")
+        log.info(f"🔄 [EMERGENCY] Step 2: Navigate through intermediate map anchors")
+        log.info(f"🔄 [EMERGENCY] Step 3: Map2 anchor → Map2 destination (stop)")
         
         # STEP 1: First, go from current destination to current map's anchor
         current_map_id = map_sequence[current_map_position]
         current_map_name = f"emergency_current_to_anchor_map{current_map_position + 1}"
         
-        print(f"🗺 [EMERGENCY] Step 1: From current destination to {current_map_name} anchor (ID: {current_map_id})...")
+        log.info(f"🗺 [EMERGENCY] Step 1: From current destination to {current_map_name} anchor (ID: {current_map_id})...")
         
         # Use reverse mode (destination → anchor) to reach the anchor of current map
         success = execute_map_navigation(ws, current_map_name, current_map_id, navigation_control=navigation_control, reverse_mode=True, emergency_mode=True)
         
         if not success:
-            print(f"❌ [EMERGENCY] Failed to navigate to current map anchor. Stopping emergency exit.")
+            log.error(f"❌ [EMERGENCY] Failed to navigate to current map anchor. Stopping emergency exit.")
             emergency_exit_in_progress = False
             return False
         
-        print(f"✅ [EMERGENCY] Step 1 completed: Arrived at Map{current_map_position + 1} anchor")
-        print("⏳ [EMERGENCY] Waiting 2 seconds before next step...")
-        time.sleep(2)
+        log.info(f"✅ [EMERGENCY] Step 1 completed: Arrived at Map{current_map_position + 1} anchor")
+        log.info("⏳ [EMERGENCY] Waiting for robot to settle before next step...")
+        wait_for_robot_idle(ws, WAIT_TIMEOUTS["emergency_step"])
         
         # STEP 2: Navigate backward through intermediate map anchors until reaching emergency exit
         for seq_pos in range(current_map_position - 1, emergency_exit_position - 1, -1):
             map_id = map_sequence[seq_pos]
             map_name = f"emergency_backward_map{seq_pos + 1}"
             
-            print(f"🗺 [EMERGENCY] Step 2: Backward navigation to {map_name} anchor (ID: {map_id})...")
+            log.info(f"🗺 [EMERGENCY] Step 2: Backward navigation to {map_name} anchor (ID: {map_id})...")
             
             # Use reverse mode (destination → anchor) to reach the anchor of this map
             success = execute_map_navigation(ws, map_name, map_id, navigation_control=navigation_control, reverse_mode=True, emergency_mode=True)
             
             if not success:
-                print(f"❌ [EMERGENCY] Failed to navigate backward to {map_name} anchor. Stopping emergency exit.")
+                log.error(f"❌ [EMERGENCY] Failed to navigate backward to {map_name} anchor. Stopping emergency exit.")
                 emergency_exit_in_progress = False
                 return False
             
-            print(f"✅ [EMERGENCY] Arrived at {map_name} anchor point")
-            print("⏳ [EMERGENCY] Waiting 2 seconds before next backward step...")
-            time.sleep(2)
+            log.info(f"✅ [EMERGENCY] Arrived at {map_name} anchor point")
+            log.info("⏳ [EMERGENCY] Waiting for robot to settle before next backward step...")
+            wait_for_robot_idle(ws, WAIT_TIMEOUTS["emergency_step"])
         
         # STEP 3: Now at emergency exit map anchor, navigate to destination and stop
-        print("🏁 [EMERGENCY] Step 3: Reached emergency exit map anchor. Navigating to destination point...")
+        log.info("🏁 [EMERGENCY] Step 3: Reached emergency exit map anchor. Navigating to destination point...")
         
         final_success = execute_map_navigation(ws, f"emergency_exit_final", EMERGENCY_EXIT_MAP_ID, navigation_control=navigation_control, reverse_mode=False, emergency_mode=True)
         
         if final_success:
-            print("✅ [EMERGENCY] Successfully reached emergency exit destination!")
-            cancel_current_navigation(ws)
-            time.sleep(1)
-            for _ in range(3):
-                send(ws, {"cmd": "request_stop_navigation"})
-                time.sleep(0.5)
-            print("🛑 [EMERGENCY] Robot stopped at emergency exit.")
+            log.info("✅ [EMERGENCY] Successfully reached emergency exit destination!")
+            stop_robot_firmly(ws)
+            log.info("🛑 [EMERGENCY] Robot stopped at emergency exit.")
             navigation_stop_event.set()
         else:
-            print("❌ [EMERGENCY] Failed to reach emergency exit destination")
+            log.error("❌ [EMERGENCY] Failed to reach emergency exit destination")
             emergency_exit_in_progress = False
             return False
 
-    print("🏁 [EMERGENCY] Emergency exit navigation completed successfully!")
+    log.info("🏁 [EMERGENCY] Emergency exit navigation completed successfully!")
     emergency_exit_in_progress = False
     return True
 
@@ -212,35 +268,47 @@ def check_emergency_exit_during_navigation(ws, navigation_control=None):
     global emergency_exit_in_progress
     
     if emergency_exit_event.is_set() and not emergency_exit_in_progress:
-        print("🚨 [EMERGENCY] Emergency exit event detected during navigation!")
-        print("📍 [EMERGENCY] Will proceed to emergency exit after current destination is reached...")
+        log.info("🚨 [EMERGENCY] Emergency exit event detected during navigation!")
+        log.info("📍 [EMERGENCY] Will proceed to emergency exit after current destination is reached...")
         return False
     
     return False
 
 # --- STOP/RESUME/QUIT CONTROL FLAGS ---
-navigation_stop_event = threading.Event()
-navigation_pause_event = threading.Event()
-navigation_quit_event = threading.Event()  # New quit event
+# Views of engine_control's flags; setting or clearing one wakes every waiting thread
+navigation_stop_event = engine_control.stop
+navigation_pause_event = engine_control.paused
+navigation_quit_event = engine_control.quit
+
+def notify_control_change():
+    engine_control.notify()
+
+def wait_for_control(predicate, timeout):
+    """Block until predicate() is true or timeout elapses; returns the predicate's last value"""
+    return engine_control.wait_for(predicate, timeout)
+
+def pause_for(seconds):
+    """Back off for up to `seconds`, returning True early if stop or quit is requested"""
+    return wait_for_control(lambda: navigation_quit_event.is_set() or navigation_stop_event.is_set(), seconds)
 
 def pause_navigation():
     """Pause navigation - can be resumed"""
-    print("⏸ [CONTROL] Navigation paused by user")
+    log.info("⏸ [CONTROL] Navigation paused by user")
     navigation_pause_event.set()
 
 def continue_navigation():
     """Resume navigation from pause"""
-    print("▶ [CONTROL] Navigation resumed by user")
+    log.info("▶ [CONTROL] Navigation resumed by user")
     navigation_pause_event.clear()
 
 def stop_navigation():
     """Stop navigation - ends current cycle but allows restart"""
-    print("🛑 [CONTROL] Navigation stopped by user")
+    log.info("🛑 [CONTROL] Navigation stopped by user")
     navigation_stop_event.set()
 
 def quit_navigation():
     """Quit navigation completely - cancels everything and exits gracefully"""
-    print("🚪 [CONTROL] Navigation quit requested by user")
+    log.info("🚪 [CONTROL] Navigation quit requested by user")
     navigation_quit_event.set()
     navigation_stop_event.set()
     navigation_pause_event.clear()  # Clear pause if set
@@ -248,7 +316,7 @@ def quit_navigation():
 
 def reset_navigation_events():
     """Reset all navigation control events for new navigation"""
-    print("🔄 [CONTROL] Resetting navigation control events")
+    log.info("🔄 [CONTROL] Resetting navigation control events")
     navigation_stop_event.clear()
     navigation_pause_event.clear()
     navigation_quit_event.clear()
@@ -258,14 +326,14 @@ def reset_navigation_events():
     emergency_exit_in_progress = False
     navigation_phase = "forward"
 
-def update_map_tracking(map_ids, current_index, robot_ip=None):
+def update_map_tracking(map_ids, current_index):
     """Update current and upcoming map tracking information with actual map names.
     Respects current navigation direction (forward/backward)."""
     global current_map_id, current_map_name, upcoming_map_ids, upcoming_map_names, navigation_phase
     
     if 0 <= current_index < len(map_ids):
         current_map_id = map_ids[current_index]
-        current_map_name = get_map_name_by_id(current_map_id, robot_ip)
+        current_map_name = get_map_name_by_id(current_map_id)
 
         # Determine direction-aware upcoming indices
         if navigation_phase == "reverse":
@@ -283,19 +351,19 @@ def update_map_tracking(map_ids, current_index, robot_ip=None):
         upcoming_map_ids = [id1, id2]
 
         # Compute upcoming names
-        name1 = get_map_name_by_id(id1, robot_ip) if id1 else None
-        name2 = get_map_name_by_id(id2, robot_ip) if id2 else None
-        upcoming_map_names = [name1, name2]
+        upcoming_map_names = [get_map_name_by_id(id1), get_map_name_by_id(id2)]
 
-        print(f"🗺 [TRACKING] Current: {current_map_name} (ID: {current_map_id})")
-        print(f"🗺 [TRACKING] Upcoming: {upcoming_map_names[0]} (ID: {upcoming_map_ids[0]}), {upcoming_map_names[1]} (ID: {upcoming_map_ids[1]})")
+        log.info(f"🗺 [TRACKING] Current: {current_map_name} (ID: {current_map_id})")
+        log.info(f"🗺 [TRACKING] Upcoming: {upcoming_map_names[0]} (ID: {upcoming_map_ids[0]}), {upcoming_map_names[1]} (ID: {upcoming_map_ids[1]})")
     else:
         # Navigation completed
         current_map_id = None
         current_map_name = None
         upcoming_map_ids = [None, None]
         upcoming_map_names = [None, None]
-        print("🏁 [TRACKING] Navigation completed - no current map")
+        log.info("🏁 [TRACKING] Navigation completed - no current map")
+    
+    publish_map_tracking()
 
 def clear_map_tracking():
     """Clear all map tracking information"""
@@ -304,63 +372,43 @@ def clear_map_tracking():
     current_map_name = None
     upcoming_map_ids = [None, None]
     upcoming_map_names = [None, None]
-    print("🧹 [TRACKING] Map tracking cleared")
-
-def get_map_name_by_id(map_id, robot_ip=None):
-    """Get map name by ID from robot maps or cache"""
-    global robot_maps_cache
-    
+    log.info("🧹 [TRACKING] Map tracking cleared")
+    publish_map_tracking()
+
+def publish_map_tracking():
+    """Push the current/upcoming maps to event stream clients (same fields as /api/robot/current_map)"""
+    event_bus.publish("map_tracking", {
+        "current_map_id": current_map_id,
+        "current_map_name": current_map_name,
+        "upcoming_map_id_1": upcoming_map_ids[0],
+        "upcoming_map_name_1": upcoming_map_names[0],
+        "upcoming_map_id_2": upcoming_map_ids[1],
+        "upcoming_map_name_2": upcoming_map_names[1]
+    })
+
+def update_navigation_status(navigation_status, **changes):
+    """Update the shared navigation_status dict and push the changed keys to event stream clients"""
+    navigation_status.update(changes)
+    event_bus.publish("navigation_status", changes, merge=True)
+
+def get_map_name_by_id(map_id):
+    """Map name from the map registry, or a generic name until the registry knows the map"""
     if not map_id:
         return None
-    
-    # First check cache
-    for map_info in robot_maps_cache:
-        if map_info.get('id') == map_id:
-            return map_info.get('name', f"Map_{map_id[:8]}")
-    
-    # If not in cache and we have robot IP, try to fetch maps
-    if robot_ip:
-        try:
-            import requests
-            response = requests.get(f"http://localhost:5000/api/robot/maps", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success') and data.get('maps'):
-                    robot_maps_cache = data['maps']
-                    for map_info in robot_maps_cache:
-                        if map_info.get('id') == map_id:
-                            return map_info.get('name', f"Map_{map_id[:8]}")
-        except Exception as e:
-            print(f"⚠️ [TRACKING] Could not fetch maps for name lookup: {e}")
-    
-    # Fallback to generic name
-    return f"Map_{map_id[:8]}"
-
-def update_robot_maps_cache(maps_list):
-    """Update the robot maps cache with fresh data"""
-    global robot_maps_cache
-    robot_maps_cache = maps_list
-    print(f"🗺 [TRACKING] Updated maps cache with {len(maps_list)} maps")
+    return map_registry.name_for(map_id) or f"Map_{map_id[:8]}"
 
-def wait_for_localization(ws, timeout=15):
-    """Waits for the robot to confirm it is localized."""
-    print("⏳ [LOCALIZE] Waiting for robot to localize...")
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        res = receive_response(ws, timeout=1)
-        if res and res.get("cmd") == "notify_heart_beat":
-            # Code 2005 often means "localized and ready"
-            if res.get("code") == 2005:
-                print("✅ [LOCALIZE] Robot localized successfully.")
-                return True
-            # Some firmwares might just send position data in heartbeat when localized
-            elif "x" in res.get("data", {}):
-                print("✅ [LOCALIZE] Robot localized (position received).")
-                return True
-        time.sleep(0.5)
-    print("❌ [LOCALIZE] Localization timed out.")
-    return False
+def refresh_map_names(ws):
+    """Re-read the robot's map list in the background when the registry is stale"""
+    if not map_registry.is_fresh():
+        map_registry.refresh_async(lambda: fetch_map_list(ws), on_done=refresh_tracking_names)
 
+def refresh_tracking_names():
+    """Replace generic names in the map tracking once the registry has the real ones"""
+    global current_map_name, upcoming_map_names
+    names = [get_map_name_by_id(current_map_id)] + [get_map_name_by_id(map_id) for map_id in upcoming_map_ids]
+    if names != [current_map_name] + upcoming_map_names:
+        current_map_name, upcoming_map_names = names[0], names[1:]
+        publish_map_tracking()
 
 # Navigation status codes
 NAVI_CODES = {
@@ -402,12 +450,12 @@ class TTSManager:
             try:
                 self.engine = pyttsx3.init()
                 self.initialized = True
-                print("🔊 [TTS] Text-to-speech engine initialized successfully")
+                log.info("🔊 [TTS] Text-to-speech engine initialized successfully")
             except Exception as e:
-                print(f"⚠ [TTS] Failed to initialize TTS engine: {e}")
+                log.warning(f"⚠ [TTS] Failed to initialize TTS engine: {e}")
                 self.initialized = False
         else:
-            print("🔊 [TTS] pyttsx3 not available, TTS disabled")
+            log.info("🔊 [TTS] pyttsx3 not available, TTS disabled")
             self.initialized = False
         
         # Start thread regardless of initialization status
@@ -415,9 +463,9 @@ class TTSManager:
         self.thread.start()
         
         if self.initialized:
-            print("🔊 [TTS] Text-to-speech manager initialized successfully")
+            log.info("🔊 [TTS] Text-to-speech manager initialized successfully")
         else:
-            print("🔊 [TTS] Text-to-speech manager running in silent mode")
+            log.info("🔊 [TTS] Text-to-speech manager running in silent mode")
 
     def speak(self, text):
         """Add text to speech queue"""
@@ -436,13 +484,13 @@ class TTSManager:
                         self.engine.say(text)
                         self.engine.runAndWait()
                     except Exception as e:
-                        print(f"❌ [TTS] Error during speech: {e}")
+                        log.error(f"❌ [TTS] Error during speech: {e}")
                 else:
                     # Silent mode - just print what would be spoken
-                    print(f"🔊 [TTS] Would speak: {text}")
+                    log.info(f"🔊 [TTS] Would speak: {text}")
                     
             except Exception as e:
-                print(f"❌ [TTS] Error in TTS thread: {e}")
+                log.error(f"❌ [TTS] Error in TTS thread: {e}")
 
     def shutdown(self):
         """Shutdown TTS manager"""
@@ -450,28 +498,28 @@ class TTSManager:
             self.queue.put(None)  # Signal shutdown
             if self.thread and self.thread.is_alive():
                 self.thread.join(timeout=2)
-            print("✅ [TTS] TTS manager shut down")
+            log.info("✅ [TTS] TTS manager shut down")
         except Exception as e:
-            print(f"⚠ [TTS] Error during TTS shutdown: {e}")
+            log.warning(f"⚠ [TTS] Error during TTS shutdown: {e}")
 
 class ObstacleAvoidance:
     def __init__(self, tts_manager):
         self.status = ObstacleStatus.CLEAR
         self.tts = tts_manager
         self.obstacle_timeout = 30
-        print("🚧 [OBSTACLE] Obstacle avoidance system initialized")
+        log.info("🚧 [OBSTACLE] Obstacle avoidance system initialized")
 
     def handle_obstacle(self, ws):
         if self.status == ObstacleStatus.CLEAR:
             self.status = ObstacleStatus.DETECTED
-            print("🚧 [OBSTACLE] Obstacle detected! Starting avoidance procedure...")
+            log.info("🚧 [OBSTACLE] Obstacle detected! Starting avoidance procedure...")
             self.tts.speak("Obstacle detected. Attempting to avoid.")
             return self._attempt_obstacle_avoidance(ws)
         return False
 
     def _attempt_obstacle_avoidance(self, ws):
         self.status = ObstacleStatus.AVOIDING
-        print("🔄 [OBSTACLE] Attempting obstacle avoidance strategies...")
+        log.info("🔄 [OBSTACLE] Attempting obstacle avoidance strategies...")
         
         strategies = [
             self._wait_for_clearance,
@@ -480,509 +528,632 @@ class ObstacleAvoidance:
         ]
         
         for i, strategy in enumerate(strategies):
-            print(f"🔄 [OBSTACLE] Trying strategy {i+1}/3...")
+            log.info(f"🔄 [OBSTACLE] Trying strategy {i+1}/3...")
             if strategy(ws):
                 self.status = ObstacleStatus.CLEAR
-                print("✅ [OBSTACLE] Obstacle cleared! Resuming navigation...")
+                log.info("✅ [OBSTACLE] Obstacle cleared! Resuming navigation...")
                 self.tts.speak("Obstacle cleared. Resuming navigation.")
                 return True
         
-        print("❌ [OBSTACLE] All avoidance strategies failed. Manual intervention required.")
+        log.error("❌ [OBSTACLE] All avoidance strategies failed. Manual intervention required.")
         self.tts.speak("Unable to avoid obstacle. Manual intervention required.")
         return False
 
     def _wait_for_clearance(self, ws):
-        print(f"⏳ [OBSTACLE] Waiting for obstacle clearance (timeout: {self.obstacle_timeout}s)...")
+        log.info(f"⏳ [OBSTACLE] Waiting for obstacle clearance (timeout: {self.obstacle_timeout}s)...")
         start_time = time.time()
         
         while time.time() - start_time < self.obstacle_timeout:
             if navigation_quit_event.is_set():
-                print("🚪 [OBSTACLE] Quit requested during obstacle avoidance")
+                log.info("🚪 [OBSTACLE] Quit requested during obstacle avoidance")
                 return False
                 
-            send(ws, {"cmd": "request_check_path"})
-            res = receive_response(ws, timeout=2)
+            # The path-clear reply comes back under varying cmds, so watch every frame
+            with ws.subscribe() as replies:
+                send(ws, {"cmd": "request_check_path"})
+                res = receive_response(replies, timeout=2)
             
             if res and res.get("code") == 3002:
-                print("✅ [OBSTACLE] Path cleared by waiting!")
+                log.info("✅ [OBSTACLE] Path cleared by waiting!")
                 return True
                 
-            time.sleep(2)
+            if pause_for(2):
+                return False
         
-        print("⏳ [OBSTACLE] Wait timeout reached")
+        log.info("⏳ [OBSTACLE] Wait timeout reached")
         return False
 
     def _try_alternative_path(self, ws):
-        print("🔄 [OBSTACLE] Trying alternative path...")
+        log.info("🔄 [OBSTACLE] Trying alternative path...")
         send(ws, {"cmd": "request_alternative_path"})
-        time.sleep(3)
+        pause_for(3)
         return True
 
     def _slow_navigation(self, ws):
-        print("🐌 [OBSTACLE] Using slow navigation strategy...")
+        log.info("🐌 [OBSTACLE] Using slow navigation strategy...")
         return True
 
 # Initialize TTS and Obstacle Avoidance
 tts_manager = TTSManager()
 obstacle_avoidance = ObstacleAvoidance(tts_manager)
 
-def log_message(msg):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {msg}")
-
 def send(ws, msg):
     try:
-        ws.send(json.dumps(msg))
+        ws.send(msg)
         return True
     except Exception as e:
-        print(f"❌ [WEBSOCKET] Send error: {e}")
+        log.error(f"❌ [WEBSOCKET] Send error: {e}")
         return False
 
-def receive_response(ws, timeout=5):
+def receive_response(subscription, timeout=5):
+    """Wait for the next frame routed to this subscription; None on timeout"""
     try:
-        ws.settimeout(timeout)
-        return json.loads(ws.recv())
+        return subscription.get(timeout=timeout)
     except Exception as e:
         return None
 
+def await_reply(future, timeout):
+    """Wait for a robot call() future; None on timeout, failure or quit request"""
+    future.add_done_callback(lambda _: notify_control_change())
+    wait_for_control(lambda: future.done() or navigation_quit_event.is_set(), timeout)
+    if future.done() and not future.cancelled() and future.exception() is None:
+        return future.result()
+    future.cancel()
+    return None
+
+def is_robot_idle(res):
+    return res.get("code") == 2006
+
+@timed_phase("idle_wait")
+def wait_for_robot_idle(ws, timeout):
+    """Wait until the robot reports NAVI_IDLE (heartbeat 2006); False on timeout or quit"""
+    return await_reply(ws.expect("notify_heart_beat", match=is_robot_idle, timeout=timeout), timeout) is not None
+
+def stop_and_wait_idle(ws, timeout):
+    """Send a stop and wait for the idle heartbeat it produces; False on timeout or quit"""
+    return await_reply(ws.call(
+        "request_stop_navigation",
+        expect="notify_heart_beat",
+        match=is_robot_idle,
+        timeout=timeout
+    ), timeout) is not None
+
+@timed_phase("robot_stop")
+def stop_robot_firmly(ws, attempts=3):
+    """Stop navigation and keep re-sending the stop until the robot reports idle"""
+    for attempt in range(attempts):
+        if stop_and_wait_idle(ws, WAIT_TIMEOUTS["navigation_idle"]):
+            return True
+        log.info(f"🛑 [NAV] Robot not idle yet after stop command {attempt + 1}/{attempts}")
+    return False
+
 def close_websocket_gracefully(ws):
-    """Gracefully close websocket connection"""
+    """Stop navigation at the end of a run; the shared robot session stays open"""
     try:
-        print("🔌 [WEBSOCKET] Closing connection gracefully...")
+        log.info("🔌 [WEBSOCKET] Stopping navigation before releasing robot session...")
         
         # Cancel any ongoing navigation
         send(ws, {"cmd": "request_stop_navigation"})
-        time.sleep(0.5)
         
-        # Close the websocket
-        ws.close()
-        print("✅ [WEBSOCKET] Connection closed successfully")
+        log.info("✅ [WEBSOCKET] Robot session released")
         
     except Exception as e:
-        print(f"⚠ [WEBSOCKET] Error during graceful close: {e}")
-
-def get_battery_status(ws):
-    print("🔋 [BATTERY] Requesting battery status...")
-    
-    if not send(ws, {"cmd": "request_battery_info"}):
+        log.warning(f"⚠ [WEBSOCKET] Error during graceful close: {e}")
+
+def parse_battery_info(res):
+    """Turn a notify_battery_info frame into the engine's battery_info dict"""
+    data = res.get("data") or {}
+    battery_level = data.get("battery", 0)
+    return {
+        "battery_level": battery_level,
+        "charging_status": data.get("status", 0),
+        "needs_charging": battery_level < 20  # Use 20% as threshold like in the perfect code
+    }
+
+@timed_phase("undock")
+def undock_from_pile(ws):
+    """Leave the charging pile and wait until the battery stops reporting charging"""
+    log.info("🔌 [CHARGING] Undocking from charging pile...")
+    forget_last_arrival()
+    undock_timeout = WAIT_TIMEOUTS["undock"]
+    return await_reply(ws.call(
+        "request_dock_charge_off",
+        expect="notify_battery_info",
+        match=lambda r: (r.get("data") or {}).get("status") == 0,
+        timeout=undock_timeout
+    ), undock_timeout) is not None
+
+def request_battery_status(ws):
+    """Issue a battery query and return the reply future without waiting"""
+    return ws.call("request_battery_info", expect="notify_battery_info", timeout=10)
+
+def get_battery_status(ws, future=None):
+    """Read battery status, optionally from a query already issued with request_battery_status"""
+    log.debug("🔋 [BATTERY] Requesting battery status...")
+    
+    res = await_reply(future or request_battery_status(ws), 10)
+    if navigation_quit_event.is_set():
+        log.info("🚪 [BATTERY] Quit requested during battery check")
         return {"battery_level": 100, "charging_status": 0, "needs_charging": False}
     
-    start_time = time.time()
-    while time.time() - start_time < 10:
-        if navigation_quit_event.is_set():
-            print("🚪 [BATTERY] Quit requested during battery check")
-            return {"battery_level": 100, "charging_status": 0, "needs_charging": False}
-        
-        res = receive_response(ws, timeout=2)
-        if res:
-            cmd = res.get("cmd")
-            if cmd == "notify_battery_info":
-                data = res.get("data", {})
-                battery_level = data.get("battery", 0)
-                charging_status = data.get("status", 0)
-                
-                print(f"🔋 [BATTERY] Level: {battery_level}%, Charging Status: {charging_status}")
-                
-                return {
-                    "battery_level": battery_level,
-                    "charging_status": charging_status,
-                    "needs_charging": battery_level < 20  # Use 20% as threshold like in the perfect code
-                }
-        
-        time.sleep(0.5)
+    if res:
+        battery_info = parse_battery_info(res)
+        log.info(f"🔋 [BATTERY] Level: {battery_info['battery_level']}%, Charging Status: {battery_info['charging_status']}")
+        return battery_info
     
-    print("🔋 [BATTERY] Failed to get battery status, using default")
+    log.info("🔋 [BATTERY] Failed to get battery status, using default")
     return {"battery_level": 100, "charging_status": 0, "needs_charging": False}
 
-def dock_charge(ws, map_id, x, y, theta, max_attempts=3, full_level=95):
-    """PERFECT CHARGING PROCESS from the provided file - EXACT COPY"""
-    print(f"🔌 [CHARGING] Starting dock charge procedure at ({x}, {y}, {theta})")
-    
+def is_dock_outcome(res):
+    """True for the frames that end a docking attempt: success, no pile, or an unreachable goal"""
+    if res.get("cmd") == "response_dock_ctrl":
+        return res.get("code") in [0, 6016]
+    return "navigation goal out costmap" in res.get("msg", "")
+
+@timed_phase("docking")
+def dock_and_confirm_charging(ws, map_id, x, y, theta, max_attempts=3):
+    """Dock on the pile and wait for the battery to report charging, retrying up to max_attempts"""
     for attempt in range(max_attempts):
         if navigation_quit_event.is_set():
-            print("🚪 [CHARGING] Quit requested during charging")
+            log.info("🚪 [CHARGING] Quit requested during charging")
             return False
         
-        print(f"🔌 [CHARGING] Attempt {attempt + 1}/{max_attempts}")
-        
-        send(ws, {
-            "cmd": "request_dock_charge",
-            "data": {"mapId": map_id, "x": x, "y": y, "theta": theta}
-        })
+        log.info(f"🔌 [CHARGING] Attempt {attempt + 1}/{max_attempts}")
         
-        start_time = time.time()
-        timeout = 120
         charging_started = False
         docking_successful = False
         
-        while time.time() - start_time < timeout:
-            if navigation_quit_event.is_set():
-                return False
-            
-            res = receive_response(ws, timeout=2)
-            
-            if res:
-                cmd = res.get("cmd")
-                code = res.get("code")
-                print(f"🔌 [CHARGING] Dock response - cmd: {cmd}, code: {code}")
-                
-                if cmd == "response_dock_ctrl":
-                    if code == 0:
-                        print("🔌 [CHARGING] Docking successful!")
-                        docking_successful = True
-                        break
-                    elif code == 6016:
-                        print("🔌 [CHARGING] No charging pile detected")
-                        break
-                elif cmd == "notify_heart_beat":
-                    msg = res.get("msg", "")
-                    if "navigation goal out costmap" in msg:
-                        print("🔌 [CHARGING] Navigation goal out of costmap")
-                        break
+        res = await_reply(ws.call(
+            "request_dock_charge",
+            {"mapId": map_id, "x": x, "y": y, "theta": theta},
+            expect=("response_dock_ctrl", "notify_heart_beat"),
+            match=is_dock_outcome,
+            timeout=120
+        ), 120)
+        
+        if navigation_quit_event.is_set():
+            return False
+        
+        if res:
+            cmd = res.get("cmd")
+            code = res.get("code")
+            log.debug(f"🔌 [CHARGING] Dock response - cmd: {cmd}, code: {code}")
             
-            time.sleep(1)
+            if cmd == "response_dock_ctrl" and code == 0:
+                log.info("🔌 [CHARGING] Docking successful!")
+                docking_successful = True
+            elif cmd == "response_dock_ctrl":
+                log.info("🔌 [CHARGING] No charging pile detected")
+            else:
+                log.info("🔌 [CHARGING] Navigation goal out of costmap")
         
         if docking_successful:
-            print("🔌 [CHARGING] Verifying charging started...")
-            time.sleep(5)
+            log.info("🔌 [CHARGING] Verifying charging started...")
             
-            charging_confirmed = False
-            for check_attempt in range(3):
-                if navigation_quit_event.is_set():
-                    return False
-                
-                battery_info = get_battery_status(ws)
-                
-                if battery_info["charging_status"] in [1, 2]:
-                    print("🔌 [CHARGING] Charging confirmed!")
-                    charging_confirmed = True
-                    charging_started = True
-                    break
-                else:
-                    print(f"🔌 [CHARGING] Charging not confirmed, attempt {check_attempt + 1}/3")
-                    time.sleep(5)
+            # Wait for the battery to report charging instead of sampling it on a timer
+            confirm_timeout = WAIT_TIMEOUTS["charge_confirm"]
+            confirmation = await_reply(ws.call(
+                "request_battery_info",
+                expect="notify_battery_info",
+                match=lambda r: (r.get("data") or {}).get("status") in [1, 2],
+                timeout=confirm_timeout
+            ), confirm_timeout)
+            
+            if navigation_quit_event.is_set():
+                return False
             
-            if charging_confirmed:
+            if confirmation:
+                log.info("🔌 [CHARGING] Charging confirmed!")
+                charging_started = True
                 break
             else:
+                log.info(f"🔌 [CHARGING] Charging not confirmed within {confirm_timeout}s")
                 if attempt < max_attempts - 1:
-                    print("🔌 [CHARGING] Charging not confirmed, undocking and retrying...")
-                    send(ws, {"cmd": "request_dock_charge_off"})
-                    time.sleep(5)
+                    log.info("🔌 [CHARGING] Charging not confirmed, undocking and retrying...")
+                    undock_from_pile(ws)
                     continue
         
         if attempt < max_attempts - 1:
-            print("🔌 [CHARGING] Docking failed, waiting before retry...")
-            time.sleep(5)
+            log.info("🔌 [CHARGING] Docking failed, waiting before retry...")
+            if pause_for(WAIT_TIMEOUTS["dock_retry"]):
+                return False
             continue
         else:
-            print("🔌 [CHARGING] All docking attempts failed")
+            log.info("🔌 [CHARGING] All docking attempts failed")
             return False
     
     if not charging_started:
-        print("🔌 [CHARGING] Charging failed to start")
+        log.info("🔌 [CHARGING] Charging failed to start")
         return False
-    
-    # Monitor charging process
-    print(f"🔌 [CHARGING] Monitoring charging process until {full_level}%...")
+    return True
+
+@timed_phase("charging_monitor")
+def monitor_charging(ws, map_id, full_level=95):
+    """Follow battery updates on the pile until full_level; False if charging stops or quit"""
+    log.info(f"🔌 [CHARGING] Monitoring charging process until {full_level}%...")
     charging_complete = False
     start_time = time.time()
-    last_battery_check = time.time()
+    poll_timeout = WAIT_TIMEOUTS["battery_poll"]
     
     while time.time() - start_time < 3600:  # 1 hour max
         if navigation_quit_event.is_set():
-            print("🚪 [CHARGING] Quit requested during charging monitoring")
+            log.info("🚪 [CHARGING] Quit requested during charging monitoring")
             return False
         
-        if time.time() - last_battery_check >= 30:
-            battery_info = get_battery_status(ws)
-            last_battery_check = time.time()
-            
-            if battery_info["battery_level"] >= full_level:
-                print(f"🔌 [CHARGING] Charging complete! (Level: {battery_info['battery_level']}%)")
-                charging_complete = True
-                break
-            elif battery_info["charging_status"] == 0:
-                print("🔌 [CHARGING] Charging stopped unexpectedly")
-                return False
-        
-        time.sleep(5)
+        # React to every battery update the robot pushes; query actively only when it goes quiet
+        res = await_reply(ws.expect("notify_battery_info", timeout=poll_timeout), poll_timeout)
+        if navigation_quit_event.is_set():
+            continue
+        battery_info = parse_battery_info(res) if res else get_battery_status(ws)
+        
+        if battery_info["battery_level"] >= full_level:
+            log.info(f"🔌 [CHARGING] Charging complete! (Level: {battery_info['battery_level']}%)")
+            charging_complete = True
+            break
+        elif battery_info["charging_status"] == 0:
+            log.info("🔌 [CHARGING] Charging stopped unexpectedly")
+            return False
     
-    print(f"🔌 [CHARGING] Charging process finished - Success: {charging_complete}")
+    log.info(f"🔌 [CHARGING] Charging process finished - Success: {charging_complete}")
     return charging_complete
 
+def dock_charge(ws, map_id, x, y, theta, max_attempts=3, full_level=95):
+    """PERFECT CHARGING PROCESS from the provided file - EXACT COPY"""
+    log.info(f"🔌 [CHARGING] Starting dock charge procedure at ({x}, {y}, {theta})")
+    forget_last_arrival()
+    
+    if not dock_and_confirm_charging(ws, map_id, x, y, theta, max_attempts):
+        return False
+    return monitor_charging(ws, map_id, full_level)
+
+@timed_phase("localization_wait")
 def wait_for_localization(ws, timeout=15):
     """Waits for the robot to confirm it is localized."""
-    print("⏳ [LOCALIZE] Waiting for robot to localize...")
-    start_time = time.time()
+    log.info("⏳ [LOCALIZE] Waiting for robot to localize...")
+    
+    # Code 2005 often means "localized and ready"; some firmwares just send
+    # position data in the heartbeat once localized
+    res = await_reply(ws.expect(
+        "notify_heart_beat",
+        match=lambda r: r.get("code") == 2005 or "x" in (r.get("data") or {}),
+        timeout=timeout
+    ), timeout)
+    
+    if res and res.get("code") == 2005:
+        log.info("✅ [LOCALIZE] Robot localized successfully.")
+        return True
+    elif res:
+        log.info("✅ [LOCALIZE] Robot localized (position received).")
+        return True
     
-    while time.time() - start_time < timeout:
-        if navigation_quit_event.is_set():
-            return False
-        
-        res = receive_response(ws, timeout=1)
-        
-        if res and res.get("cmd") == "notify_heart_beat":
-            # Code 2005 often means "localized and ready"
-            if res.get("code") == 2005:
-                print("✅ [LOCALIZE] Robot localized successfully.")
-                return True
-            # Some firmwares might just send position data in heartbeat when localized
-            elif "x" in res.get("data", {}):
-                print("✅ [LOCALIZE] Robot localized (position received).")
-                return True
-        
-        time.sleep(0.5)
+    if navigation_quit_event.is_set():
+        return False
     
-    print("❌ [LOCALIZE] Localization timed out.")
+    log.error("❌ [LOCALIZE] Localization timed out.")
     return False
 
-def set_map(ws, map_name, map_id):
-    print(f"🗺 [MAP] Setting map: {map_name} (ID: {map_id})")
+def is_map_loaded(ws, map_id):
+    return (loaded_map["map_id"] == map_id
+            and loaded_map["session"] is ws
+            and loaded_map["connects"] == ws.connects
+            and ws.is_connected())
+
+def forget_loaded_map():
+    """Call whenever the robot's map may have changed outside set_map"""
+    loaded_map.update(map_id=None, session=None, connects=None)
+    forget_last_arrival()
+
+def forget_last_arrival():
+    last_arrival.update(map_id=None, point=None)
+
+def get_navigation_metrics():
+    """Engine counters and phase timing histograms for the /api/robot/navigation_metrics endpoint"""
+    return {
+        "map_switches": dict(map_switch_stats),
+        "loaded_map_id": loaded_map["map_id"],
+        "phases": phase_timings.snapshot(),
+        "phases_since": phase_timings.started_at,
+    }
+
+def collect_engine_metrics():
+    phases = Family("robot_navigation_phase_seconds", "histogram", "Duration of navigation engine phases per map, map_id=\"none\" for spans on no map (docking and charging_monitor cover charging)")
+    failures = Family("robot_navigation_phase_failures_total", "counter", "Navigation engine phases that failed")
+    for phase, map_id, histogram in phase_timings.histograms():
+        # Disjoint series: sum by (phase) gives the overall figures
+        phases.add(histogram, phase=phase, map_id=map_id or "none")
+        failures.add(histogram.failures, phase=phase, map_id=map_id or "none")
+    switches = Family("robot_map_switches_total", "counter", "set_map calls by outcome")
+    for outcome in ("requested", "performed", "avoided"):
+        switches.add(map_switch_stats[outcome], outcome=outcome)
+    relocations = Family("robot_relocations_avoided_total", "counter", "Legs that started without reset/relocate")
+    relocations.add(map_switch_stats["relocations_avoided"])
+    return [phases, failures, switches, relocations]
+
+registry.add_collector(collect_engine_metrics)
+
+def set_map(ws, map_name, map_id, force=False):
+    map_switch_stats["requested"] += 1
+    if not force and is_map_loaded(ws, map_id):
+        map_switch_stats["avoided"] += 1
+        log.info(f"🗺 [MAP] Map already loaded, skipping switch: {map_name} (ID: {map_id})")
+        return True
     
-    if not send(ws, {"cmd": "request_set_map", "data": {"mapId": map_id}}):
-        return False
+    log.info(f"🗺 [MAP] Setting map: {map_name} (ID: {map_id})")
+    forget_loaded_map()
+    
+    with phase_timings.span("map_switch", map_id) as span:
+        # Any response_set_map answers the switch; only code 1000 means it happened
+        res = await_reply(ws.call(
+            "request_set_map", {"mapId": map_id},
+            expect="response_set_map",
+            timeout=SET_MAP_TIMEOUT
+        ), SET_MAP_TIMEOUT)
+        switched = span.ok = res is not None and res.get("code") == 1000
+    
+    if switched:
+        log.info(f"🗺 [MAP] Map set successfully: {map_name}")
+        map_switch_stats["performed"] += 1
+        loaded_map.update(map_id=map_id, session=ws, connects=ws.connects)
+        return True
     
-    while True:
-        if navigation_quit_event.is_set():
-            return False
-        
-        res = receive_response(ws)
-        if res and res.get("cmd") == "response_set_map" and res.get("code") == 1000:
-            print(f"🗺 [MAP] Map set successfully: {map_name}")
-            return True
+    if res:
+        log.error(f"❌ [MAP] Robot rejected map switch to {map_name}: code {res.get('code')} ({res.get('msg', 'no message')})")
+    elif not navigation_quit_event.is_set():
+        log.error(f"❌ [MAP] Map switch not confirmed within {SET_MAP_TIMEOUT}s: {map_name}")
+    return False
 
-def get_points(ws, map_id):
-    print(f"🗺 [MAP] Getting points for map ID: {map_id}")
-    
-    if not send(ws, {"cmd": "request_point_list", "data": {"mapId": map_id}}):
+def request_points(ws, map_id):
+    """Issue a point list query and return the reply future without waiting.
+
+    response_point_list does not say which map it lists, so point list queries
+    (the leg's own, the charge station prefetch and background refreshes) go
+    out one at a time: the call waits until no other one is outstanding.
+    """
+    return ws.call(
+        "request_point_list", {"mapId": map_id},
+        expect="response_point_list",
+        match=lambda r: r.get("code") == 0,
+        timeout=5,
+        exclusive=True
+    )
+
+@timed_phase("point_fetch")
+def get_points(ws, map_id, future=None):
+    """Fetch a map's points, optionally from a query already issued with request_points"""
+    log.debug(f"🗺 [MAP] Getting points for map ID: {map_id}")
+    
+    res = await_reply(future or request_points(ws, map_id), 5)
+    if res:
+        points = res.get("data", {}).get("points", [])
+        log.info(f"🗺 [MAP] Found {len(points)} points")
+        return points
+    
+    if navigation_quit_event.is_set():
         return []
     
-    start = time.time()
-    while time.time() - start < 5:
-        if navigation_quit_event.is_set():
-            return []
-        
-        res = receive_response(ws, timeout=1)
-        if res and res.get("cmd") == "response_point_list" and res.get("code") == 0:
-            points = res.get("data", {}).get("points", [])
-            print(f"🗺 [MAP] Found {len(points)} points")
-            return points
-    
-    print(f"🗺 [MAP] No points found for map ID: {map_id}")
+    log.info(f"🗺 [MAP] No points found for map ID: {map_id}")
     return []
 
+def fetch_points_quietly(ws, map_id):
+    """Point list query for background refreshes; not interrupted by quit and never logs"""
+    res = request_points(ws, map_id).result(timeout=5)
+    return (res.get("data") or {}).get("points", [])
+
+def prefetch_map_points(ws, map_id):
+    """Put a point list query in flight only when the waypoint cache cannot answer it"""
+    if waypoint_cache.is_fresh(map_id):
+        return None
+    return request_points(ws, map_id)
+
+def has_leg_waypoints(points):
+    types = {p.get("type") for p in points}
+    return "anchor_point" in types and "destination" in types
+
+def prefetch_upcoming_points(ws):
+    """Fetch the upcoming maps' points in the background while the current leg drives.
+
+    Uses the upcoming_map_ids computed by update_map_tracking. Lists without
+    both an anchor and a destination are not cached, so the leg that needs them
+    still goes to the robot and reports the problem itself.
+    """
+    for map_id in upcoming_map_ids:
+        if not map_id or waypoint_cache.is_fresh(map_id):
+            continue
+
+        def fetch(map_id=map_id):
+            points = fetch_points_quietly(ws, map_id)
+            return points if has_leg_waypoints(points) else []
+
+        if waypoint_cache.refresh_async(map_id, fetch):
+            log.debug(f"🗺 [MAP] Prefetching points for upcoming map {map_id}")
+
+def get_map_points(ws, map_id, future=None):
+    """Return a map's points from the waypoint cache, asking the robot only on a miss.
+
+    Entries past their TTL are served as-is while a background refresh replaces them.
+    """
+    cached = waypoint_cache.get(map_id)
+    if cached:
+        points, age = cached
+        if future is not None:
+            future.cancel()
+        if age >= waypoint_cache.ttl:
+            waypoint_cache.refresh_async(map_id, lambda: fetch_points_quietly(ws, map_id))
+        log.info(f"🗺 [MAP] Using {len(points)} cached points for map ID: {map_id} (age {age:.0f}s)")
+        return points
+    
+    points = get_points(ws, map_id, future=future)
+    waypoint_cache.put(map_id, points)
+    return points
+
 def reset_map(ws):
-    print("🗺 [MAP] Resetting map")
-    send(ws, {"cmd": "request_reset_map"})
-    time.sleep(2)
+    log.info("🗺 [MAP] Resetting map")
+    # Returns as soon as the robot acknowledges; the timeout bounds firmware that stays silent
+    reset_timeout = WAIT_TIMEOUTS["reset_map"]
+    await_reply(ws.call("request_reset_map", expect="response_reset_map", timeout=reset_timeout), reset_timeout)
 
 def relocate(ws, x, y, theta, mode=2):
-    print(f"📍 [RELOCATE] Relocating to ({x}, {y}, {theta}) with mode {mode}")
+    log.info(f"📍 [RELOCATE] Relocating to ({x}, {y}, {theta}) with mode {mode}")
+    
+    # Any response_relocate_position answers the request; only code 4000 accepts it
+    res = await_reply(ws.call(
+        "request_force_relocate", {"x": x, "y": y, "theta": theta, "mode": mode},
+        expect="response_relocate_position",
+        timeout=10
+    ), 10)
+    
+    if res and res.get("code") == 4000:
+        log.info("📍 [RELOCATE] Relocation command acknowledged")
+        return True
     
-    if not send(ws, {"cmd": "request_force_relocate", "data": {"x": x, "y": y, "theta": theta, "mode": mode}}):
+    if res:
+        log.error(f"❌ [RELOCATE] Robot rejected relocation: code {res.get('code')} ({res.get('msg', 'no message')})")
         return False
     
-    start_time = time.time()
-    while time.time() - start_time < 10:
-        if navigation_quit_event.is_set():
-            return False
-        
-        res = receive_response(ws)
-        if res and res.get("cmd") == "response_relocate_position" and res.get("code") == 4000:
-            print("📍 [RELOCATE] Relocation command acknowledged")
-            return True
+    if navigation_quit_event.is_set():
+        return False
     
-    print("❌ [RELOCATE] Relocation command failed or timed out")
+    log.error("❌ [RELOCATE] Relocation command failed or timed out")
     return False
 
+def can_skip_relocation(ws, map_id, point):
+    """True when the last leg ended at this point on the loaded map and the latest heartbeat pose agrees"""
+    if not is_map_loaded(ws, map_id) or last_arrival["map_id"] != map_id:
+        return False
+    if last_arrival["point"] != (point["x"], point["y"], point["theta"]):
+        return False
+    received_at, heartbeat = ws.latest("notify_heart_beat")
+    if heartbeat is None or time.time() - received_at > POSE_MAX_AGE:
+        return False
+    pose = heartbeat.get("data") or {}
+    if "x" not in pose or "y" not in pose:
+        return False
+    return math.hypot(pose["x"] - point["x"], pose["y"] - point["y"]) <= RELOCATE_SKIP_TOLERANCE
+
+@timed_phase("relocation")
 def relocate_with_retry(ws, x, y, theta, retries=3):
     for attempt in range(retries):
         if navigation_quit_event.is_set():
             return False
         
-        print(f"📍 [RELOCATE] Attempt {attempt + 1}/{retries}")
+        log.info(f"📍 [RELOCATE] Attempt {attempt + 1}/{retries}")
         
         reset_map(ws)
         
         if relocate(ws, x, y, theta):
             # After a successful relocation command, wait for localization confirmation
             if wait_for_localization(ws):
-                print("✅ [RELOCATE] Relocation and localization confirmed.")
+                log.info("✅ [RELOCATE] Relocation and localization confirmed.")
                 return True
             else:
-                print("⚠️ [RELOCATE] Relocation acknowledged, but localization failed.")
+                log.warning("⚠️ [RELOCATE] Relocation acknowledged, but localization failed.")
         
         if attempt < retries - 1:
-            print(f"❌ [RELOCATE] Relocation attempt failed, retrying in 5 seconds...")
-            time.sleep(5)
+            log.error(f"❌ [RELOCATE] Relocation attempt failed, retrying in {WAIT_TIMEOUTS['relocate_retry']} seconds...")
+            if pause_for(WAIT_TIMEOUTS["relocate_retry"]):
+                return False
     
-    print("❌ [RELOCATE] All relocation attempts failed.")
+    log.error("❌ [RELOCATE] All relocation attempts failed.")
     return False
 
 def cancel_current_navigation(ws):
-    print("🛑 [NAV] Canceling current navigation")
-    send(ws, {"cmd": "request_stop_navigation"})
-    time.sleep(1)
-    
-    try:
-        # Clear any pending responses
-        while True:
-            res = receive_response(ws, timeout=0.1)
-            if not res:
-                break
-    except:
-        pass
+    log.debug("🛑 [NAV] Canceling current navigation")
+    return stop_and_wait_idle(ws, WAIT_TIMEOUTS["navigation_idle"])
 
 def ensure_robot_ready_for_navigation(ws):
-    print("🤖 [NAV] Ensuring robot is ready for navigation")
-    
-    cancel_current_navigation(ws)
-    time.sleep(1)
-    
-    send(ws, {"cmd": "request_robot_status"})
-    res = receive_response(ws, timeout=3)
+    log.debug("🤖 [NAV] Ensuring robot is ready for navigation")
     
-    max_wait = 10
-    wait_time = 0
+    if cancel_current_navigation(ws):
+        log.debug("🤖 [NAV] Robot ready for navigation")
+        return True
     
-    while wait_time < max_wait:
-        if navigation_quit_event.is_set():
-            return False
-        
+    # Firmware answers request_robot_status under different cmds, so watch every frame
+    with ws.subscribe() as replies:
         send(ws, {"cmd": "request_robot_status"})
-        res = receive_response(ws, timeout=1)
+        res = receive_response(replies, timeout=3)
         
-        if res and res.get("code") in [2006, 0]:
-            print("🤖 [NAV] Robot ready for navigation")
-            return True
+        max_wait = 10
+        wait_time = 0
         
-        time.sleep(1)
-        wait_time += 1
+        while wait_time < max_wait:
+            if navigation_quit_event.is_set():
+                return False
+            
+            send(ws, {"cmd": "request_robot_status"})
+            res = receive_response(replies, timeout=1)
+            
+            if res and res.get("code") in [2006, 0]:
+                log.debug("🤖 [NAV] Robot ready for navigation")
+                return True
+            
+            wait_time += 1
     
-    print("🤖 [NAV] Robot ready (timeout reached)")
+    log.info("🤖 [NAV] Robot ready (timeout reached)")
     return True
 
+@timed_phase(lambda arguments: "emergency_navigation" if arguments.get("emergency_mode") else "navigation")
 def start_navigation_and_wait_completion(ws, x, y, theta, speed=0.5, navigation_control=None, emergency_mode=False):
     # Use slower speed for emergency mode to prevent overshooting
     if emergency_mode:
         speed = 0.15  # Even slower speed for emergency mode as in perfect code
-        print(f"🚨 [NAV] Emergency navigation mode - using reduced speed: {speed}")
+        log.info(f"🚨 [NAV] Emergency navigation mode - using reduced speed: {speed}")
     
-    print(f"🧭 [NAV] Starting navigation to ({x}, {y}, {theta}) with speed {speed}")
+    log.info(f"🧭 [NAV] Starting navigation to ({x}, {y}, {theta}) with speed {speed}")
     
     if not ensure_robot_ready_for_navigation(ws):
         return False
     
-    if not send(ws, {"cmd": "request_start_navigation", "data": {"x": x, "y": y, "theta": theta, "speed": speed}}):
-        return False
-    
-    start_time = time.time()
-    timeout = 180
-    navigation_started = False
-    navigation_running = False
-    is_paused = False
-    pause_count = 0
-    
-    while True:
-        # Check for quit first
-        if navigation_quit_event.is_set():
-            print("🚪 [NAV] Quit requested during navigation")
-            send(ws, {"cmd": "request_stop_navigation"})
+    # Control changes interrupt the heartbeat read, so pause, stop and quit act at once
+    with ws.subscribe("response_start_navigation", "notify_heart_beat") as nav_events, engine_control.wakeup(nav_events.wake):
+        if not send(ws, {"cmd": "request_start_navigation", "data": {"x": x, "y": y, "theta": theta, "speed": speed}}):
             return False
+    
+        start_time = time.time()
+        timeout = 180
+        navigation_started = False
+        navigation_running = False
+        pause_count = 0
+    
+        while True:
+            # Check for quit first
+            if navigation_quit_event.is_set():
+                log.info("🚪 [NAV] Quit requested during navigation")
+                send(ws, {"cmd": "request_stop_navigation"})
+                return False
         
-        # Check for emergency exit first (but not if we're already in emergency mode)
-        if not emergency_mode and check_emergency_exit_during_navigation(ws, navigation_control):
-            print("🚨 [NAV] Emergency exit executed during navigation")
-            return False  # Emergency exit was executed
+            # Check for emergency exit first (but not if we're already in emergency mode)
+            if not emergency_mode and check_emergency_exit_during_navigation(ws, navigation_control):
+                log.info("🚨 [NAV] Emergency exit executed during navigation")
+                return False  # Emergency exit was executed
         
-        # Check for force stop
-        if navigation_control and navigation_control.get('force_stop') and navigation_control['force_stop'].is_set():
-            print("🛑 [NAV] Force stop detected")
-            send(ws, {"cmd": "request_stop_navigation"})
-            return False
+            # Check for force stop
+            if navigation_control and navigation_control.get('force_stop') and navigation_control['force_stop'].is_set():
+                log.info("🛑 [NAV] Force stop detected")
+                send(ws, {"cmd": "request_stop_navigation"})
+                return False
         
-        # Check global stop event
-        if navigation_stop_event.is_set():
-            print("🛑 [NAV] Global stop event detected")
-            send(ws, {"cmd": "request_stop_navigation"})
-            return False
+            # Check global stop event
+            if navigation_stop_event.is_set():
+                log.info("🛑 [NAV] Global stop event detected")
+                send(ws, {"cmd": "request_stop_navigation"})
+                return False
         
-        # Handle pause/resume logic using navigation_pause_event
-        if navigation_pause_event.is_set():
-            if not is_paused:
-                print("⏸ [NAV] Navigation paused")
+            # Pause: stop the robot and sleep on the control condition until resume, stop or quit
+            if navigation_pause_event.is_set():
+                log.info("⏸ [NAV] Navigation paused")
                 send(ws, {"cmd": "request_stop_navigation"})
-                is_paused = True
                 pause_count += 1
-                
-                # Clear any pending responses
-                time.sleep(1)
-                try:
-                    while True:
-                        res = receive_response(ws, timeout=0.1)
-                        if not res:
-                            break
-                except:
-                    pass
-            
-            # Wait until pause is cleared
-            while navigation_pause_event.is_set():
-                if navigation_quit_event.is_set():
-                    return False
-                time.sleep(0.2)
-            
-            if is_paused:
-                print("▶ [NAV] Navigation resumed")
-                
-                # For multiple pauses, ensure robot is properly reset
-                if pause_count > 1:
-                    if not ensure_robot_ready_for_navigation(ws):
-                        return False
-                    time.sleep(2)
-                else:
-                    time.sleep(1)
-                
-                if not send(ws, {"cmd": "request_start_navigation", "data": {"x": x, "y": y, "theta": theta, "speed": speed}}):
+                if not engine_control.wait_while_paused():
+                    log.info("🛑 [NAV] Stop or quit requested while paused")
                     return False
+                log.info("▶ [NAV] Navigation resumed")
                 
-                start_time = time.time()
-                navigation_started = False
-                navigation_running = False
-                is_paused = False
-                time.sleep(0.5)
-        
-        # Handle navigation_control pause logic (backward compatibility)
-        if navigation_control and navigation_control.get('paused') and navigation_control['paused'].is_set():
-            if not is_paused:
-                print("⏸ [NAV] Navigation control pause triggered")
-                send(ws, {"cmd": "request_stop_navigation"})
-                is_paused = True
-                pause_count += 1
+                # Drop heartbeats and replies that queued up during the pause
+                nav_events.drain()
                 
-                time.sleep(1)
-                try:
-                    while True:
-                        res = receive_response(ws, timeout=0.1)
-                        if not res:
-                            break
-                except:
-                    pass
-            
-            while navigation_control['paused'].is_set():
-                if navigation_quit_event.is_set():
+                # After repeated pauses make sure the robot has fully stopped before restarting
+                if pause_count > 1 and not ensure_robot_ready_for_navigation(ws):
                     return False
-                time.sleep(0.2)
-            
-            if is_paused:
-                print("▶ [NAV] Navigation control resume triggered")
-                
-                if pause_count > 1:
-                    if not ensure_robot_ready_for_navigation(ws):
-                        return False
-                    time.sleep(2)
-                else:
-                    time.sleep(1)
                 
                 if not send(ws, {"cmd": "request_start_navigation", "data": {"x": x, "y": y, "theta": theta, "speed": speed}}):
                     return False
@@ -990,166 +1161,246 @@ def start_navigation_and_wait_completion(ws, x, y, theta, speed=0.5, navigation_
                 start_time = time.time()
                 navigation_started = False
                 navigation_running = False
-                is_paused = False
-                time.sleep(0.5)
+                continue
         
-        res = receive_response(ws, timeout=1)
+            res = receive_response(nav_events, timeout=0.5)
         
-        if res:
-            cmd = res.get("cmd")
-            code = res.get("code")
-            code_description = NAVI_CODES.get(code, f"Unknown code: {code}")
+            if res:
+                cmd = res.get("cmd")
+                code = res.get("code")
+                code_description = NAVI_CODES.get(code, f"Unknown code: {code}")
             
-            if cmd == "response_start_navigation" and (code == 1001 or res.get('msg') == 'navigation success'):
-                print("✅ [NAV] Navigation started successfully")
-                navigation_started = True
+                if cmd == "response_start_navigation" and (code == 1001 or res.get('msg') == 'navigation success'):
+                    log.info("✅ [NAV] Navigation started successfully")
+                    navigation_started = True
                 
-            elif cmd == "notify_heart_beat":
-                if code == 6100 or code == 2007:
-                    if not navigation_running:
-                        print("🏃 [NAV] Navigation is running")
-                        navigation_running = True
+                elif cmd == "notify_heart_beat":
+                    if code == 6100 or code == 2007:
+                        if not navigation_running:
+                            log.info("🏃 [NAV] Navigation is running")
+                            navigation_running = True
                         
-                elif code == 2006:
-                    if navigation_started and navigation_running:
-                        print("🎯 [NAV] Navigation completed successfully!")
+                    elif code == 2006:
+                        if navigation_started and navigation_running:
+                            log.info("🎯 [NAV] Navigation completed successfully!")
                         
-                        # ENHANCED STOPPING PROCEDURE FOR PRECISE DESTINATION REACH
-                        if emergency_mode:
-                            print("🛑 [EMERGENCY] Executing precision stop at destination...")
+                            # ENHANCED STOPPING PROCEDURE FOR PRECISE DESTINATION REACH
+                            if emergency_mode:
+                                log.info("🛑 [EMERGENCY] Executing precision stop at destination...")
                             
-                            # Multiple immediate stop commands for emergency mode
-                            for i in range(3):
-                                send(ws, {"cmd": "request_stop_navigation"})
-                                print(f"🛑 [EMERGENCY] Precision stop command {i+1}/3")
-                                time.sleep(0.2)
+                                # Re-send the stop until the robot confirms it is idle
+                                stop_robot_firmly(ws)
                             
-                            # Verify final position
-                            time.sleep(1)
-                            send(ws, {"cmd": "request_robot_status"})
-                            final_status = receive_response(ws, timeout=2)
-                            if final_status:
-                                print(f"🤖 [EMERGENCY] Final robot status: {final_status}")
+                                # Verify final position
+                                with ws.subscribe() as replies:
+                                    send(ws, {"cmd": "request_robot_status"})
+                                    final_status = receive_response(replies, timeout=2)
+                                if final_status:
+                                    log.info(f"🤖 [EMERGENCY] Final robot status: {final_status}")
                         
-                        return True
-                    else:
-                        print("⚠ [NAV] Navigation completed but not properly started/running")
+                            return True
+                        else:
+                            log.debug("⚠ [NAV] Navigation completed but not properly started/running")
                         
-                elif code == 3001:
-                    print("🚧 [NAV] Obstacle detected during navigation")
-                    obstacle_avoidance.handle_obstacle(ws)
+                    elif code == 3001:
+                        log.info("🚧 [NAV] Obstacle detected during navigation")
+                        obstacle_avoidance.handle_obstacle(ws)
                     
-                elif code == 4001:
-                    print("🚨 [NAV] Emergency stop activated")
-                    return False
-        
-        if time.time() - start_time > timeout:
-            print("⏰ [NAV] Navigation timeout reached")
-            return False
+                    elif code == 4001:
+                        log.info("🚨 [NAV] Emergency stop activated")
+                        return False
         
-        time.sleep(0.1)
+            if time.time() - start_time > timeout:
+                log.warning("⏰ [NAV] Navigation timeout reached")
+                NAVIGATION_TIMEOUTS.inc(map_id=loaded_map["map_id"])
+                return False
 
 def execute_charging_phase(ws, charge_map_id, charge_anchor, charge_pile, target_level=95):
-    print(f"🔌 [CHARGING] Starting charging phase (target: {target_level}%)")
+    log.info(f"🔌 [CHARGING] Starting charging phase (target: {target_level}%)")
     
     if not set_map(ws, "charge_station", charge_map_id):
         return False
     
     if not relocate_with_retry(ws, charge_anchor["x"], charge_anchor["y"], charge_anchor["theta"]):
-        print("❌ [CHARGING] Failed to relocate to charging anchor")
+        log.error("❌ [CHARGING] Failed to relocate to charging anchor")
         return False
     
     charging_success = dock_charge(ws, charge_map_id, charge_pile["x"], charge_pile["y"], charge_pile["theta"], full_level=target_level)
     
     if charging_success:
         # Undock after charging to prepare for next navigation
-        print("🔌 [CHARGING] Undocking from charging pile...")
-        send(ws, {"cmd": "request_dock_charge_off"})
-        time.sleep(5)  # Wait for undock to complete
-        print("✅ [CHARGING] Charging phase completed successfully")
+        undock_from_pile(ws)
+        log.info("✅ [CHARGING] Charging phase completed successfully")
     else:
-        print("❌ [CHARGING] Charging phase failed")
+        log.error("❌ [CHARGING] Charging phase failed")
     
     return charging_success
 
 def check_battery_and_charge_if_needed(ws, charge_map_id, charge_anchor, charge_pile, threshold=20, target_level=95):
-    print(f"🔋 [BATTERY] Checking battery level (threshold: {threshold}%, target: {target_level}%)...")
+    log.info(f"🔋 [BATTERY] Checking battery level (threshold: {threshold}%, target: {target_level}%)...")
     
     battery_info = get_battery_status(ws)
     
     if battery_info["battery_level"] < threshold:
-        print(f"🔋 [BATTERY] Battery level ({battery_info['battery_level']}%) below threshold. Charging required.")
+        log.info(f"🔋 [BATTERY] Battery level ({battery_info['battery_level']}%) below threshold. Charging required.")
         return execute_charging_phase(ws, charge_map_id, charge_anchor, charge_pile, target_level)
     else:
-        print(f"✅ [BATTERY] Battery level ({battery_info['battery_level']}%) sufficient. No charging needed.")
+        log.info(f"✅ [BATTERY] Battery level ({battery_info['battery_level']}%) sufficient. No charging needed.")
         return True
 
-def execute_map_navigation(ws, map_name, map_id, navigation_control=None, reverse_mode=False, max_retries=9999, emergency_mode=False):
-    print(f"🗺 [NAV] Starting map navigation - Map: {map_name}, ID: {map_id}, Reverse: {reverse_mode}, Emergency: {emergency_mode}")
+# --- NAVIGATION STATE MACHINE ---
+class NavState(Enum):
+    """States of the patrol engine; the time spent in each is recorded as phase state_<value>"""
+    IDLE = "idle"                      # Between cycles: attach the robot session, set up the charge station
+    CHARGING = "charging"              # Battery check (and docking when low) before and after a cycle's legs
+    SWITCHING_MAP = "switching_map"    # Load a leg's map and its anchor/destination points
+    RELOCATING = "relocating"          # Localize at the leg's start point
+    NAVIGATING = "navigating"          # Drive to the leg's end point
+    PAUSED = "paused"                  # Between legs while the pause flag is set
+    EMERGENCY_EXIT = "emergency_exit"  # Leave through the emergency map
+    DONE = "done"
+
+class MapLeg:
+    """One map leg as SWITCHING_MAP -> RELOCATING -> NAVIGATING steps.
+
+    Each step returns the next state, or None once the leg is over and result
+    holds its outcome. A failed step backs off and starts a new attempt at
+    SWITCHING_MAP, up to max_retries attempts. run() drives the steps itself
+    (execute_map_navigation, emergency legs); PatrolEngine drives them as its
+    own states.
+    """
+    
+    def __init__(self, map_name, map_id, navigation_control=None, reverse_mode=False, max_retries=9999, emergency_mode=False):
+        self.map_name = map_name
+        self.map_id = map_id
+        self.navigation_control = navigation_control
+        self.reverse_mode = reverse_mode
+        self.max_retries = max_retries
+        self.emergency_mode = emergency_mode
+        self.attempt = 0
+        self.refetched_points = False
+        self.start_point = None
+        self.end_point = None
+        self.result = None
+        log.info(f"🗺 [NAV] Starting map navigation - Map: {map_name}, ID: {map_id}, Reverse: {reverse_mode}, Emergency: {emergency_mode}")
+    
+    def finish(self, success):
+        self.result = success
+        return None
     
-    for attempt in range(max_retries):
+    def begin_attempt(self):
+        """Check the control flags and count a new attempt; SWITCHING_MAP, or None when the leg is over"""
+        if self.attempt >= self.max_retries:
+            log.error(f"❌ [NAV] All navigation attempts failed for map: {self.map_name}")
+            return self.finish(False)
+        
         if navigation_quit_event.is_set():
-            print("🚪 [MAP NAV] Quit requested")
-            return False
+            log.info("🚪 [MAP NAV] Quit requested")
+            return self.finish(False)
         
-        print(f"🔄 [NAV] Navigation attempt {attempt + 1}/{max_retries}")
+        self.attempt += 1
+        log.info(f"🔄 [NAV] Navigation attempt {self.attempt}/{self.max_retries}")
+        NAVIGATION_ATTEMPTS.inc(map_id=self.map_id)
         
         # Check for emergency exit (but not if we're already in emergency mode)
-        if not emergency_mode and emergency_exit_event.is_set():
-            print("🚨 [MAP NAV] Emergency exit detected, stopping navigation")
-            return False
+        if not self.emergency_mode and emergency_exit_event.is_set():
+            log.info("🚨 [MAP NAV] Emergency exit detected, stopping navigation")
+            return self.finish(False)
         
-        if navigation_control and navigation_control.get('force_stop') and navigation_control['force_stop'].is_set():
-            print("🛑 [MAP NAV] Force stop detected")
-            return False
+        if self.navigation_control and self.navigation_control.get('force_stop') and self.navigation_control['force_stop'].is_set():
+            log.info("🛑 [MAP NAV] Force stop detected")
+            return self.finish(False)
         
         if navigation_stop_event.is_set():
-            print("🛑 [MAP NAV] Global stop detected")
-            return False
+            log.info("🛑 [MAP NAV] Global stop detected")
+            return self.finish(False)
         
+        return NavState.SWITCHING_MAP
+    
+    def retry(self, reason, backoff=None):
+        """Count a retry, back off for WAIT_TIMEOUTS[backoff] and start the next attempt"""
+        NAVIGATION_RETRIES.inc(map_id=self.map_id, reason=reason)
+        if backoff and pause_for(WAIT_TIMEOUTS[backoff]):
+            return self.finish(False)
+        return self.begin_attempt()
+    
+    def switch_map(self, ws):
         cancel_current_navigation(ws)
         
-        if not set_map(ws, map_name, map_id):
-            return False
+        if not set_map(ws, self.map_name, self.map_id):
+            return self.finish(False)
         
-        points = get_points(ws, map_id)
+        points = get_map_points(ws, self.map_id)
         if not points:
-            print(f"❌ [NAV] No points found for map {map_name}")
-            return False
+            log.error(f"❌ [NAV] No points found for map {self.map_name}")
+            return self.finish(False)
         
         anchor = next((p for p in points if p.get("type") == "anchor_point"), None)
         dest = next((p for p in points if p.get("type") == "destination"), None)
         
         if not anchor or not dest:
-            print(f"❌ [NAV] Missing waypoints for map {map_name} - Anchor: {anchor is not None}, Dest: {dest is not None}")
-            return False
+            log.error(f"❌ [NAV] Missing waypoints for map {self.map_name} - Anchor: {anchor is not None}, Dest: {dest is not None}")
+            if self.refetched_points:
+                return self.finish(False)
+            # The cached list may predate an edit on the robot; retry once with fresh points
+            waypoint_cache.invalidate(self.map_id)
+            self.refetched_points = True
+            return self.retry("missing_waypoints")
         
         # Swap anchor and dest if reverse_mode
-        start_point, end_point = (dest, anchor) if reverse_mode else (anchor, dest)
-        
-        print(f"📍 [NAV] Start point: ({start_point['x']}, {start_point['y']}, {start_point['theta']})")
-        print(f"🎯 [NAV] End point: ({end_point['x']}, {end_point['y']}, {end_point['theta']})")
-        
-        if not relocate_with_retry(ws, start_point["x"], start_point["y"], start_point["theta"]):
-            print(f"❌ [NAV] Failed to relocate to start point, attempt {attempt + 1}")
-            time.sleep(5)
-            continue
-        
-        time.sleep(2)
-        
-        success = start_navigation_and_wait_completion(ws, end_point["x"], end_point["y"], end_point["theta"], navigation_control=navigation_control, emergency_mode=emergency_mode)
-        
-        if success:
-            print(f"✅ [NAV] Map navigation completed successfully: {map_name}")
-            return True
-        else:
-            print(f"❌ [NAV] Map navigation failed: {map_name}, attempt {attempt + 1}")
-            time.sleep(10)  # Wait before retrying
-    
-    print(f"❌ [NAV] All navigation attempts failed for map: {map_name}")
-    return False
+        self.start_point, self.end_point = (dest, anchor) if self.reverse_mode else (anchor, dest)
+        
+        log.info(f"📍 [NAV] Start point: ({self.start_point['x']}, {self.start_point['y']}, {self.start_point['theta']})")
+        log.info(f"🎯 [NAV] End point: ({self.end_point['x']}, {self.end_point['y']}, {self.end_point['theta']})")
+        return NavState.RELOCATING
+    
+    def relocate(self, ws):
+        start_point = self.start_point
+        if can_skip_relocation(ws, self.map_id, start_point):
+            # The previous leg finished here on this map and the robot is still localized
+            map_switch_stats["relocations_avoided"] += 1
+            log.info("📍 [NAV] Robot already localized at start point, skipping reset/relocate")
+            return NavState.NAVIGATING
+        
+        if relocate_with_retry(ws, start_point["x"], start_point["y"], start_point["theta"]):
+            return NavState.NAVIGATING
+        
+        log.error(f"❌ [NAV] Failed to relocate to start point, attempt {self.attempt}")
+        # The start point may have been moved on the robot; fetch it again next attempt
+        waypoint_cache.invalidate(self.map_id)
+        return self.retry("relocation", backoff="relocate_retry")
+    
+    def navigate(self, ws):
+        end_point = self.end_point
+        forget_last_arrival()
+        # The connection is mostly idle while the leg drives; have the next legs' points ready by arrival
+        prefetch_upcoming_points(ws)
+        if start_navigation_and_wait_completion(ws, end_point["x"], end_point["y"], end_point["theta"], navigation_control=self.navigation_control, emergency_mode=self.emergency_mode):
+            log.info(f"✅ [NAV] Map navigation completed successfully: {self.map_name}")
+            last_arrival.update(map_id=self.map_id, point=(end_point["x"], end_point["y"], end_point["theta"]))
+            return self.finish(True)
+        
+        log.error(f"❌ [NAV] Map navigation failed: {self.map_name}, attempt {self.attempt}")
+        return self.retry("navigation", backoff="navigation_retry")
+    
+    def step(self, ws, state):
+        if state is NavState.SWITCHING_MAP:
+            return self.switch_map(ws)
+        if state is NavState.RELOCATING:
+            return self.relocate(ws)
+        return self.navigate(ws)
+    
+    def run(self, ws):
+        state = self.begin_attempt()
+        while state is not None:
+            state = self.step(ws, state)
+        return self.result
+
+@timed_phase(lambda arguments: "emergency_leg" if arguments.get("emergency_mode") else "map_leg")
+def execute_map_navigation(ws, map_name, map_id, navigation_control=None, reverse_mode=False, max_retries=9999, emergency_mode=False):
+    return MapLeg(map_name, map_id, navigation_control, reverse_mode, max_retries, emergency_mode).run(ws)
 
-def pre_navigation_battery_check_and_charge(ws, charge_map_id, charge_anchor, charge_point, min_level=20, full_level=95):
+def pre_navigation_battery_check_and_charge(ws, charge_map_id, charge_anchor, charge_point, min_level=20, full_level=95, battery_future=None):
     """
     PERFECT PRE-NAVIGATION BATTERY CHECK from the provided file - EXACT COPY
     Checks battery before navigation. If below min_level, relocates to anchor,
@@ -1157,599 +1408,453 @@ def pre_navigation_battery_check_and_charge(ws, charge_map_id, charge_anchor, ch
     
     charge_anchor: dict with keys x, y, theta for relocation
     charge_point: dict with keys x, y, theta for docking
+    battery_future: optional battery query already in flight (see request_battery_status)
     """
-    print(f"🔋 [BATTERY] Pre-navigation battery check - Min: {min_level}%, Full: {full_level}%")
+    log.info(f"🔋 [BATTERY] Pre-navigation battery check - Min: {min_level}%, Full: {full_level}%")
     
-    battery_info = get_battery_status(ws)
+    battery_info = get_battery_status(ws, future=battery_future)
     
     if battery_info["battery_level"] < min_level:
-        print(f"🔋 [BATTERY] Battery too low ({battery_info['battery_level']}%), starting charging process")
+        log.info(f"🔋 [BATTERY] Battery too low ({battery_info['battery_level']}%), starting charging process")
         
         if not set_map(ws, "charge_station", charge_map_id):
             return False
         
         # Relocate to the anchor point on the charging map first
-        print("📍 [CHARGING] Relocating to charging map anchor point...")
+        log.info("📍 [CHARGING] Relocating to charging map anchor point...")
         if not relocate_with_retry(ws, charge_anchor["x"], charge_anchor["y"], charge_anchor["theta"]):
-            print("❌ [CHARGING] Failed to relocate to charging anchor point.")
+            log.error("❌ [CHARGING] Failed to relocate to charging anchor point.")
             return False
         
-        print("✅ [CHARGING] Relocated successfully. Starting dock charge.")
-        time.sleep(2)  # Give time to stabilize after relocation
+        log.info("✅ [CHARGING] Relocated successfully. Starting dock charge.")
         
         if dock_charge(ws, charge_map_id, charge_point["x"], charge_point["y"], charge_point["theta"], full_level=full_level):
             # dock_charge now waits until full_level
-            print(f"🔋 [BATTERY] Battery charged to {full_level}% or more.")
+            log.info(f"🔋 [BATTERY] Battery charged to {full_level}% or more.")
             
             # Undock after charging to prepare for next navigation
-            print("🔌 [CHARGING] Undocking from charging pile...")
-            send(ws, {"cmd": "request_dock_charge_off"})
-            time.sleep(5)  # Wait for undock to complete
+            undock_from_pile(ws)
             
             return True
         else:
-            print("❌ [BATTERY] Charging failed")
+            log.error("❌ [BATTERY] Charging failed")
             return False
     else:
-        print(f"🔋 [BATTERY] Battery level sufficient: {battery_info['battery_level']}%")
+        log.info(f"🔋 [BATTERY] Battery level sufficient: {battery_info['battery_level']}%")
         return True
 
-def run_multi_map_navigation_with_charging(robot_ip, map_ids, charge_map_id, port, navigation_status=None, navigation_control=None):
-    global current_map_position, map_sequence, navigation_phase
-    cycles_completed = 0
-    
-    print("🚀 [SYSTEM] Starting multi-map navigation with charging system")
-    print(f"🤖 [SYSTEM] Robot IP: {robot_ip}, Port: {port}")
-    print(f"🗺 [SYSTEM] Map sequence: {map_ids}")
-    print(f"🔌 [SYSTEM] Charge map ID: {charge_map_id}")
-    
-    # Clear map tracking at start
-    clear_map_tracking()
-    
-    # Pre-load robot maps cache for name resolution
-    try:
-        import requests
-        response = requests.get(f"http://localhost:5000/api/robot/maps", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success') and data.get('maps'):
-                update_robot_maps_cache(data['maps'])
-                print(f"🗺 [SYSTEM] Pre-loaded {len(data['maps'])} maps for name resolution")
-    except Exception as e:
-        print(f"⚠️ [SYSTEM] Could not pre-load maps cache: {e}")
+class PatrolEngine:
+    """The patrol as a state machine over NavState.
+
+    A cycle runs IDLE (session and charge station) -> CHARGING -> a
+    SWITCHING_MAP -> RELOCATING -> NAVIGATING pass per leg of the plan (every
+    map forward, then every map in reverse) -> CHARGING -> IDLE. Pause, stop,
+    quit and emergency flags are checked in one place, before each leg, and
+    lead to PAUSED, DONE or EMERGENCY_EXIT; within a leg MapLeg and
+    start_navigation_and_wait_completion react to them. The time spent in each
+    state is recorded as phase state_<value> and the current state is
+    published as navigation_status["step"].
+    """
     
-    try:
-        while not navigation_quit_event.is_set():
-            print(f"🔄 [CYCLE] Starting cycle {cycles_completed + 1}")
-            
-            # --- PAUSE/STOP SUPPORT ---
-            while navigation_pause_event.is_set() and not navigation_quit_event.is_set():
-                print("⏸ [CYCLE] Cycle paused, waiting...")
-                time.sleep(0.5)
-            
-            if navigation_stop_event.is_set() or navigation_quit_event.is_set():
-                message = "Navigation quit requested" if navigation_quit_event.is_set() else "Navigation stopped"
-                print(f"🛑 [CYCLE] {message}")
-                return {"success": False, "message": message}
-            
-            if navigation_status is not None:
-                navigation_status['cycle'] = cycles_completed + 1
+    def __init__(self, robot_ip, map_ids, charge_map_id, port, navigation_status=None, navigation_control=None, mission_id=None, resume=None):
+        self.robot_ip = robot_ip
+        self.port = port
+        self.map_ids = list(map_ids)
+        self.charge_map_id = charge_map_id
+        self.navigation_status = navigation_status
+        self.navigation_control = navigation_control
+        self.mission_id = mission_id
+        # (phase, index within the phase, map id) of every leg of a cycle
+        self.plan = ([("forward", idx, map_id) for idx, map_id in enumerate(self.map_ids)]
+                     + [("reverse", idx, map_id) for idx, map_id in enumerate(reversed(self.map_ids))])
+        self.resume_at = resume_position(resume) if resume else None  # (cycle, phase, leg index)
+        self.cycle = self.resume_at[0] if self.resume_at else 1
+        
+        self.state = NavState.IDLE
+        self.resume_state = None  # Where PAUSED returns to
+        self.ws = None
+        self.battery_future = None
+        self.charge_anchor = None
+        self.charge_pile = None
+        self.end_of_cycle = False  # CHARGING after the legs rather than before them
+        self.phase = None
+        self.leg_index = 0
+        self.leg = None
+        self.leg_started = None
+        self.settle_before_leg = False
+        self.settle_before_cycle = False
+        self.emergency_context = ""
+        self.successful_maps = []
+        self.failed_maps = []
+        self.result = None
+    
+    def run(self):
+        log.info("🚀 [SYSTEM] Starting multi-map navigation with charging system")
+        log.info(f"🤖 [SYSTEM] Robot IP: {self.robot_ip}, Port: {self.port}")
+        log.info(f"🗺 [SYSTEM] Map sequence: {self.map_ids}")
+        log.info(f"🔌 [SYSTEM] Charge map ID: {self.charge_map_id}")
+        
+        # Clear map tracking at start
+        clear_map_tracking()
+        if self.navigation_status is not None:
+            update_navigation_status(self.navigation_status, step=self.state.value)
+        
+        try:
+            while self.state is not NavState.DONE:
+                with phase_timings.span(f"state_{self.state.value}", self.leg.map_id if self.leg else None):
+                    next_state = getattr(self, f"on_{self.state.value}")()
+                self.enter(next_state)
+            return self.result
+        
+        except Exception as e:
+            log.error(f"❌ [SYSTEM] Exception occurred: {e}")
             
-            try:
-                print("🔌 [CYCLE] Establishing websocket connection...")
-                ws = websocket.create_connection(f"ws://{robot_ip}:{port}")
-                print("✅ [CYCLE] Websocket connection established")
-                
-            except Exception as e:
-                print(f"❌ [CYCLE] Failed to establish websocket connection: {e}")
-                if navigation_quit_event.is_set():
-                    return {"success": False, "message": "Navigation quit requested"}
-                time.sleep(30)
-                continue
+            # --- PAUSE/STOP SUPPORT IN EXCEPTION ---
+            engine_control.wait_while_paused()
             
-            try:
-                # Set up map sequence for emergency exit tracking
-                map_sequence = map_ids.copy()
-                current_map_position = 0
-                navigation_phase = "forward"  # Start with forward phase
-                
-                print(f"🗺 [CYCLE] Map sequence initialized: {len(map_sequence)} maps")
-                print(f"🔄 [CYCLE] Starting forward navigation phase")
-                
-                # Get charge station points
-                if not set_map(ws, "charge_station", charge_map_id):
-                    print("❌ [CYCLE] Failed to set charge station map")
-                    close_websocket_gracefully(ws)
-                    time.sleep(30)
-                    continue
-                
-                charge_points = get_points(ws, charge_map_id)
-                if not charge_points:
-                    print("❌ [CYCLE] No charge station points found")
-                    close_websocket_gracefully(ws)
-                    time.sleep(30)
-                    continue
-                
-                charge_anchor = next((p for p in charge_points if p.get("type") == "anchor_point"), None)
-                charge_pile = next((p for p in charge_points if p.get("type") == "charge"), None)
-                
-                if not charge_anchor or not charge_pile:
-                    print("❌ [CYCLE] Missing charge station waypoints")
-                    close_websocket_gracefully(ws)
-                    time.sleep(30)
-                    continue
-                
-                print("🔌 [CYCLE] Charge station configured successfully")
-                
-                # PRE-NAVIGATION BATTERY CHECK AND CHARGING using PERFECT PROCESS
-                charge_point = {"x": charge_pile["x"], "y": charge_pile["y"], "theta": charge_pile["theta"]}
-                if not pre_navigation_battery_check_and_charge(ws, charge_map_id, charge_anchor, charge_point, min_level=20, full_level=95):
-                    print("❌ [CYCLE] Pre-navigation charging failed, retrying cycle...")
-                    close_websocket_gracefully(ws)
-                    if navigation_quit_event.is_set():
-                        return {"success": False, "message": "Navigation quit requested"}
-                    time.sleep(30)
-                    continue
-                
-                successful_maps = []
-                failed_maps = []
-                
-                print("➡ [CYCLE] Starting forward navigation phase")
-                navigation_phase = "forward"
-                
-                # 1. Forward navigation for all maps
-                for idx, map_id in enumerate(map_ids):
-                    if navigation_quit_event.is_set():
-                        print("🚪 [FORWARD] Quit requested during forward navigation")
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Navigation quit requested"}
-                    
-                    current_map_position = idx
-                    print(f"🗺 [FORWARD] Processing map {idx + 1}/{len(map_ids)}: {map_id}")
-                    print(f"📍 [FORWARD] Current map position: {current_map_position} (Map {current_map_position + 1})")
-                    
-                    # Update map tracking for forward navigation
-                    update_map_tracking(map_ids, idx, robot_ip)
-                    
-                    if navigation_status is not None:
-                        navigation_status['current_map'] = map_id
-                    
-                    # Check for emergency exit BEFORE starting navigation
-                    if emergency_exit_event.is_set():
-                        print("🚨 [FORWARD] Emergency exit triggered before map navigation!")
-                        if execute_emergency_exit_navigation(ws, map_ids, navigation_control):
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": True, "message": "Emergency exit completed"}
-                        else:
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": False, "message": "Emergency exit failed"}
-                    
-                    if navigation_control and navigation_control.get('force_stop') and navigation_control['force_stop'].is_set():
-                        print("🛑 [FORWARD] Force stop triggered")
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Force stop triggered"}
-                    
-                    if navigation_stop_event.is_set():
-                        print("🛑 [FORWARD] Navigation stopped")
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Navigation stopped"}
-                    
-                    while navigation_control and navigation_control.get('paused') and navigation_control['paused'].is_set() and not navigation_quit_event.is_set():
-                        if navigation_status is not None:
-                            navigation_status['paused'] = True
-                        print("⏸ [FORWARD] Navigation paused...")
-                        time.sleep(0.5)
-                    
-                    while navigation_pause_event.is_set() and not navigation_quit_event.is_set():
-                        print("⏸ [FORWARD] Navigation paused (global)...")
-                        time.sleep(0.5)
-                    
-                    if navigation_status is not None:
-                        navigation_status['paused'] = False
-                    
-                    map_name = f"map{idx+1}"
-                    print(f"🚀 [FORWARD] Starting navigation for {map_name}")
-                    
-                    success = execute_map_navigation(ws, map_name, map_id, navigation_control=navigation_control, reverse_mode=False)
-                    
-                    if success:
-                        successful_maps.append(map_name)
-                        print(f"✅ [FORWARD] {map_name} completed successfully")
-                    else:
-                        failed_maps.append(map_name)
-                        print(f"❌ [FORWARD] {map_name} failed")
-                    
-                    if navigation_quit_event.is_set():
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Navigation quit requested"}
-                    
-                    # CRITICAL: Keep the current position at the current map after completion
-                    # Don't update until we start reverse or move to next map
-                    print(f"📍 [FORWARD] Maintaining position at Map {current_map_position + 1} after completion")
-                    
-                    # Check for emergency exit AFTER completing current map navigation
-                    if emergency_exit_event.is_set():
-                        print("🚨 [FORWARD] Emergency exit triggered! Current map completed, proceeding to emergency exit...")
-                        print(f"📍 [FORWARD] Emergency triggered at Map {current_map_position + 1}")
-                        if execute_emergency_exit_navigation(ws, map_ids, navigation_control):
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": True, "message": "Emergency exit completed after current map"}
-                        else:
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": False, "message": "Emergency exit failed"}
-                    
-                    # REMOVED: Battery check after each map - only wait between maps
-                    if idx != len(map_ids) - 1:
-                        print("⏳ [FORWARD] Waiting 3 seconds before next map...")
-                        for i in range(6):  # 3 seconds with quit checks
-                            if navigation_quit_event.is_set():
-                                close_websocket_gracefully(ws)
-                                return {"success": False, "message": "Navigation quit requested"}
-                            time.sleep(0.5)
-                
-                print("🔄 [CYCLE] Starting reverse navigation phase")
-                navigation_phase = "reverse"
-                
-                # 2. Reverse navigation for all maps, in reverse order
-                for idx, map_id in enumerate(reversed(map_ids)):
-                    if navigation_quit_event.is_set():
-                        print("🚪 [REVERSE] Quit requested during reverse navigation")
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Navigation quit requested"}
-                    
-                    # Update current position for emergency exit calculation
-                    current_map_position = len(map_ids) - 1 - idx
-                    print(f"🗺 [REVERSE] Processing map {idx + 1}/{len(map_ids)}: {map_id} (position {current_map_position})")
-                    print(f"📍 [REVERSE] Current map position: {current_map_position} (Map {current_map_position + 1})")
-                    
-                    # Update map tracking for reverse navigation
-                    update_map_tracking(map_ids, current_map_position, robot_ip)
-                    
-                    # Check for emergency exit BEFORE starting reverse navigation
-                    if emergency_exit_event.is_set():
-                        print("🚨 [REVERSE] Emergency exit triggered during reverse navigation!")
-                        print(f"📍 [REVERSE] Emergency triggered at Map {current_map_position + 1}")
-                        if execute_emergency_exit_navigation(ws, map_ids, navigation_control):
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": True, "message": "Emergency exit completed"}
-                        else:
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": False, "message": "Emergency exit failed"}
-                    
-                    map_name = f"map{len(map_ids)-idx}"
-                    print(f"🚀 [REVERSE] Starting reverse navigation for {map_name}")
-                    
-                    reverse_success = execute_map_navigation(ws, map_name, map_id, navigation_control=navigation_control, reverse_mode=True)
-                    
-                    if reverse_success:
-                        successful_maps.append(map_name + "_reverse")
-                        print(f"✅ [REVERSE] {map_name} reverse completed successfully")
-                    else:
-                        failed_maps.append(map_name + "_reverse")
-                        print(f"❌ [REVERSE] {map_name} reverse failed")
-                    
-                    if navigation_quit_event.is_set():
-                        close_websocket_gracefully(ws)
-                        return {"success": False, "message": "Navigation quit requested"}
-                    
-                    # CRITICAL: Keep the current position at the current map after completion
-                    print(f"📍 [REVERSE] Maintaining position at Map {current_map_position + 1} after reverse completion")
-                    
-                    # Check for emergency exit AFTER completing current reverse map navigation
-                    if emergency_exit_event.is_set():
-                        print("🚨 [REVERSE] Emergency exit triggered! Current reverse map completed, proceeding to emergency exit...")
-                        print(f"📍 [REVERSE] Emergency triggered at Map {current_map_position + 1}")
-                        if execute_emergency_exit_navigation(ws, map_ids, navigation_control):
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": True, "message": "Emergency exit completed after current reverse map"}
-                        else:
-                            clear_emergency_exit()
-                            close_websocket_gracefully(ws)
-                            return {"success": False, "message": "Emergency exit failed"}
-                    
-                    # REMOVED: Battery check after each reverse map - only wait between maps
-                    if idx != len(map_ids) - 1:
-                        print("⏳ [REVERSE] Waiting 3 seconds before next reverse map...")
-                        for i in range(6):  # 3 seconds with quit checks
-                            if navigation_quit_event.is_set():
-                                close_websocket_gracefully(ws)
-                                return {"success": False, "message": "Navigation quit requested"}
-                            time.sleep(0.5)
-                
-                # FINAL BATTERY CHECK - Only after complete cycle
-                print("🔋 [CYCLE] Checking battery status after complete cycle...")
-                if not check_battery_and_charge_if_needed(ws, charge_map_id, charge_anchor, charge_pile, threshold=20, target_level=95):
-                    print("❌ [CYCLE] End-of-cycle charging failed")
-                
-                print("✅ [CYCLE] Navigation cycle completed")
-                print(f"📊 [CYCLE] Successful maps: {len(successful_maps)}")
-                print(f"📊 [CYCLE] Failed maps: {len(failed_maps)}")
-                
-                # Clear map tracking at end of cycle
-                clear_map_tracking()
-                
-            finally:
-                close_websocket_gracefully(ws)
+            if navigation_quit_event.is_set():
+                return {"success": False, "message": "Navigation quit requested after exception"}
             
-            cycles_completed += 1
-            print(f"🏁 [CYCLE] Cycle {cycles_completed} finished")
+            if navigation_stop_event.is_set():
+                return {"success": False, "message": "Navigation stopped after exception."}
+            # --- END PAUSE/STOP SUPPORT IN EXCEPTION ---
             
-            print("⏳ [CYCLE] Waiting 10 seconds before next cycle...")
-            for i in range(20):  # Wait 10 seconds, but check for quit every 0.5s
-                if navigation_quit_event.is_set():
-                    print("🚪 [CYCLE] Quit requested during wait")
-                    return {"success": False, "message": "Navigation quit requested"}
-                
-                if navigation_stop_event.is_set():
-                    print("🛑 [CYCLE] Navigation stopped during wait")
-                    return {"success": False, "message": "Navigation stopped."}
-                
-                while navigation_pause_event.is_set() and not navigation_quit_event.is_set():
-                    time.sleep(0.5)
-                
-                time.sleep(0.5)  # Wait before next cycle
+            return {"success": False, "message": str(e)}
+    
+    def enter(self, state):
+        if state is self.state:
+            return
+        log.debug(f"🔀 [ENGINE] {self.state.value} -> {state.value}")
+        self.state = state
+        if self.navigation_status is not None:
+            update_navigation_status(self.navigation_status, step=state.value)
+    
+    def done(self, message, success=False):
+        self.close_session()
+        self.result = {"success": success, "message": message}
+        return NavState.DONE
+    
+    def pause(self, resume_state):
+        self.resume_state = resume_state
+        return NavState.PAUSED
+    
+    def close_session(self):
+        if self.ws is not None:
+            close_websocket_gracefully(self.ws)
+            self.ws = None
+    
+    def retry_cycle(self):
+        """Back off after a cycle could not be set up, then start it again"""
+        self.close_session()
+        if navigation_quit_event.is_set():
+            return self.done("Navigation quit requested")
+        pause_for(WAIT_TIMEOUTS["cycle_retry"])
+        return NavState.IDLE
+    
+    # --- STATES ---
+    def on_idle(self):
+        """Start a cycle: attach the robot session and load the charge station's points"""
+        global current_map_position, map_sequence, navigation_phase
+        if self.settle_before_cycle:
+            self.settle_before_cycle = False
+            log.info(f"⏳ [CYCLE] Waiting up to {WAIT_TIMEOUTS['between_cycles']} seconds for robot to settle before next cycle...")
+            wait_for_robot_idle(get_session(self.robot_ip, self.port), WAIT_TIMEOUTS["between_cycles"])
+            if navigation_quit_event.is_set():
+                log.info("🚪 [CYCLE] Quit requested during wait")
+                return self.done("Navigation quit requested")
+            if navigation_stop_event.is_set():
+                log.info("🛑 [CYCLE] Navigation stopped during wait")
+                return self.done("Navigation stopped.")
         
-        print("🚪 [SYSTEM] Navigation system quit gracefully")
-        return {"success": False, "message": "Navigation quit requested"}
+        if navigation_quit_event.is_set():
+            log.info("🚪 [SYSTEM] Navigation system quit gracefully")
+            return self.done("Navigation quit requested")
         
-    except Exception as e:
-        print(f"❌ [SYSTEM] Exception occurred: {e}")
+        # --- PAUSE/STOP SUPPORT ---
+        if navigation_pause_event.is_set():
+            log.info("⏸ [CYCLE] Cycle paused, waiting...")
+            return self.pause(NavState.IDLE)
         
-        # --- PAUSE/STOP SUPPORT IN EXCEPTION ---
-        while navigation_pause_event.is_set() and not navigation_quit_event.is_set():
-            time.sleep(0.5)
+        if navigation_stop_event.is_set():
+            log.info("🛑 [CYCLE] Navigation stopped")
+            return self.done("Navigation stopped")
+        
+        log.info(f"🔄 [CYCLE] Starting cycle {self.cycle}")
+        if self.navigation_status is not None:
+            update_navigation_status(self.navigation_status, cycle=self.cycle)
+        mission_journal.record(self.mission_id, "cycle_started", cycle=self.cycle)
+        
+        try:
+            log.info("🔌 [CYCLE] Attaching to shared robot session...")
+            ws = get_session(self.robot_ip, self.port)
+            if not ws.wait_connected(timeout=10):
+                raise ConnectionError(ws.last_error or f"robot at {ws.url} not reachable")
+        except Exception as e:
+            log.error(f"❌ [CYCLE] Failed to establish websocket connection: {e}")
+            return self.retry_cycle()
+        
+        self.ws = ws
+        log.info("✅ [CYCLE] Robot session ready")
+        refresh_map_names(ws)
+        
+        # Set up map sequence for emergency exit tracking
+        map_sequence = self.map_ids.copy()
+        current_map_position = 0
+        navigation_phase = "forward"
+        self.phase = None
+        log.info(f"🗺 [CYCLE] Map sequence initialized: {len(map_sequence)} maps")
+        
+        # Battery and charge point queries are independent of the map
+        # switch, so put them in flight together instead of back to back
+        self.battery_future = request_battery_status(ws)
+        charge_points_future = prefetch_map_points(ws, self.charge_map_id)
+        
+        # Get charge station points
+        if not set_map(ws, "charge_station", self.charge_map_id):
+            log.error("❌ [CYCLE] Failed to set charge station map")
+            return self.retry_cycle()
+        
+        charge_points = get_map_points(ws, self.charge_map_id, future=charge_points_future)
+        if not charge_points:
+            log.error("❌ [CYCLE] No charge station points found")
+            return self.retry_cycle()
+        
+        self.charge_anchor = next((p for p in charge_points if p.get("type") == "anchor_point"), None)
+        self.charge_pile = next((p for p in charge_points if p.get("type") == "charge"), None)
+        
+        if not self.charge_anchor or not self.charge_pile:
+            log.error("❌ [CYCLE] Missing charge station waypoints")
+            waypoint_cache.invalidate(self.charge_map_id)
+            return self.retry_cycle()
+        
+        log.info("🔌 [CYCLE] Charge station configured successfully")
+        self.end_of_cycle = False
+        return NavState.CHARGING
+    
+    def on_charging(self):
+        """Charge when low before the cycle's first leg; top up after its last one"""
+        if self.end_of_cycle:
+            return self.finish_cycle()
+        
+        if self.resume_at and self.resume_at[1] == "end_charge":
+            # Every leg of the resumed cycle is done; only its closing charge is left
+            self.resume_at = None
+            log.info(f"📒 [CYCLE] Resuming mission {self.mission_id} at the end-of-cycle charge of cycle {self.cycle}")
+            return self.finish_cycle()
+        
+        # PRE-NAVIGATION BATTERY CHECK AND CHARGING using PERFECT PROCESS
+        mission_journal.record(self.mission_id, "phase", phase="charging")
+        charge_point = {"x": self.charge_pile["x"], "y": self.charge_pile["y"], "theta": self.charge_pile["theta"]}
+        if not pre_navigation_battery_check_and_charge(self.ws, self.charge_map_id, self.charge_anchor, charge_point, min_level=20, full_level=95, battery_future=self.battery_future):
+            log.error("❌ [CYCLE] Pre-navigation charging failed, retrying cycle...")
+            return self.retry_cycle()
+        
+        self.successful_maps = []
+        self.failed_maps = []
+        self.leg_index = 0
+        self.settle_before_leg = False
+        
+        # A resumed mission skips the legs its journal records as completed
+        if self.resume_at:
+            _, phase, index = self.resume_at
+            self.resume_at = None
+            self.leg_index = index + (len(self.map_ids) if phase == "reverse" else 0)
+            log.info(f"📒 [CYCLE] Resuming mission {self.mission_id} at {phase} leg {index + 1}/{len(self.map_ids)}")
+        return self.next_leg()
+    
+    def on_switching_map(self):
+        if self.leg is None:
+            next_state = self.start_leg()
+            if next_state is not NavState.SWITCHING_MAP:
+                return next_state
+        return self.leg.switch_map(self.ws) or self.finish_leg()
+    
+    def on_relocating(self):
+        return self.leg.relocate(self.ws) or self.finish_leg()
+    
+    def on_navigating(self):
+        return self.leg.navigate(self.ws) or self.finish_leg()
+    
+    def on_paused(self):
+        engine_control.wait_while_paused()
+        return self.resume_state
+    
+    def on_emergency_exit(self):
+        log.info(f"📍 [EMERGENCY] Emergency triggered at Map {current_map_position + 1}")
+        success = execute_emergency_exit_navigation(self.ws, self.map_ids, self.navigation_control)
+        clear_emergency_exit()
+        if success:
+            return self.done(f"Emergency exit completed{self.emergency_context}", success=True)
+        return self.done("Emergency exit failed")
+    
+    # --- LEGS ---
+    def next_leg(self):
+        """SWITCHING_MAP for the next leg of the plan, or CHARGING once the cycle's legs are done"""
+        global navigation_phase
+        if self.leg_index >= len(self.plan):
+            self.end_of_cycle = True
+            return NavState.CHARGING
+        
+        phase = self.plan[self.leg_index][0]
+        if phase != self.phase:
+            self.phase = phase
+            navigation_phase = phase
+            log.info("➡ [CYCLE] Starting forward navigation phase" if phase == "forward" else "🔄 [CYCLE] Starting reverse navigation phase")
+            mission_journal.record(self.mission_id, "phase", phase=phase)
+        return NavState.SWITCHING_MAP
+    
+    def start_leg(self):
+        """Control checks before a leg, then its first attempt"""
+        global current_map_position
+        phase, idx, map_id = self.plan[self.leg_index]
+        tag = phase.upper()
+        
+        if self.settle_before_leg:
+            self.settle_before_leg = False
+            # Move on as soon as the robot reports idle instead of always sleeping
+            log.info(f"⏳ [{tag}] Waiting up to {WAIT_TIMEOUTS['between_maps']} seconds for robot to settle before next map...")
+            wait_for_robot_idle(self.ws, WAIT_TIMEOUTS["between_maps"])
         
         if navigation_quit_event.is_set():
-            return {"success": False, "message": "Navigation quit requested after exception"}
+            log.info(f"🚪 [{tag}] Quit requested during {phase} navigation")
+            return self.done("Navigation quit requested")
+        
+        # Position in map_ids, used by the emergency exit to pick its route
+        current_map_position = idx if phase == "forward" else len(self.map_ids) - 1 - idx
+        log.info(f"🗺 [{tag}] Processing map {idx + 1}/{len(self.map_ids)}: {map_id} (position {current_map_position})")
+        update_map_tracking(self.map_ids, current_map_position)
+        if self.navigation_status is not None:
+            update_navigation_status(self.navigation_status, current_map=map_id)
+        
+        if emergency_exit_event.is_set():
+            log.info(f"🚨 [{tag}] Emergency exit triggered before map navigation!")
+            self.emergency_context = ""
+            return NavState.EMERGENCY_EXIT
+        
+        if self.navigation_control and self.navigation_control.get('force_stop') and self.navigation_control['force_stop'].is_set():
+            log.info(f"🛑 [{tag}] Force stop triggered")
+            return self.done("Force stop triggered")
         
         if navigation_stop_event.is_set():
-            return {"success": False, "message": "Navigation stopped after exception."}
-        # --- END PAUSE/STOP SUPPORT IN EXCEPTION ---
+            log.info(f"🛑 [{tag}] Navigation stopped")
+            return self.done("Navigation stopped")
+        
+        if navigation_pause_event.is_set():
+            if self.navigation_status is not None:
+                update_navigation_status(self.navigation_status, paused=True)
+            log.info(f"⏸ [{tag}] Navigation paused...")
+            return self.pause(NavState.SWITCHING_MAP)
+        
+        if self.navigation_status is not None:
+            update_navigation_status(self.navigation_status, paused=False)
+        
+        map_name = f"map{current_map_position + 1}"
+        log.info(f"🚀 [{tag}] Starting {phase} navigation for {map_name}")
+        mission_journal.record(self.mission_id, "leg_started", cycle=self.cycle, phase=phase, map_index=idx, map_id=map_id)
+        self.leg_started = time.perf_counter()
+        self.leg = MapLeg(map_name, map_id, self.navigation_control, reverse_mode=phase == "reverse")
+        return self.leg.begin_attempt() or self.finish_leg()
+    
+    def finish_leg(self):
+        """Journal the leg that just ended and move on to the next one (or EMERGENCY_EXIT/DONE)"""
+        phase, idx, map_id = self.plan[self.leg_index]
+        tag = phase.upper()
+        leg, self.leg = self.leg, None
+        success = bool(leg.result)
+        phase_timings.observe("map_leg", time.perf_counter() - self.leg_started, map_id=map_id, ok=success)
+        mission_journal.record(self.mission_id, "leg_completed", cycle=self.cycle, phase=phase, map_index=idx, map_id=map_id, success=success)
+        
+        label = leg.map_name if phase == "forward" else f"{leg.map_name}_reverse"
+        if success:
+            self.successful_maps.append(label)
+            log.info(f"✅ [{tag}] {label} completed successfully")
+        else:
+            self.failed_maps.append(label)
+            log.error(f"❌ [{tag}] {label} failed")
         
-        return {"success": False, "message": str(e)}
+        if navigation_quit_event.is_set():
+            return self.done("Navigation quit requested")
+        
+        # CRITICAL: Keep the current position at the current map after completion
+        log.info(f"📍 [{tag}] Maintaining position at Map {current_map_position + 1} after completion")
+        
+        # Check for emergency exit AFTER completing current map navigation
+        if emergency_exit_event.is_set():
+            log.info(f"🚨 [{tag}] Emergency exit triggered! Current map completed, proceeding to emergency exit...")
+            self.emergency_context = " after current map" if phase == "forward" else " after current reverse map"
+            return NavState.EMERGENCY_EXIT
+        
+        self.leg_index += 1
+        # Legs of the same phase drive back to back; the robot settles before the next one
+        self.settle_before_leg = self.leg_index < len(self.plan) and self.plan[self.leg_index][0] == phase
+        return self.next_leg()
+    
+    def finish_cycle(self):
+        # FINAL BATTERY CHECK - Only after complete cycle
+        log.info("🔋 [CYCLE] Checking battery status after complete cycle...")
+        mission_journal.record(self.mission_id, "phase", phase="end_charge")
+        if not check_battery_and_charge_if_needed(self.ws, self.charge_map_id, self.charge_anchor, self.charge_pile, threshold=20, target_level=95):
+            log.error("❌ [CYCLE] End-of-cycle charging failed")
+        
+        log.info("✅ [CYCLE] Navigation cycle completed")
+        log.info(f"📊 [CYCLE] Successful maps: {len(self.successful_maps)}")
+        log.info(f"📊 [CYCLE] Failed maps: {len(self.failed_maps)}")
+        
+        # Clear map tracking at end of cycle
+        clear_map_tracking()
+        self.close_session()
+        
+        mission_journal.record(self.mission_id, "cycle_completed", cycle=self.cycle)
+        log.info(f"🏁 [CYCLE] Cycle {self.cycle} finished")
+        self.cycle += 1
+        self.settle_before_cycle = True
+        return NavState.IDLE
+
+def run_multi_map_navigation_with_charging(robot_ip, map_ids, charge_map_id, port, navigation_status=None, navigation_control=None, mission_id=None, resume=None):
+    """Run the patrol as a journaled mission; resume is a journaled mission's state to continue from its last completed leg"""
+    mission_id = mission_id or (resume or {}).get("mission_id") or uuid.uuid4().hex[:12]
+    mission_journal.begin(mission_id, robot_ip, port, map_ids, charge_map_id, resume=resume)
+    engine = PatrolEngine(robot_ip, map_ids, charge_map_id, port, navigation_status, navigation_control, mission_id, resume)
+    try:
+        result = engine.run()
+    except Exception as e:
+        result = {"success": False, "message": str(e)}
+        mission_journal.finish(mission_id, result)
+        raise
+    mission_journal.finish(mission_id, result)
+    return result
 
 def main():
-    print("🤖 [MAIN] Robot Navigation System Starting...")
+    log.info("🤖 [MAIN] Robot Navigation System Starting...")
     
     ROBOT_IP = "192.168.1.100"
     WS_PORT = 8080
     MAP_IDS = [1, 2, 3, 4, 5]  # Map2 should contain EMERGENCY_EXIT_MAP_ID
     CHARGE_MAP_ID = MAP_ID  # Using the provided MAP_ID
     
-    print(f"🤖 [MAIN] Configuration:")
-    print(f"  - Robot IP: {ROBOT_IP}")
-    print(f"  - WebSocket Port: {WS_PORT}")
-    print(f"  - Map IDs: {MAP_IDS}")
-    print(f"  - Charge Map ID: {CHARGE_MAP_ID}")
-    print(f"  - Emergency Exit Map ID: {EMERGENCY_EXIT_MAP_ID}")
-    print(f"  - Charge Point: x={CHARGE_POINT['x']}, y={CHARGE_POINT['y']}, theta={CHARGE_POINT['theta']}")
+    log.info(f"🤖 [MAIN] Configuration:")
+    log.info(f"  - Robot IP: {ROBOT_IP}")
+    log.info(f"  - WebSocket Port: {WS_PORT}")
+    log.info(f"  - Map IDs: {MAP_IDS}")
+    log.info(f"  - Charge Map ID: {CHARGE_MAP_ID}")
+    log.info(f"  - Emergency Exit Map ID: {EMERGENCY_EXIT_MAP_ID}")
+    log.info(f"  - Charge Point: x={CHARGE_POINT['x']}, y={CHARGE_POINT['y']}, theta={CHARGE_POINT['theta']}")
     
     while not navigation_quit_event.is_set():
-        try:
-            print("🔌 [MAIN] Establishing connection to robot...")
-            ws = websocket.create_connection(f"ws://{ROBOT_IP}:{WS_PORT}")
-            print("✅ [MAIN] Connection established")
-            
-            try:
-                # Set up map sequence for emergency exit tracking
-                global map_sequence, current_map_position, navigation_phase
-                map_sequence = MAP_IDS.copy()
-                current_map_position = 0
-                navigation_phase = "forward"
-                
-                # Get charge station points using PERFECT PROCESS
-                if not set_map(ws, "charge_station", CHARGE_MAP_ID):
-                    print("❌ [MAIN] Failed to set charge station map")
-                    close_websocket_gracefully(ws)
-                    if navigation_quit_event.is_set():
-                        break
-                    time.sleep(30)
-                    continue
-                
-                charge_points = get_points(ws, CHARGE_MAP_ID)
-                if charge_points:
-                    charge_anchor = next((p for p in charge_points if p.get("type") == "anchor_point"), None)
-                    charge_pile = next((p for p in charge_points if p.get("type") == "charge"), None)
-                    
-                    if charge_anchor and charge_pile:
-                        print("🔌 [MAIN] Charge station configured, checking initial battery...")
-                        
-                        # PRE-NAVIGATION BATTERY CHECK using PERFECT PROCESS
-                        charge_point = {"x": charge_pile["x"], "y": charge_pile["y"], "theta": charge_pile["theta"]}
-                        if not pre_navigation_battery_check_and_charge(ws, CHARGE_MAP_ID, charge_anchor, charge_point, min_level=20, full_level=95):
-                            print("❌ [MAIN] Pre-navigation charging failed")
-                            close_websocket_gracefully(ws)
-                            if navigation_quit_event.is_set():
-                                break
-                            time.sleep(30)
-                            continue
-                    else:
-                        print("⚠ [MAIN] Charge station points incomplete")
-                        charge_anchor = None
-                        charge_pile = None
-                else:
-                    print("⚠ [MAIN] No charge station points found")
-                    charge_anchor = None
-                    charge_pile = None
-                
-                successful_maps = []
-                failed_maps = []
-                
-                print("➡ [MAIN] Starting forward navigation...")
-                navigation_phase = "forward"
-                
-                for idx, map_id in enumerate(MAP_IDS):
-                    if navigation_quit_event.is_set():
-                        print("🚪 [MAIN] Quit requested during forward navigation")
-                        break
-                    
-                    current_map_position = idx
-                    print(f"📍 [MAIN] Current map position: {current_map_position} (Map {current_map_position + 1})")
-                    
-                    if navigation_stop_event.is_set():
-                        print("🛑 [MAIN] Navigation stopped")
-                        break
-                    
-                    map_name = f"map{idx+1}"
-                    print(f"🗺 [MAIN] Processing {map_name} ({idx+1}/{len(MAP_IDS)})")
-                    
-                    success = execute_map_navigation(ws, map_name, map_id)
-                    
-                    if success:
-                        successful_maps.append(map_name)
-                        print(f"✅ [MAIN] {map_name} completed successfully")
-                    else:
-                        failed_maps.append(map_name)
-                        print(f"❌ [MAIN] {map_name} failed")
-                    
-                    if navigation_quit_event.is_set():
-                        break
-                    
-                    # CRITICAL: Keep position at current map after completion
-                    print(f"📍 [MAIN] Maintaining position at Map {current_map_position + 1} after completion")
-                    
-                    # Check for emergency exit after completing current map
-                    if emergency_exit_event.is_set():
-                        print("🚨 [MAIN] Emergency exit triggered! Proceeding to emergency exit...")
-                        print(f"📍 [MAIN] Emergency triggered at Map {current_map_position + 1}")
-                        if execute_emergency_exit_navigation(ws, MAP_IDS):
-                            clear_emergency_exit()
-                            break
-                        else:
-                            clear_emergency_exit()
-                            print("❌ [MAIN] Emergency exit failed")
-                            break
-                    
-                    # REMOVED: Battery check after each map - only wait between maps
-                    if idx != len(MAP_IDS) - 1:
-                        print("⏳ [MAIN] Waiting 3 seconds before next map...")
-                        for i in range(6):  # 3 seconds with quit checks
-                            if navigation_quit_event.is_set():
-                                break
-                            time.sleep(0.5)
-                
-                if navigation_quit_event.is_set():
-                    break
-                
-                if not navigation_quit_event.is_set() and not navigation_stop_event.is_set() and not emergency_exit_event.is_set():
-                    print("🔄 [MAIN] Starting reverse navigation...")
-                    navigation_phase = "reverse"
-                    
-                    # Reverse navigation for all maps, in reverse order
-                    for idx, map_id in enumerate(reversed(MAP_IDS)):
-                        if navigation_quit_event.is_set():
-                            print("🚪 [MAIN] Quit requested during reverse navigation")
-                            break
-                        
-                        current_map_position = len(MAP_IDS) - 1 - idx
-                        print(f"📍 [MAIN] Current map position: {current_map_position} (Map {current_map_position + 1})")
-                        
-                        if emergency_exit_event.is_set():
-                            print("🚨 [MAIN] Emergency exit triggered during reverse navigation!")
-                            print(f"📍 [MAIN] Emergency triggered at Map {current_map_position + 1}")
-                            if execute_emergency_exit_navigation(ws, MAP_IDS):
-                                clear_emergency_exit()
-                                break
-                            else:
-                                clear_emergency_exit()
-                                print("❌ [MAIN] Emergency exit failed")
-                                break
-                        
-                        map_name = f"map{len(MAP_IDS)-idx}"
-                        print(f"🗺 [MAIN] Reverse processing {map_name} ({idx+1}/{len(MAP_IDS)})")
-                        
-                        reverse_success = execute_map_navigation(ws, map_name, map_id, reverse_mode=True)
-                        
-                        if reverse_success:
-                            successful_maps.append(map_name + "_reverse")
-                            print(f"✅ [MAIN] {map_name} reverse completed successfully")
-                        else:
-                            failed_maps.append(map_name + "_reverse")
-                            print(f"❌ [MAIN] {map_name} reverse failed")
-                        
-                        if navigation_quit_event.is_set():
-                            break
-                        
-                        # CRITICAL: Keep position at current map after completion
-                        print(f"📍 [MAIN] Maintaining position at Map {current_map_position + 1} after reverse completion")
-                        
-                        # Check for emergency exit after completing current reverse map
-                        if emergency_exit_event.is_set():
-                            print("🚨 [MAIN] Emergency exit triggered! Proceeding to emergency exit...")
-                            print(f"📍 [MAIN] Emergency triggered at Map {current_map_position + 1}")
-                            if execute_emergency_exit_navigation(ws, MAP_IDS):
-                                clear_emergency_exit()
-                                break
-                            else:
-                                clear_emergency_exit()
-                                print("❌ [MAIN] Emergency exit failed")
-                                break
-                        
-                        # REMOVED: Battery check after each reverse map - only wait between maps
-                        if idx != len(MAP_IDS) - 1:
-                            print("⏳ [MAIN] Waiting 3 seconds before next reverse map...")
-                            for i in range(6):  # 3 seconds with quit checks
-                                if navigation_quit_event.is_set():
-                                    break
-                                time.sleep(0.5)
-                        
-                        if navigation_quit_event.is_set():
-                            break
-                
-                # FINAL BATTERY CHECK using PERFECT PROCESS - Only after complete cycle
-                if not navigation_quit_event.is_set() and charge_points and charge_anchor and charge_pile:
-                    print("🔋 [MAIN] Final battery check after complete cycle...")
-                    if not check_battery_and_charge_if_needed(ws, CHARGE_MAP_ID, charge_anchor, charge_pile, threshold=20, target_level=95):
-                        print("❌ [MAIN] Final charging failed")
-                
-                # Summary
-                if not navigation_quit_event.is_set():
-                    total_expected = len(MAP_IDS) * 2
-                    total_successful = len(successful_maps)
-                    total_failed = len(failed_maps)
-                    
-                    if total_successful == total_expected:
-                        print("🎉 [MAIN] All map navigations (forward and reverse) completed successfully!")
-                    else:
-                        print(f"📊 [MAIN] Navigation summary:")
-                        print(f"  - Successful: {total_successful}/{total_expected}")
-                        print(f"  - Failed: {total_failed}/{total_expected}")
-                        print(f"  - Success rate: {(total_successful/total_expected)*100:.1f}%")
-                
-            finally:
-                close_websocket_gracefully(ws)
-            
-            if navigation_quit_event.is_set():
-                print("🚪 [MAIN] Quit requested, exiting main loop")
-                break
-            
-            print("🔁 [MAIN] Waiting 10 seconds before starting the next 24/7 cycle...")
-            for i in range(20):  # 10 seconds with quit checks
-                if navigation_quit_event.is_set():
-                    print("🚪 [MAIN] Quit requested during wait")
-                    break
-                time.sleep(0.5)
-                
-        except Exception as e:
-            print(f"❌ [MAIN] Error occurred: {e}")
-            if navigation_quit_event.is_set():
-                print("🚪 [MAIN] Quit requested after error")
-                break
-            
-            print("🔁 [MAIN] Waiting 30 seconds before retrying after error...")
-            for i in range(60):  # 30 seconds with quit checks
-                if navigation_quit_event.is_set():
-                    break
-                time.sleep(0.5)
+        result = run_multi_map_navigation_with_charging(ROBOT_IP, MAP_IDS, CHARGE_MAP_ID, WS_PORT)
+        log.info(f"🏁 [MAIN] Navigation ended: {result.get('message')}")
+        if navigation_quit_event.is_set():
+            break
+        
+        if navigation_stop_event.is_set():
+            # 'start' in the control interface clears the stop and runs the patrol again
+            log.info("⏸ [MAIN] Navigation stopped, enter 'start' to run again or 'quit' to exit")
+            wait_for_control(lambda: navigation_quit_event.is_set() or not navigation_stop_event.is_set(), None)
+        else:
+            log.info(f"🔁 [MAIN] Waiting {WAIT_TIMEOUTS['cycle_retry']} seconds before starting again...")
+            pause_for(WAIT_TIMEOUTS["cycle_retry"])
     
-    print("🚪 [MAIN] Navigation system shut down gracefully")
+    log.info("🚪 [MAIN] Navigation system shut down gracefully")
     
     # Shutdown TTS manager
     tts_manager.shutdown()
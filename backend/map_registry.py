@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+
+from cache_support import SingleFlight, save_json_snapshot
+from robot_logging import get_logger
+from waypoint_cache import content_hash, waypoint_cache
+
+log = get_logger("maps")
+
+# --- MAP REGISTRY CONFIGURATION ---
+MAP_REGISTRY_TTL = int(os.getenv("MAP_REGISTRY_TTL", "300"))  # Seconds before the map list is re-read from the robot
+MAP_REGISTRY_FILE = os.getenv(
+    "MAP_REGISTRY_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "map_registry.json")
+)
+MAP_LIST_COMMANDS = ["request_list_maps", "request_map_list", "get_map_list", "request_get_map_list"]
+
+
+def parse_map_list(payload):
+    """[{"id", "name"}] from a map list reply's data, or None when the frame is not a map list"""
+    if not isinstance(payload, dict):
+        return None
+    if "maps" in payload:
+        return [{"name": m.get("name"), "id": m.get("id")} for m in payload["maps"]]
+    if "mapList" in payload:
+        return [{"name": m.get("name"), "id": m.get("mapId")} for m in payload["mapList"]]
+    return None
+
+
+def _request_for_reply(reply_cmd):
+    """The candidate a reply cmd pairs with (response_map_list -> request_map_list), or None"""
+    if not reply_cmd.startswith("response_"):
+        return None
+    core = reply_cmd[len("response_"):]
+    return next((cmd for cmd in (f"request_{core}", f"get_{core}") if cmd in MAP_LIST_COMMANDS), None)
+
+
+def _negotiate_map_list(session, timeout):
+    """Send every candidate at once and learn the protocol from the first map list reply"""
+    # Map lists come back under firmware-specific cmds, so watch every frame
+    with session.subscribe() as replies:
+        for cmd in MAP_LIST_COMMANDS:
+            session.send({"cmd": cmd})
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            data = replies.get(timeout=remaining)
+            if not data:
+                break
+            maps = parse_map_list(data.get("data"))
+            if maps is not None:
+                protocol = (_request_for_reply(data.get("cmd") or ""), data.get("cmd"))
+                map_registry.remember_protocol(session.url, protocol)
+                log.info(f"🗺 [MAPS] Robot at {session.url} answers {protocol[0] or 'an unnamed map list query'} with {protocol[1]}")
+                return maps
+    return []
+
+
+def _request_map_list(session, protocol, timeout):
+    """One round-trip with a learned protocol; None when the robot did not answer"""
+    request_cmd, reply_cmd = protocol
+    future = session.expect(reply_cmd, match=lambda r: parse_map_list(r.get("data")) is not None, timeout=timeout)
+    try:
+        for cmd in [request_cmd] if request_cmd else MAP_LIST_COMMANDS:
+            session.send({"cmd": cmd})
+        return parse_map_list(future.result(timeout=timeout).get("data"))
+    except Exception:
+        future.cancel()
+        return None
+
+
+def fetch_map_list(session, timeout=10):
+    """Ask the robot for its maps over a RobotSession; returns [{"id", "name"}] (empty when none answer).
+
+    The first fetch per robot tries every known map list command; later ones
+    send only the command that answered and return on its reply.
+    """
+    protocol = map_registry.protocols.get(session.url)
+    if protocol:
+        maps = _request_map_list(session, protocol, timeout)
+        if maps is not None:
+            return maps
+        # Firmware update or a different robot at this address: learn again
+        log.warning(f"⚠️ [MAPS] No {protocol[1]} from {session.url}, renegotiating the map list command")
+        map_registry.remember_protocol(session.url, None)
+    return _negotiate_map_list(session, timeout)
+
+
+class MapRegistry:
+    """The robot's maps indexed by id and by name, kept on disk between runs.
+
+    Filled from map list replies (the /api/robot/maps route or the engine's
+    own background fetch), so name lookups during navigation are dict reads
+    that never wait on the robot or the HTTP server. The catalogue, its
+    content hash and the map list command each robot answers are snapshotted
+    next to the waypoint cache, so a restart starts with names and a known
+    protocol and only reconciles with the robot once the TTL has passed.
+    """
+
+    def __init__(self, ttl=MAP_REGISTRY_TTL, snapshot_path=MAP_REGISTRY_FILE):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self._by_id = {}
+        self._by_name = {}
+        self._lock = threading.Lock()
+        self._refreshes = SingleFlight("map-registry-refresh")
+        self.updated_at = None
+        self.version = None  # content_hash of the map list
+        # (request cmd, reply cmd) of the map list query each robot answered, keyed by
+        # session URL. request cmd is None when the reply did not say which candidate
+        # it answers; every candidate is then sent, but only that reply is awaited.
+        self.protocols = {}
+
+        # Registry statistics
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        self.load()
+
+    def update(self, maps):
+        """Replace the catalogue with a map list from the robot; returns True when it changed"""
+        by_id = {m["id"]: m.get("name") or m["id"] for m in maps if m.get("id")}
+        version = content_hash(sorted(by_id.items()))
+        with self._lock:
+            removed = set(self._by_id) - set(by_id)
+            changed = version != self.version
+            self._by_id = by_id
+            self._by_name = {name: map_id for map_id, name in by_id.items()}
+            self.updated_at = time.time()
+            self.version = version
+        if changed:
+            log.info(f"🗺 [MAPS] Map catalogue now holds {len(by_id)} map(s) (version {version})")
+        for map_id in removed:
+            waypoint_cache.invalidate(map_id)  # Points of a map the robot no longer has
+        self.save()
+        return changed
+
+    def remember_protocol(self, url, protocol):
+        with self._lock:
+            if protocol:
+                self.protocols[url] = tuple(protocol)
+            else:
+                self.protocols.pop(url, None)
+        self.save()
+
+    def name_for(self, map_id):
+        return self._by_id.get(map_id)
+
+    def id_for(self, name):
+        return self._by_name.get(name)
+
+    def maps(self):
+        with self._lock:
+            return [{"id": map_id, "name": name} for map_id, name in self._by_id.items()]
+
+    def is_fresh(self):
+        return self.updated_at is not None and time.time() - self.updated_at < self.ttl
+
+    def refresh_async(self, fetch, on_done=None):
+        """Re-read the map list on a daemon thread; fetch() returns [{"id", "name"}].
+
+        At most one refresh runs at a time. An empty or failed fetch keeps the
+        current entries. on_done() runs after a successful update.
+        """
+        def refresh():
+            try:
+                maps = fetch()
+                if maps:
+                    self.update(maps)
+                    self.refreshes += 1
+                    if on_done:
+                        on_done()
+                else:
+                    self.refresh_failures += 1
+            except Exception as e:
+                self.refresh_failures += 1
+                log.warning(f"⚠️ [MAPS] Background map list refresh failed: {e}")
+
+        return self._refreshes.start(None, refresh)
+
+    def load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            by_id = {m["id"]: m["name"] for m in snapshot.get("maps", []) if m.get("id") and m.get("name")}
+            protocols = {url: tuple(protocol) for url, protocol in snapshot.get("protocols", {}).items() if len(protocol) == 2}
+            with self._lock:
+                self._by_id = by_id
+                self._by_name = {name: map_id for map_id, name in by_id.items()}
+                self.updated_at = snapshot.get("updated_at")
+                self.version = content_hash(sorted(by_id.items()))
+                self.protocols.update(protocols)
+            log.info(f"🗺 [MAPS] Loaded {len(by_id)} catalogued map(s) from {self.snapshot_path}")
+        except Exception as e:
+            log.warning(f"⚠️ [MAPS] Ignoring unreadable map catalogue: {e}")
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+
+        def snapshot():
+            with self._lock:
+                return {
+                    "version": self.version,
+                    "updated_at": self.updated_at,
+                    "maps": [{"id": map_id, "name": name} for map_id, name in self._by_id.items()],
+                    "protocols": dict(self.protocols),
+                }
+
+        try:
+            save_json_snapshot(self.snapshot_path, snapshot)
+        except Exception as e:
+            log.warning(f"⚠️ [MAPS] Could not write map catalogue: {e}")
+
+    def catalogue(self):
+        """Every known map with its name and the version of its cached points"""
+        cached_points = waypoint_cache.stats()["maps"]
+        with self._lock:
+            names = dict(self._by_id)
+        entries = []
+        for map_id in list(names) + [map_id for map_id in cached_points if map_id not in names]:
+            entry = {"id": map_id, "name": names.get(map_id)}
+            if map_id in cached_points:
+                entry["waypoints"] = cached_points[map_id]  # {"points": count, "hash", "age"}
+            entries.append(entry)
+        return entries
+
+    def stats(self):
+        return {
+            "maps": len(self._by_id),
+            "version": self.version,
+            "age": round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "protocols": {url: list(protocol) for url, protocol in self.protocols.items()},
+        }
+
+
+map_registry = MapRegistry()
@@ -0,0 +1,142 @@
+"""Prometheus text exposition (format 0.0.4) without the client library.
+
+Counters and histograms updated in place live in the module registry; values
+that already exist elsewhere (session counters, cache stats, telemetry) are
+read at scrape time by collector callbacks, so nothing is tracked twice.
+"""
+import logging
+import threading
+
+from phase_timing import BUCKETS, Histogram
+
+# robot_logging imports this module, so take the logger by name; its handlers attach on setup
+log = logging.getLogger("robot.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items() if value is not None) + "}"
+
+
+def _number(value):
+    if value is True or value is False:
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Family:
+    """One metric name with its type, help text and samples (labels dict -> value or Histogram)"""
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        if value is not None:
+            self.samples.append((labels, value))
+        return self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples:
+            if isinstance(value, Histogram):
+                cumulative = 0
+                for bound, count in zip(list(value.buckets) + [float("inf")], value.counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(labels)} {_number(value.sum)}")
+                lines.append(f"{self.name}_count{_labels(labels)} {value.count}")
+            else:
+                lines.append(f"{self.name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        family = Family(self.name, "counter", self.help)
+        with self._lock:
+            for key, value in sorted(self._values.items(), key=lambda item: tuple(str(part) for part in item[0])):
+                family.add(value, **dict(zip(self.labelnames, key)))
+        return [family]
+
+
+class LabeledHistogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels.get(name) for name in self.labelnames)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def collect(self):
+        family = Family(self.name, "histogram", self.help)
+        with self._lock:
+            for key, histogram in sorted(self._histograms.items(), key=lambda item: tuple(str(part) for part in item[0])):
+                family.add(histogram.copy(), **dict(zip(self.labelnames, key)))  # Rendered after the lock is released
+        return [family]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        metric = LabeledHistogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns a list of Family objects, built fresh on every scrape"""
+        self._collectors.append(collector)
+
+    def render(self):
+        families = []
+        for metric in self._metrics:
+            families.extend(metric.collect())
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                log.warning(f"⚠️ [METRICS] Collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return "\n".join(family.render() for family in families) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+
+from cache_support import write_atomically
+from robot_logging import get_logger
+
+log = get_logger("journal")
+
+# --- MISSION JOURNAL CONFIGURATION ---
+MISSION_JOURNAL_FILE = os.getenv(
+    "MISSION_JOURNAL_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mission_journal.jsonl")
+)
+MISSION_JOURNAL_FSYNC_INTERVAL = float(os.getenv("MISSION_JOURNAL_FSYNC_INTERVAL", "1.0"))  # Seconds between batched fsyncs
+
+
+def fold(state, record):
+    """Apply one journal record to a mission's state dict (created by mission_started)"""
+    event = record.get("event")
+    if event == "mission_started":
+        state.update(
+            mission_id=record["mission_id"], robot_ip=record.get("robot_ip"), port=record.get("port"),
+            map_ids=record.get("map_ids", []), charge_map_id=record.get("charge_map_id"),
+            started_at=record.get("at"), cycle=record.get("cycle", 1), phase=record.get("phase"),
+            map_index=record.get("map_index"), last_leg=record.get("last_leg"), finished=False, result=None
+        )
+    elif event == "cycle_started":
+        # A resumed cycle announces itself again; its completed legs still count
+        if record["cycle"] != state.get("cycle"):
+            state.update(cycle=record["cycle"], phase=None, map_index=None, last_leg=None)
+    elif event == "phase":
+        state.update(phase=record["phase"], map_index=None)
+    elif event == "leg_started":
+        state.update(phase=record["phase"], map_index=record["map_index"])
+    elif event == "leg_completed":
+        state["last_leg"] = {key: record.get(key) for key in ("cycle", "phase", "map_index", "map_id", "success")}
+    elif event == "cycle_completed":
+        state.update(cycle=record["cycle"] + 1, phase=None, map_index=None, last_leg=None)
+    elif event == "mission_finished":
+        state.update(finished=True, result=record.get("result"))
+    state["updated_at"] = record.get("at")
+    return state
+
+
+def resume_position(state):
+    """(cycle, phase, leg index) where a journaled mission picks up.
+
+    That is the first leg not completed successfully, so a failed leg runs
+    again. Once every leg of the cycle is done the phase is "end_charge" (leg
+    index None): the cycle's closing battery check runs before the next cycle.
+    """
+    cycle = state.get("cycle") or 1
+    last_leg = state.get("last_leg")
+    if state.get("phase") == "end_charge":
+        return cycle, "end_charge", None
+    if not last_leg or last_leg.get("cycle") != cycle:
+        return cycle, "forward", 0
+    if not last_leg.get("success"):
+        return cycle, last_leg["phase"], last_leg["map_index"]
+    next_index = last_leg["map_index"] + 1
+    if next_index < len(state.get("map_ids") or ()):
+        return cycle, last_leg["phase"], next_index
+    if last_leg["phase"] == "forward":
+        return cycle, "reverse", 0
+    return cycle, "end_charge", None
+
+
+class MissionJournal:
+    """Append-only record of mission progress so a restarted backend can pick up a patrol.
+
+    Each record is one JSON line, written and flushed to the OS immediately, so
+    a process crash loses nothing; fsync is batched on a background thread
+    every MISSION_JOURNAL_FSYNC_INTERVAL seconds to bound what a power cut can
+    lose without paying a disk sync per record. Only one mission runs at a
+    time, so starting a mission rewrites the file with just its first record.
+    """
+
+    def __init__(self, path=MISSION_JOURNAL_FILE, fsync_interval=MISSION_JOURNAL_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._dirty = False
+        self._wake = threading.Event()
+        self._flusher = None
+        self._missions = {}  # mission_id -> folded state
+
+        # Journal statistics
+        self.records = 0
+        self.fsyncs = 0
+
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        missions = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A torn last line from a crash mid-write
+                    mission_id = record.get("mission_id")
+                    if record.get("event") == "mission_started" or mission_id in missions:
+                        fold(missions.setdefault(mission_id, {}), record)
+        except OSError as e:
+            log.warning(f"⚠️ [JOURNAL] Ignoring unreadable mission journal: {e}")
+            return
+        with self._lock:
+            self._missions = missions
+        pending = self.resumable()
+        if pending:
+            cycle, phase, index = resume_position(pending)
+            where = "its end-of-cycle charge" if index is None else f"{phase} leg {index + 1}"
+            log.info(f"📒 [JOURNAL] Unfinished mission {pending['mission_id']} can resume at cycle {cycle}, {where}")
+
+    def begin(self, mission_id, robot_ip, port, map_ids, charge_map_id, resume=None):
+        """Start journaling a mission; resume is the state of the journaled mission it continues"""
+        record = {"event": "mission_started", "mission_id": mission_id, "at": time.time(), "robot_ip": robot_ip,
+                  "port": port, "map_ids": list(map_ids), "charge_map_id": charge_map_id}
+        if resume:
+            record.update({key: resume.get(key) for key in ("cycle", "phase", "map_index", "last_leg")})
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._close()
+            self._missions = {mission_id: fold({}, record)}
+            if not self.path:
+                return
+            try:
+                # The previous journal stays intact until the new one is on disk
+                write_atomically(self.path, line, fsync=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                self.records += 1
+            except OSError as e:
+                log.warning(f"⚠️ [JOURNAL] Could not start mission journal: {e}")
+
+    def record(self, mission_id, event, **fields):
+        record = {"event": event, "mission_id": mission_id, "at": time.time(), **fields}
+        with self._lock:
+            state = self._missions.get(mission_id)
+            if state is not None:
+                fold(state, record)
+            if not self.path:
+                return
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+                self.records += 1
+                self._dirty = True
+            except OSError as e:
+                log.warning(f"⚠️ [JOURNAL] Could not append to mission journal: {e}")
+                return
+        self._ensure_flusher()
+        self._wake.set()
+
+    def finish(self, mission_id, result):
+        """Mark a mission as over (completed, failed or cancelled) so it is no longer resumable"""
+        result = {"success": bool((result or {}).get("success")), "message": (result or {}).get("message")}
+        self.record(mission_id, "mission_finished", result=result)
+        self.sync()
+
+    def sync(self):
+        with self._lock:
+            if self._file is None or not self._dirty:
+                return
+            try:
+                os.fsync(self._file.fileno())
+                self.fsyncs += 1
+                self._dirty = False
+            except (OSError, ValueError) as e:
+                log.warning(f"⚠️ [JOURNAL] fsync failed: {e}")
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="mission-journal-fsync", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self.fsync_interval)  # Collect every record of the interval into one fsync
+            self.sync()
+
+    def _close(self):
+        """Sync and close the open journal file (caller holds the lock)"""
+        if self._file is None:
+            return
+        try:
+            if self._dirty:
+                os.fsync(self._file.fileno())
+                self.fsyncs += 1
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        self._dirty = False
+
+    def resumable(self):
+        """Folded state of the unfinished mission left by a previous run, or None"""
+        with self._lock:
+            pending = [state for state in self._missions.values() if not state.get("finished")]
+            return dict(pending[-1]) if pending else None
+
+    def discard(self):
+        """Forget an unfinished mission instead of resuming it"""
+        pending = self.resumable()
+        if pending:
+            self.finish(pending["mission_id"], {"success": False, "message": "Discarded instead of resumed"})
+        return pending
+
+    def stats(self):
+        return {"path": self.path, "records": self.records, "fsyncs": self.fsyncs}
+
+
+mission_journal = MissionJournal()
@@ -0,0 +1,290 @@
+import array
+import os
+import platform
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+from cache_support import SingleFlight
+from robot_logging import get_logger
+
+log = get_logger("network")
+
+try:
+    import fcntl  # Linux/macOS only; interface ioctls are skipped without it
+except ImportError:
+    fcntl = None
+
+# --- NETWORK INFO CONFIGURATION ---
+NETWORK_INFO_TTL = int(os.getenv("NETWORK_INFO_TTL", "30"))  # Seconds before the cached info is re-probed
+SUBPROCESS_TIMEOUT = 5
+
+# Linux interface ioctls (linux/sockios.h, linux/wireless.h)
+SIOCGIFADDR = 0x8915
+SIOCGIWESSID = 0x8B1B
+IW_ESSID_MAX_SIZE = 32
+SYS_CLASS_NET = "/sys/class/net"
+PROC_NET_ROUTE = "/proc/net/route"
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _run(args):
+    return subprocess.run(args, capture_output=True, text=True, encoding="utf-8", timeout=SUBPROCESS_TIMEOUT)
+
+
+# --- LINUX (/proc, /sys and ioctls; no subprocesses) ---
+
+def linux_default_interface():
+    """Interface of the lowest-metric default route in /proc/net/route, or None"""
+    best = None
+    for line in _read(PROC_NET_ROUTE).splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 7 or fields[1] != "00000000" or not int(fields[3], 16) & 0x2:
+            continue
+        metric = int(fields[6])
+        if best is None or metric < best[1]:
+            best = (fields[0], metric)
+    return best[0] if best else None
+
+
+def linux_wireless_interfaces():
+    try:
+        names = sorted(os.listdir(SYS_CLASS_NET))
+    except OSError:
+        return []
+    return [name for name in names if os.path.isdir(os.path.join(SYS_CLASS_NET, name, "wireless"))]
+
+
+def linux_fingerprint():
+    """Cheap summary of the interface state; it changes when routes, links or associations change"""
+    parts = [_read(PROC_NET_ROUTE)]
+    try:
+        names = sorted(os.listdir(SYS_CLASS_NET))
+    except OSError:
+        names = []
+    for name in names:
+        base = os.path.join(SYS_CLASS_NET, name)
+        parts.append(f"{name}:{_read(os.path.join(base, 'operstate')).strip()}:{_read(os.path.join(base, 'carrier_changes')).strip()}")
+    return "\n".join(parts)
+
+
+def linux_interface_ip(interface):
+    if fcntl is None or not interface:
+        return None
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            packed = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack("256s", interface[:15].encode()))
+        return socket.inet_ntoa(packed[20:24])
+    except OSError:
+        return None
+
+
+def linux_interface_ssid(interface):
+    """SSID via the wireless-extensions ioctl (what iwgetid does), or None"""
+    if fcntl is None or not interface:
+        return None
+    essid = array.array("B", bytes(IW_ESSID_MAX_SIZE + 1))
+    address, length = essid.buffer_info()
+    request = struct.pack("16sPHH", interface[:15].encode(), address, length, 0).ljust(32, b"\0")
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            fcntl.ioctl(s.fileno(), SIOCGIWESSID, request)
+    except OSError:
+        return None
+    return essid.tobytes().split(b"\0", 1)[0].decode("utf-8", errors="replace") or None
+
+
+def linux_wifi_name_subprocess():
+    """Fallback for drivers without wireless-extensions support"""
+    methods = [
+        ['iwgetid', '-r'],
+        ['nmcli', '-t', '-f', 'active,ssid', 'dev', 'wifi'],
+        ['iwconfig']
+    ]
+    for method in methods:
+        try:
+            result = _run(method)
+        except Exception:
+            continue
+        if result.returncode != 0:
+            continue
+        if method[0] == 'iwgetid' and result.stdout.strip():
+            return result.stdout.strip()
+        if method[0] == 'nmcli':
+            for line in result.stdout.split('\n'):
+                if line.startswith('yes:'):
+                    return line.split(':', 1)[1]
+        if method[0] == 'iwconfig':
+            for line in result.stdout.split('\n'):
+                if 'ESSID:"' in line:
+                    return line.split('ESSID:"')[1].split('"')[0]
+    return None
+
+
+def probe_linux():
+    interface = linux_default_interface()
+    ip = linux_interface_ip(interface)
+    wireless = linux_wireless_interfaces()
+    # Prefer the default-route interface, then any other associated wireless interface
+    candidates = ([interface] if interface in wireless else []) + [name for name in wireless if name != interface]
+    wifi_name = None
+    for name in candidates:
+        wifi_name = linux_interface_ssid(name)
+        if wifi_name:
+            break
+    if not wifi_name and wireless:
+        wifi_name = linux_wifi_name_subprocess()
+    return ip, wifi_name, interface
+
+
+# --- WINDOWS / MACOS (subprocesses, run only when the cache is refreshed) ---
+
+def probe_windows_wifi_name():
+    # Method 1: netsh wlan show interfaces
+    try:
+        result = _run(['netsh', 'wlan', 'show', 'interfaces'])
+        if result.returncode == 0:
+            for line in result.stdout.split('\n'):
+                line = line.strip()
+                # Look for SSID line (not BSSID)
+                if line.startswith('SSID') and 'BSSID' not in line and ':' in line:
+                    return line.split(':', 1)[1].strip()
+                elif 'Profile' in line and ':' in line:
+                    potential_name = line.split(':', 1)[1].strip()
+                    if potential_name:
+                        return potential_name
+    except Exception as e:
+        log.warning(f"⚠️ [NETWORK] netsh failed: {e}")
+
+    # Method 2: PowerShell connection profile
+    try:
+        ps_command = 'Get-NetConnectionProfile | Where-Object {$_.NetworkCategory -ne "DomainAuthenticated"} | Select-Object -First 1 -ExpandProperty Name'
+        result = _run(['powershell', '-Command', ps_command])
+        if result.returncode == 0 and result.stdout.strip():
+            # Use the full line as SSID; do not split to keep spaces in SSID
+            return result.stdout.strip()
+    except Exception as e:
+        log.warning(f"⚠️ [NETWORK] PowerShell failed: {e}")
+    return None
+
+
+def probe_macos_wifi_name():
+    try:
+        result = _run(['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-I'])
+        for line in result.stdout.split('\n'):
+            if ' SSID:' in line:
+                return line.split(':', 1)[1].strip()
+    except Exception:
+        pass
+    try:
+        result = _run(['networksetup', '-getairportnetwork', 'en0'])
+        if 'Current Wi-Fi Network:' in result.stdout:
+            return result.stdout.split('Current Wi-Fi Network:')[1].strip()
+    except Exception:
+        pass
+    return None
+
+
+def probe_route_ip():
+    """Local address used for outbound traffic (connect() on UDP sends no packet)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+
+class NetworkInfoProvider:
+    """The device's WiFi name and IP address, cached between probes.
+
+    On Linux the interface state is fingerprinted from /proc/net/route and
+    /sys/class/net on every read (a few small file reads) and re-probed via
+    ioctls as soon as it changes. Elsewhere the subprocess probes run at most
+    once per TTL, in the background while the previous value is served.
+    """
+
+    def __init__(self, ttl=NETWORK_INFO_TTL):
+        self.ttl = ttl
+        self.system = platform.system()
+        self._info = None  # {"ip", "wifi_name", "interface", "checked_at"}
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self._refreshes = SingleFlight("network-info-refresh")
+
+        # Provider statistics
+        self.probes = 0
+        self.changes = 0
+
+    def _probe(self):
+        fingerprint = linux_fingerprint() if self.system == "Linux" else None
+        if self.system == "Linux":
+            ip, wifi_name, interface = probe_linux()
+            ip = ip or probe_route_ip()
+        else:
+            ip, interface = probe_route_ip(), None
+            if self.system == "Windows":
+                wifi_name = probe_windows_wifi_name()
+            elif self.system == "Darwin":
+                wifi_name = probe_macos_wifi_name()
+            else:
+                wifi_name = None
+        info = {"ip": ip, "wifi_name": wifi_name, "interface": interface, "checked_at": time.time()}
+        with self._lock:
+            previous = self._info
+            self._info = info
+            self._fingerprint = fingerprint
+            self.probes += 1
+            changed = previous is None or (previous["ip"], previous["wifi_name"]) != (ip, wifi_name)
+            if changed:
+                self.changes += 1
+        if changed:
+            log.info(f"🔍 [NETWORK] Device on {wifi_name or 'no WiFi'} with IP {ip or 'none'}")
+        return info
+
+    def _refresh_async(self):
+        def refresh():
+            try:
+                self._probe()
+            except Exception as e:
+                log.warning(f"⚠️ [NETWORK] Background probe failed: {e}")
+
+        self._refreshes.start(None, refresh)
+
+    def get(self, force=False):
+        """Return {"ip", "wifi_name", "interface", "checked_at", "age"} from cache, probing only when needed"""
+        with self._lock:
+            info = self._info
+            fingerprint = self._fingerprint
+        if force or info is None:
+            info = self._probe()
+        elif self.system == "Linux":
+            # Probing is cheap here, so a detected change is handled before answering
+            if linux_fingerprint() != fingerprint or time.time() - info["checked_at"] >= self.ttl:
+                info = self._probe()
+        elif time.time() - info["checked_at"] >= self.ttl:
+            self._refresh_async()
+        return {**info, "age": round(time.time() - info["checked_at"], 1)}
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._info) if self._info else None
+        return {
+            "ttl": self.ttl,
+            "system": self.system,
+            "probes": self.probes,
+            "changes": self.changes,
+            "age": round(time.time() - info["checked_at"], 1) if info else None,
+        }
+
+
+network_info = NetworkInfoProvider()
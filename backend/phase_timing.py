@@ -0,0 +1,157 @@
+import contextlib
+import threading
+import time
+
+# --- PHASE TIMING CONFIGURATION ---
+# Histogram bucket upper bounds in seconds; phases range from sub-second replies to hour-long charges
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+class Histogram:
+    """Bucketed durations of one phase (optionally on one map) with count, sum and extremes"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.failures = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def observe(self, seconds, ok=True):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.failures += 0 if ok else 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.last = seconds
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count, histogram.failures, histogram.sum = self.count, self.failures, self.sum
+        histogram.min, histogram.max, histogram.last = self.min, self.max, self.last
+        return histogram
+
+    def quantile(self, q):
+        """Estimate from the buckets, interpolating linearly inside the bucket that holds the rank"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if bucket_count and seen + bucket_count >= rank:
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+            lower = upper
+        return self.max
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "min": round(self.min, 3) if self.min is not None else None,
+            "max": round(self.max, 3) if self.max is not None else None,
+            "last": round(self.last, 3) if self.last is not None else None,
+            "p50": round(self.quantile(0.5), 3) if self.count else None,
+            "p95": round(self.quantile(0.95), 3) if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class Span:
+    """One timed phase; set ok = False (or raise) to count it as a failure"""
+
+    def __init__(self, phase, map_id):
+        self.phase = phase
+        self.map_id = map_id
+        self.ok = True
+        self.started = time.perf_counter()
+
+
+class PhaseTimings:
+    """Duration histograms per navigation phase, overall and per map id"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # (phase, map_id or None) -> Histogram
+        self.started_at = time.time()
+
+    @contextlib.contextmanager
+    def span(self, phase, map_id=None):
+        span = Span(phase, map_id)
+        try:
+            yield span
+        except BaseException:
+            span.ok = False
+            raise
+        finally:
+            self.observe(phase, time.perf_counter() - span.started, map_id=map_id, ok=span.ok)
+
+    def observe(self, phase, seconds, map_id=None, ok=True):
+        keys = [(phase, None)] + ([(phase, map_id)] if map_id else [])
+        with self._lock:
+            for key in keys:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                histogram.observe(seconds, ok)
+
+    def snapshot(self):
+        """{phase: {...overall histogram..., "maps": {map_id: histogram}}}"""
+        with self._lock:
+            items = [(key, histogram.snapshot()) for key, histogram in self._histograms.items()]
+        phases = {}
+        for (phase, map_id), data in sorted(items, key=lambda item: (item[0][0], item[0][1] or "")):
+            entry = phases.setdefault(phase, {"maps": {}})
+            if map_id is None:
+                entry.update(data)
+            else:
+                entry["maps"][map_id] = data
+        return phases
+
+    def histograms(self):
+        """[(phase, map_id or None, Histogram)] for exporters, copied under the lock.
+
+        One series per map, plus map_id None for the spans filed under no map,
+        so the series of a phase add up to its overall histogram instead of
+        repeating it.
+        """
+        with self._lock:
+            items = [(key, histogram.copy()) for key, histogram in self._histograms.items()]
+        unattributed = {phase: histogram for (phase, map_id), histogram in items if map_id is None}
+        series = []
+        for (phase, map_id), histogram in items:
+            if map_id is None:
+                continue
+            series.append((phase, map_id, histogram))
+            rest = unattributed[phase]
+            rest.counts = [total - part for total, part in zip(rest.counts, histogram.counts)]
+            rest.count -= histogram.count
+            rest.failures -= histogram.failures
+            rest.sum -= histogram.sum
+        series.extend((phase, None, rest) for phase, rest in unattributed.items() if rest.count)
+        return series
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.started_at = time.time()
+
+
+phase_timings = PhaseTimings()
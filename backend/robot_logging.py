@@ -0,0 +1,152 @@
+"""Leveled, buffered logging for the backend and the navigation engine.
+
+Callers only format the record and put it on a bounded in-memory queue; a
+listener thread does the console and rotating-file I/O, so a slow terminal
+or disk never stalls a navigation poll loop. Call sites that fire in bursts
+are rate limited, and the suppressed count is reported with the next
+message that gets through.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+from metrics import Family, registry
+
+# --- LOGGING CONFIGURATION ---
+if getattr(sys, "frozen", False):  # PyInstaller build: log next to the executable
+    _BASE_DIR = os.path.dirname(sys.executable)
+else:
+    _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(_BASE_DIR, "logs", "robot.log"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1").lower() not in ("0", "false", "no")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+LOG_QUEUE_SIZE = 10000  # Records buffered for the writer thread before new ones are dropped
+RATE_LIMIT_WINDOW = 10  # Seconds
+RATE_LIMIT_BURST = 10  # Copies of one message per window before the rest are suppressed (below WARNING)
+RATE_LIMIT_MAX_KEYS = 1000  # Distinct messages tracked before expired ones are forgotten
+
+ROOT_LOGGER = "robot"
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most burst copies of the same message through each window.
+
+    Records are keyed by message template plus args, so a line that logs
+    different things is not silenced by its own history. WARNING and above
+    always pass.
+    """
+
+    def __init__(self, window=RATE_LIMIT_WINDOW, burst=RATE_LIMIT_BURST, max_keys=RATE_LIMIT_MAX_KEYS):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.suppressed_total = 0
+        self._messages = {}  # (template, args) -> [window_start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (str(record.msg), repr(record.args))
+        with self._lock:
+            entry = self._messages.get(key)
+            if entry is None or record.created - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                if entry is None and len(self._messages) >= self.max_keys:
+                    self._prune(record.created)
+                self._messages[key] = [record.created, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.getMessage()} (+{suppressed} similar messages suppressed)"
+                    record.args = ()
+                return True
+            entry[1] += 1
+            if entry[1] <= self.burst:
+                return True
+            entry[2] += 1
+            self.suppressed_total += 1
+            return False
+
+    def _prune(self, now):
+        """Forget messages whose window has passed (caller holds the lock)"""
+        self._messages = {key: entry for key, entry in self._messages.items() if now - entry[0] < self.window}
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops the record instead of waiting when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_rate_limit = None
+
+
+def setup_logging(level=LOG_LEVEL, log_file=LOG_FILE, console=LOG_CONSOLE):
+    """Attach the queue handler to the "robot" logger and start the writer thread (once)"""
+    global _listener, _queue_handler, _rate_limit
+    with _setup_lock:
+        if _listener is not None:
+            return
+        handlers = []
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%H:%M:%S"))
+            handlers.append(console_handler)
+        if log_file:
+            try:
+                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+                file_handler = logging.handlers.RotatingFileHandler(
+                    log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+                )
+                file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s %(threadName)s: %(message)s"))
+                handlers.append(file_handler)
+            except OSError as e:
+                print(f"⚠️ [LOG] Cannot write {log_file}, logging to console only: {e}")
+
+        _rate_limit = RateLimitFilter()
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(_rate_limit)
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, level, logging.INFO))
+        root.addHandler(_queue_handler)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # Flush what is still queued on exit
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def collect_logging_metrics():
+    if _queue_handler is None:
+        return []
+    dropped = Family("log_records_dropped_total", "counter", "Log records dropped because the writer queue was full")
+    dropped.add(_queue_handler.dropped)
+    suppressed = Family("log_records_suppressed_total", "counter", "Repeated log records suppressed by rate limiting")
+    suppressed.add(_rate_limit.suppressed_total)
+    backlog = Family("log_queue_backlog", "gauge", "Log records waiting for the writer thread")
+    backlog.add(_queue_handler.queue.qsize())
+    return [dropped, suppressed, backlog]
+
+
+registry.add_collector(collect_logging_metrics)
@@ -0,0 +1,473 @@
+import asyncio
+import collections
+import concurrent.futures
+import json
+import queue
+import threading
+import time
+import weakref
+
+import websocket
+
+from metrics import Family, registry
+from robot_logging import get_logger
+
+log = get_logger("session")
+
+# --- SESSION CONFIGURATION ---
+DEFAULT_WS_PORT = 5000
+CONNECT_TIMEOUT = 5  # Seconds allowed for the TCP + WebSocket handshake
+READ_POLL_INTERVAL = 0.5  # Reader wakes up this often to notice close requests and expire calls
+CALL_TIMEOUT = 10  # Default seconds a call() waits for its reply
+MIN_RECONNECT_BACKOFF = 0.5
+MAX_RECONNECT_BACKOFF = 30
+SUBSCRIPTION_BACKLOG = 1000  # Frames kept per subscription before the oldest are dropped
+
+
+class Subscription:
+    """Queue of decoded robot frames for a set of cmds.
+
+    An empty cmd set subscribes to every frame. Subscribe *before* sending the
+    request whose reply you want so it cannot slip past. Usable as a context
+    manager; abandoned subscriptions are dropped automatically.
+    """
+
+    def __init__(self, session, cmds):
+        self.session = session
+        self.cmds = frozenset(cmds)
+        self.inbox = queue.Queue(maxsize=SUBSCRIPTION_BACKLOG)
+        self.closed = False
+
+    def _deliver(self, msg):
+        while True:
+            try:
+                self.inbox.put_nowait(msg)
+                return
+            except queue.Full:
+                # Slow consumer: drop the oldest frame rather than block the reader
+                try:
+                    self.inbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Return the next matching frame, or None if none arrives within timeout."""
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wake(self):
+        """Make a blocked get() return None now, e.g. when the reader must re-check its state."""
+        self._deliver(None)
+
+    def drain(self):
+        """Discard every queued frame; returns how many were dropped."""
+        dropped = 0
+        while True:
+            try:
+                self.inbox.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                return dropped
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.session._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RobotCallTimeout(TimeoutError):
+    """Raised into a call() future when no matching reply arrives in time."""
+
+
+class _PendingReply:
+    def __init__(self, cmds, match, deadline):
+        self.cmds = cmds
+        self.match = match
+        self.deadline = deadline
+        self.future = concurrent.futures.Future()
+
+    def accepts(self, msg):
+        if self.match is None:
+            return True
+        try:
+            return bool(self.match(msg))
+        except Exception:
+            return False
+
+
+class RobotSession:
+    """One long-lived WebSocket connection to a robot, reconnected with backoff.
+
+    A background reader thread owns the socket, decodes every inbound frame once
+    and routes it by its "cmd" to the subscriptions interested in it. The latest
+    frame of each cmd is also kept so callers can read recent state without
+    waiting. Sends are serialized on a lock.
+
+    response_* frames carry no request id, so a reply goes to the oldest
+    outstanding call expecting that cmd whose match accepts it. Calls register
+    their reply and send under one lock, keeping the two orders the same, and
+    a cancelled call keeps its place until its deadline so its late reply is
+    not handed to the next caller.
+    """
+
+    def __init__(self, ip, port=DEFAULT_WS_PORT, connect_timeout=CONNECT_TIMEOUT,
+                 min_backoff=MIN_RECONNECT_BACKOFF, max_backoff=MAX_RECONNECT_BACKOFF):
+        self.ip = ip
+        self.port = int(port)
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._ws = None
+        self._conn_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._call_lock = threading.Lock()  # Reply registration and send happen as one step
+        self._subs_lock = threading.Lock()
+        self._pending_changed = threading.Condition(self._subs_lock)  # Notified when a reply slot frees up
+        # cmd -> subscriptions (None holds catch-all subscriptions). Weak so a
+        # subscription abandoned on an error path stops receiving frames.
+        self._subscribers = {}
+        self._pending = []
+        self._latest = {}
+        self._connected = threading.Event()
+        self._closing = threading.Event()
+        self._reader = None
+        self._backoff = min_backoff
+        self._retry_at = 0
+
+        # Connection statistics
+        self.connects = 0
+        self.connect_failures = 0
+        self.last_error = None
+        self.connected_since = None
+        self.sent = collections.Counter()  # Frames per cmd
+        self.received = collections.Counter()
+
+    @property
+    def url(self):
+        return f"ws://{self.ip}:{self.port}"
+
+    def is_connected(self):
+        return self._connected.is_set()
+
+    def start(self):
+        """Start the reader thread if it is not already running."""
+        with self._start_lock:
+            if self._reader and self._reader.is_alive():
+                return
+            self._closing.clear()
+            self._reader = threading.Thread(target=self._run, name=f"robot-session-{self.ip}", daemon=True)
+            self._reader.start()
+
+    def wait_connected(self, timeout=None):
+        self.start()
+        return self._connected.wait(timeout)
+
+    def subscribe(self, *cmds):
+        """Subscribe to frames with the given cmds (every frame when none given)."""
+        self.start()
+        sub = Subscription(self, cmds)
+        with self._subs_lock:
+            for cmd in sub.cmds or (None,):
+                self._subscribers.setdefault(cmd, weakref.WeakSet()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._subs_lock:
+            for cmd in sub.cmds or (None,):
+                subs = self._subscribers.get(cmd)
+                if subs is not None:
+                    subs.discard(sub)
+
+    def latest(self, cmd):
+        """Return (received_at, frame) for the last frame seen with this cmd, or (None, None)."""
+        return self._latest.get(cmd, (None, None))
+
+    def wait_for(self, cmd, predicate=None, timeout=None):
+        """Block until a frame with this cmd (and matching predicate) arrives; None on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.subscribe(cmd) as sub:
+            while True:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                msg = sub.get(timeout=remaining)
+                if msg is None:
+                    return None
+                if predicate is None or predicate(msg):
+                    return msg
+
+    def expect(self, cmds, match=None, timeout=CALL_TIMEOUT, exclusive=False):
+        """Return a Future resolved with the next frame of these cmds accepted by match.
+
+        The future fails with RobotCallTimeout once timeout elapses (checked by the
+        reader every READ_POLL_INTERVAL) or with ConnectionError if the link drops.
+        exclusive first waits, within the same timeout, until no other expectation
+        of these cmds is outstanding.
+        """
+        self.start()
+        cmds = frozenset((cmds,) if isinstance(cmds, str) else cmds)
+        deadline = None if timeout is None else time.time() + timeout
+        pending = _PendingReply(cmds, match, deadline)
+        with self._pending_changed:
+            if exclusive and not self._pending_changed.wait_for(
+                    lambda: not any(p.cmds & cmds for p in self._pending), timeout):
+                pending.future.set_exception(RobotCallTimeout(f"Another {'/'.join(sorted(cmds))} still outstanding"))
+                return pending.future
+            self._pending.append(pending)
+        return pending.future
+
+    def call(self, cmd, data=None, expect=None, match=None, timeout=CALL_TIMEOUT, exclusive=False):
+        """Send a command and return a Future for its reply.
+
+        expect names the reply cmd(s); without it the future resolves to None as
+        soon as the command is sent. The expectation is registered before sending
+        so a fast reply cannot be missed.
+
+        Calls to different reply cmds run concurrently. Calls expecting the same
+        reply cmd are answered in the order they were sent, which is only right
+        if the robot answers in that order too; when it may not, give each call
+        a match that tells its reply apart, or do not run them concurrently.
+        exclusive=True enforces the latter: the command is only sent once no
+        other call expecting the same reply is outstanding (within timeout).
+        """
+        payload = {"cmd": cmd}
+        if data is not None:
+            payload["data"] = data
+        if expect is None:
+            future = concurrent.futures.Future()
+            try:
+                self.send(payload)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if exclusive:
+            # Waits for the reply slot outside the call lock so other calls are not held up
+            future = self.expect(expect, match=match, timeout=timeout, exclusive=True)
+            if not future.done():
+                self._send_for(future, payload)
+            return future
+        with self._call_lock:
+            future = self.expect(expect, match=match, timeout=timeout)
+            self._send_for(future, payload)
+        return future
+
+    def _send_for(self, future, payload):
+        try:
+            self.send(payload)
+        except Exception as e:
+            self._fail_pending(lambda p: p.future is future, e)
+
+    def call_async(self, cmd, data=None, expect=None, match=None, timeout=CALL_TIMEOUT):
+        """Awaitable variant of call(); must be used from a running event loop."""
+        return asyncio.wrap_future(self.call(cmd, data, expect=expect, match=match, timeout=timeout))
+
+    def request(self, cmd, data=None, expect=None, match=None, timeout=CALL_TIMEOUT):
+        """Blocking call(): return the reply frame, or None on timeout or send failure."""
+        future = self.call(cmd, data, expect=expect, match=match, timeout=timeout)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            return None
+
+    def _fail_pending(self, selector, error):
+        with self._pending_changed:
+            failed = [p for p in self._pending if selector(p)]
+            if failed:
+                self._pending = [p for p in self._pending if p not in failed]
+                self._pending_changed.notify_all()
+        for pending in failed:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    def _expire_pending(self):
+        # A cancelled call still owns the reply already on its way; it only lets go at its deadline
+        now = time.time()
+        self._fail_pending(
+            lambda p: (p.deadline is not None and now >= p.deadline) or (p.deadline is None and p.future.done()),
+            RobotCallTimeout("No reply from robot in time"),
+        )
+
+    def _resolve_pending(self, cmd, msg):
+        # A response_* frame answers one outstanding call (oldest first), even a
+        # cancelled one; notify_* frames are broadcasts and satisfy every live
+        # waiter that accepts them.
+        broadcast = isinstance(cmd, str) and cmd.startswith("notify_")
+        resolved = []
+        with self._subs_lock:
+            for pending in self._pending:
+                if cmd not in pending.cmds or (broadcast and pending.future.done()) or not pending.accepts(msg):
+                    continue
+                resolved.append(pending)
+                if not broadcast:
+                    break
+            if resolved:
+                self._pending = [p for p in self._pending if p not in resolved]
+                self._pending_changed.notify_all()
+        for pending in resolved:
+            if not pending.future.done():
+                pending.future.set_result(msg)
+
+    def _dispatch(self, frame):
+        try:
+            msg = json.loads(frame)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(msg, dict):
+            return
+        cmd = msg.get("cmd")
+        self.received[cmd] += 1
+        self._latest[cmd] = (time.time(), msg)
+        self._resolve_pending(cmd, msg)
+        with self._subs_lock:
+            targets = list(self._subscribers.get(cmd, ())) + list(self._subscribers.get(None, ()))
+        for sub in targets:
+            sub._deliver(msg)
+
+    def _ensure_connected(self):
+        with self._conn_lock:
+            if self._ws is not None:
+                return self._ws
+            if time.time() < self._retry_at:
+                raise ConnectionError(f"Robot at {self.url} unreachable, retrying in {self._retry_at - time.time():.1f}s")
+            try:
+                ws = websocket.create_connection(self.url, timeout=self.connect_timeout)
+            except Exception as e:
+                self.connect_failures += 1
+                self.last_error = str(e)
+                self._retry_at = time.time() + self._backoff
+                log.error(f"❌ [SESSION] Connection to {self.url} failed ({e}), next attempt in {self._backoff:.1f}s")
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                raise
+            ws.settimeout(READ_POLL_INTERVAL)
+            self._ws = ws
+            self._backoff = self.min_backoff
+            self._retry_at = 0
+            self.connects += 1
+            self.connected_since = time.time()
+            self._connected.set()
+            log.info(f"✅ [SESSION] Connected to robot at {self.url}")
+            return ws
+
+    def _drop(self, ws, reason):
+        with self._conn_lock:
+            if self._ws is not ws:
+                return
+            self._ws = None
+            self._connected.clear()
+            self.connected_since = None
+            self.last_error = str(reason)
+        try:
+            ws.abort()
+            ws.shutdown()
+        except Exception:
+            pass
+        # Replies to anything sent on the old connection will never arrive
+        self._fail_pending(lambda p: True, ConnectionError(f"Connection to {self.url} lost: {reason}"))
+        if not self._closing.is_set():
+            log.warning(f"⚠️ [SESSION] Connection to {self.url} lost: {reason}")
+
+    def _run(self):
+        while not self._closing.is_set():
+            try:
+                ws = self._ensure_connected()
+            except Exception:
+                self._closing.wait(max(self._retry_at - time.time(), 0.1))
+                continue
+            try:
+                frame = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                frame = None
+            except Exception as e:
+                self._drop(ws, e)
+                continue
+            if frame:
+                self._dispatch(frame)
+            if self._pending:
+                self._expire_pending()
+
+    def send(self, payload):
+        """Send a dict (JSON-encoded) or a pre-encoded string to the robot."""
+        cmd = payload.get("cmd") if isinstance(payload, dict) else None
+        if not isinstance(payload, str):
+            payload = json.dumps(payload)
+        ws = self._ensure_connected()
+        try:
+            with self._send_lock:
+                ws.send(payload)
+                self.sent[cmd] += 1
+        except Exception as e:
+            self._drop(ws, e)
+            raise
+
+    def close(self):
+        """Stop the reader thread and close the underlying connection."""
+        self._closing.set()
+        with self._conn_lock:
+            ws = self._ws
+        if ws is not None:
+            self._drop(ws, "session closed")
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join(timeout=READ_POLL_INTERVAL * 2)
+
+
+# --- SESSION REGISTRY ---
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(ip, port=DEFAULT_WS_PORT):
+    """Return the shared session for a robot, creating and starting it on first use."""
+    key = (ip, int(port or DEFAULT_WS_PORT))
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = RobotSession(ip, key[1])
+            _sessions[key] = session
+    session.start()
+    return session
+
+
+def all_sessions():
+    with _sessions_lock:
+        return list(_sessions.values())
+
+
+def collect_session_metrics():
+    connects = Family("robot_ws_connects_total", "counter", "Successful WebSocket connections to the robot")
+    failures = Family("robot_ws_connect_failures_total", "counter", "Failed WebSocket connection attempts")
+    connected = Family("robot_ws_connected", "gauge", "1 while the robot session is connected")
+    sent = Family("robot_ws_messages_sent_total", "counter", "Frames sent to the robot by cmd")
+    received = Family("robot_ws_messages_received_total", "counter", "Frames received from the robot by cmd")
+    for session in all_sessions():
+        robot = f"{session.ip}:{session.port}"
+        connects.add(session.connects, robot=robot)
+        failures.add(session.connect_failures, robot=robot)
+        connected.add(session.is_connected(), robot=robot)
+        for cmd, count in list(session.sent.items()):
+            sent.add(count, robot=robot, cmd=cmd or "unknown")
+        for cmd, count in list(session.received.items()):
+            received.add(count, robot=robot, cmd=cmd or "unknown")
+    return [connects, failures, connected, sent, received]
+
+
+registry.add_collector(collect_session_metrics)
+
+
+def close_all_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
@@ -0,0 +1,545 @@
+"""Stand-in robot that speaks the robot's WebSocket protocol, for offline runs and benchmarks.
+
+    python robot_simulator.py --port 5000 --maps 4 --latency 0.05 --drop-rate 0.01
+
+Point the backend at 127.0.0.1 (DISCOVERY_CIDRS=127.0.0.1/32) or pass the
+address straight to run_multi_map_navigation_with_charging. Only the standard
+library is used, so it runs on any CI box.
+"""
+import argparse
+import base64
+import collections
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+
+# --- SIMULATOR CONFIGURATION ---
+DEFAULT_PORT = 5000
+TICK = 0.05  # Seconds between physics updates
+HEARTBEAT_INTERVAL = 0.5
+BATTERY_INTERVAL = 2.0
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Heartbeat codes the navigation engine reacts to
+NAVI_RUNNING = 6100
+NAVI_IDLE = 2006
+NAVI_EMERGENCY = 4001
+
+
+def demo_maps(count=3, leg_length=3.0):
+    """count navigation maps with an anchor and a destination, plus a "sim-charge" map with a pile"""
+    maps = {}
+    for i in range(1, count + 1):
+        maps[f"sim-map-{i}"] = {
+            "name": f"Sim Map {i}",
+            "points": [
+                {"type": "anchor_point", "name": "anchor", "x": 0.0, "y": 0.0, "theta": 0.0},
+                {"type": "destination", "name": "destination", "x": leg_length, "y": 0.0, "theta": 0.0},
+            ],
+        }
+    maps["sim-charge"] = {
+        "name": "Sim Charge Station",
+        "points": [
+            {"type": "anchor_point", "name": "anchor", "x": 0.0, "y": 0.0, "theta": 0.0},
+            {"type": "charge", "name": "pile", "x": 1.0, "y": 0.0, "theta": 0.0},
+        ],
+    }
+    return maps
+
+
+# --- MINIMAL WEBSOCKET SERVER (RFC 6455, text frames only) ---
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        data += chunk
+    return data
+
+
+def _read_frame(sock):
+    first, second = _recv_exact(sock, 2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if second & 0x80 else None
+    payload = bytearray(_recv_exact(sock, length))
+    if mask:
+        for i in range(length):
+            payload[i] ^= mask[i % 4]
+    return bool(first & 0x80), opcode, bytes(payload)
+
+
+def _frame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([126]) + struct.pack(">H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack(">Q", len(payload))
+    return header + payload
+
+
+def _handshake(sock):
+    request = b""
+    while b"\r\n\r\n" not in request:
+        chunk = sock.recv(1024)
+        if not chunk:
+            raise ConnectionError("client closed during handshake")
+        request += chunk
+    key = None
+    for line in request.decode("latin-1").split("\r\n"):
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sec-websocket-key":
+            key = value.strip()
+    if not key:
+        sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        raise ConnectionError("not a WebSocket upgrade")
+    accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+    sock.sendall((
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+    ).encode())
+
+
+class SimulatedClient:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.alive = True
+        self._send_lock = threading.Lock()
+
+    def send(self, opcode, payload):
+        if not self.alive:
+            return False
+        try:
+            with self._send_lock:
+                self.sock.sendall(_frame(opcode, payload))
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def close(self):
+        self.alive = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RobotSimulator:
+    """Simulated robot: maps, pose, navigation, docking and battery behind a WebSocket.
+
+    Every request is handled after latency (plus up to jitter) seconds, or the
+    per-command value in latencies. Each outgoing frame is lost with
+    probability drop_rate. Navigation moves the pose at nav_speed m/s,
+    draining drain_per_meter percent per metre on top of drain_per_second;
+    on the pile the battery gains charge_rate percent per second.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, maps=None, latency=0.05, jitter=0.0, latencies=None,
+                 drop_rate=0.0, battery=100.0, drain_per_meter=0.5, drain_per_second=0.01, charge_rate=1.0,
+                 nav_speed=0.5, heartbeat_interval=HEARTBEAT_INTERVAL, battery_interval=BATTERY_INTERVAL, seed=None):
+        self.host = host
+        self.port = port
+        self.maps = maps if maps is not None else demo_maps()
+        self.latency = latency
+        self.jitter = jitter
+        self.latencies = dict(latencies or {})
+        self.drop_rate = drop_rate
+        self.drain_per_meter = drain_per_meter
+        self.drain_per_second = drain_per_second
+        self.charge_rate = charge_rate
+        self.nav_speed = nav_speed
+        self.heartbeat_interval = heartbeat_interval
+        self.battery_interval = battery_interval
+        self._random = random.Random(seed)
+
+        # Robot state, guarded by _lock
+        self._lock = threading.Lock()
+        self.map_id = None
+        self.pose = {"x": 0.0, "y": 0.0, "theta": 0.0}
+        self.goal = None  # {"x", "y", "theta", "dock": bool}
+        self.battery = float(battery)
+        self.docked = False
+        self.emergency = 0
+
+        self._clients = set()
+        self._server = None
+        self._running = threading.Event()
+        self._schedule = []  # heap of (due, seq, callable)
+        self._schedule_cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads = []
+
+        # Message statistics
+        self.received = collections.Counter()
+        self.sent = collections.Counter()
+        self.dropped = collections.Counter()
+        self.connections = 0
+        self.activity = {"navigating": 0.0, "docked": 0.0, "idle": 0.0}  # Seconds spent in each state
+
+    # --- lifecycle ---
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self.port = self._server.getsockname()[1]  # Resolves port=0 to the one the OS picked
+        self._server.listen()
+        self._running.set()
+        for target, name in ((self._accept_loop, "accept"), (self._dispatch_loop, "dispatch"), (self._physics_loop, "physics")):
+            thread = threading.Thread(target=target, name=f"robot-sim-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🤖 [SIM] Simulated robot listening on {self.url} with {len(self.maps)} map(s)")
+        return self
+
+    def stop(self):
+        self._running.clear()
+        with self._schedule_cond:
+            self._schedule_cond.notify_all()
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        for client in list(self._clients):
+            client.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- controls for tests and benchmarks ---
+
+    def set_emergency(self, status):
+        """Press (1) or release (0) the emergency stop"""
+        with self._lock:
+            self.emergency = status
+            if status:
+                self.goal = None
+        self._broadcast({"cmd": "notify_emr_status", "data": {"status": status}})
+        if status:
+            self._broadcast({"cmd": "notify_heart_beat", "code": NAVI_EMERGENCY, "data": dict(self.pose)})
+
+    def set_battery(self, level):
+        with self._lock:
+            self.battery = float(level)
+        self._broadcast_battery()
+
+    def stats(self):
+        with self._lock:
+            state = {
+                "map_id": self.map_id,
+                "pose": dict(self.pose),
+                "navigating": self.goal is not None,
+                "battery": round(self.battery, 1),
+                "docked": self.docked,
+            }
+        return {
+            **state,
+            "connections": self.connections,
+            "received": dict(self.received),
+            "sent": dict(self.sent),
+            "dropped": dict(self.dropped),
+            "activity": {state: round(seconds, 2) for state, seconds in self.activity.items()},
+        }
+
+    def reset_stats(self):
+        self.received.clear()
+        self.sent.clear()
+        self.dropped.clear()
+        with self._lock:
+            self.activity = dict.fromkeys(self.activity, 0.0)
+
+    # --- transport ---
+
+    def _accept_loop(self):
+        while self._running.is_set():
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._client_loop, args=(sock, address), name="robot-sim-client", daemon=True).start()
+
+    def _client_loop(self, sock, address):
+        client = SimulatedClient(sock, address)
+        try:
+            _handshake(sock)
+        except (OSError, ConnectionError):
+            client.close()
+            return
+        self._clients.add(client)
+        self.connections += 1
+        self._send(client, self._heartbeat())
+        message = b""
+        try:
+            while self._running.is_set() and client.alive:
+                final, opcode, payload = _read_frame(sock)
+                if opcode == 0x8:  # close
+                    client.send(0x8, payload[:2])
+                    break
+                if opcode == 0x9:  # ping
+                    client.send(0xA, payload)
+                    continue
+                if opcode in (0x0, 0x1):
+                    message += payload
+                    if final:
+                        self._receive(client, message)
+                        message = b""
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._clients.discard(client)
+            client.close()
+
+    def _receive(self, client, raw):
+        try:
+            msg = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return
+        cmd = msg.get("cmd")
+        self.received[cmd] += 1
+        handler = getattr(self, f"_on_{cmd}", None)
+        if handler is None:
+            return  # Unknown commands get no answer, like the firmware
+        delay = self.latencies.get(cmd, self.latency) + self._random.uniform(0, self.jitter)
+        self._call_later(delay, lambda: handler(client, msg.get("data") or {}))
+
+    def _send(self, client, msg):
+        cmd = msg.get("cmd")
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.dropped[cmd] += 1
+            return
+        if client.send(0x1, json.dumps(msg).encode("utf-8")):
+            self.sent[cmd] += 1
+
+    def _broadcast(self, msg):
+        for client in list(self._clients):
+            self._send(client, msg)
+
+    def _call_later(self, delay, fn):
+        with self._schedule_cond:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._seq), fn))
+            self._schedule_cond.notify()
+
+    def _dispatch_loop(self):
+        while self._running.is_set():
+            with self._schedule_cond:
+                while self._running.is_set():
+                    now = time.monotonic()
+                    if self._schedule and self._schedule[0][0] <= now:
+                        _, _, fn = heapq.heappop(self._schedule)
+                        break
+                    self._schedule_cond.wait(self._schedule[0][0] - now if self._schedule else None)
+                else:
+                    return
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ [SIM] Handler failed: {e}")
+
+    # --- physics ---
+
+    def _heartbeat(self):
+        with self._lock:
+            code = NAVI_RUNNING if self.goal else NAVI_IDLE
+            return {"cmd": "notify_heart_beat", "code": code, "data": dict(self.pose)}
+
+    def _battery_frame(self):
+        with self._lock:
+            status = (2 if self.battery >= 100 else 1) if self.docked else 0
+            return {"cmd": "notify_battery_info", "data": {"battery": int(self.battery), "status": status}}
+
+    def _broadcast_battery(self):
+        self._broadcast(self._battery_frame())
+
+    def _physics_loop(self):
+        last = time.monotonic()
+        next_heartbeat = next_battery = last
+        while self._running.is_set():
+            time.sleep(TICK)
+            now = time.monotonic()
+            dt, last = now - last, now
+            arrived = None
+            with self._lock:
+                self.activity["navigating" if self.goal else "docked" if self.docked else "idle"] += dt
+                if self.docked:
+                    self.battery = min(100.0, self.battery + self.charge_rate * dt)
+                else:
+                    self.battery = max(0.0, self.battery - self.drain_per_second * dt)
+                if self.goal:
+                    dx, dy = self.goal["x"] - self.pose["x"], self.goal["y"] - self.pose["y"]
+                    distance = math.hypot(dx, dy)
+                    step = min(distance, self.nav_speed * dt)
+                    if distance > 0:
+                        self.pose["x"] += dx / distance * step
+                        self.pose["y"] += dy / distance * step
+                    self.battery = max(0.0, self.battery - self.drain_per_meter * step)
+                    if step >= distance:
+                        self.pose["theta"] = self.goal["theta"]
+                        arrived, self.goal = self.goal, None
+                        self.docked = bool(arrived.get("dock"))
+            if arrived:
+                if arrived.get("dock"):
+                    self._broadcast({"cmd": "response_dock_ctrl", "code": 0, "msg": "dock success"})
+                    self._broadcast_battery()
+                self._broadcast(self._heartbeat())
+                next_heartbeat = now + self.heartbeat_interval
+            if now >= next_heartbeat:
+                self._broadcast(self._heartbeat())
+                next_heartbeat = now + self.heartbeat_interval
+            if now >= next_battery:
+                self._broadcast_battery()
+                next_battery = now + self.battery_interval
+
+    def _navigate(self, x, y, theta, dock=False):
+        with self._lock:
+            if self.emergency:
+                return False
+            self.docked = False
+            self.goal = {"x": float(x), "y": float(y), "theta": float(theta), "dock": dock}
+            return True
+
+    # --- protocol handlers (called after the simulated latency) ---
+
+    def _on_request_heart_beat(self, client, data):
+        self._send(client, self._heartbeat())
+
+    def _on_request_map_list(self, client, data):
+        map_list = [{"name": info.get("name", map_id), "mapId": map_id} for map_id, info in self.maps.items()]
+        self._send(client, {"cmd": "response_map_list", "code": 0, "data": {"mapList": map_list}})
+
+    def _on_request_set_map(self, client, data):
+        map_id = data.get("mapId")
+        if map_id not in self.maps:
+            self._send(client, {"cmd": "response_set_map", "code": 1001, "msg": "map not found"})
+            return
+        with self._lock:
+            self.map_id = map_id
+            self.goal = None
+        self._send(client, {"cmd": "response_set_map", "code": 1000, "msg": "set map success"})
+
+    def _on_request_point_list(self, client, data):
+        info = self.maps.get(data.get("mapId"))
+        if info is None:
+            self._send(client, {"cmd": "response_point_list", "code": 1, "msg": "map not found", "data": {"points": []}})
+            return
+        self._send(client, {"cmd": "response_point_list", "code": 0, "data": {"points": info.get("points", [])}})
+
+    def _on_request_reset_map(self, client, data):
+        self._send(client, {"cmd": "response_reset_map", "code": 0})
+
+    def _on_request_force_relocate(self, client, data):
+        with self._lock:
+            localized = self.map_id is not None
+            if localized:
+                self.goal = None
+                self.pose = {"x": float(data.get("x", 0)), "y": float(data.get("y", 0)), "theta": float(data.get("theta", 0))}
+        self._send(client, {"cmd": "response_relocate_position", "code": 4000 if localized else 4002})
+        if localized:
+            self._broadcast(self._heartbeat())
+
+    def _on_request_start_navigation(self, client, data):
+        if not self._navigate(data.get("x", 0), data.get("y", 0), data.get("theta", 0)):
+            self._send(client, {"cmd": "response_start_navigation", "code": 1002, "msg": "emergency stop active"})
+            return
+        self._send(client, {"cmd": "response_start_navigation", "code": 1001, "msg": "navigation success"})
+        self._broadcast(self._heartbeat())
+
+    def _on_request_stop_navigation(self, client, data):
+        with self._lock:
+            self.goal = None
+        self._broadcast(self._heartbeat())
+
+    def _on_request_robot_status(self, client, data):
+        heartbeat = self._heartbeat()
+        self._send(client, {"cmd": "response_robot_status", "code": heartbeat["code"], "data": heartbeat["data"]})
+
+    def _on_request_dock_charge(self, client, data):
+        if data.get("mapId", self.map_id) != self.map_id or not self._navigate(data.get("x", 0), data.get("y", 0), data.get("theta", 0), dock=True):
+            self._send(client, {"cmd": "response_dock_ctrl", "code": 6016, "msg": "no charging pile detected"})
+
+    def _on_request_dock_charge_off(self, client, data):
+        with self._lock:
+            self.docked = False
+        self._broadcast_battery()
+
+    _on_request_cancel_charge = _on_request_dock_charge_off
+
+    def _on_request_battery_info(self, client, data):
+        self._send(client, self._battery_frame())
+
+    def _on_get_emr_status(self, client, data):
+        self._send(client, {"cmd": "notify_emr_status", "data": {"status": self.emergency}})
+
+    def _on_request_check_path(self, client, data):
+        self._send(client, {"cmd": "response_check_path", "code": 3002})
+
+    def _on_request_alternative_path(self, client, data):
+        self._send(client, {"cmd": "response_alternative_path", "code": 0})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated robot WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--maps", default="3", help="number of demo maps, or a JSON file {map_id: {name, points}}")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each request is handled")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability that an outgoing frame is lost")
+    parser.add_argument("--battery", type=float, default=100.0)
+    parser.add_argument("--drain-per-meter", type=float, default=0.5)
+    parser.add_argument("--drain-per-second", type=float, default=0.01)
+    parser.add_argument("--charge-rate", type=float, default=1.0, help="percent per second on the pile")
+    parser.add_argument("--nav-speed", type=float, default=0.5, help="metres per second")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.maps.isdigit():
+        maps = demo_maps(int(args.maps))
+    else:
+        with open(args.maps, "r", encoding="utf-8") as f:
+            maps = json.load(f)
+
+    simulator = RobotSimulator(
+        host=args.host, port=args.port, maps=maps, latency=args.latency, jitter=args.jitter,
+        drop_rate=args.drop_rate, battery=args.battery, drain_per_meter=args.drain_per_meter,
+        drain_per_second=args.drain_per_second, charge_rate=args.charge_rate, nav_speed=args.nav_speed, seed=args.seed
+    ).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 [SIM] Shutting down")
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+
+from event_bus import event_bus
+from metrics import Family, registry
+from robot_session import DEFAULT_WS_PORT, get_session
+
+# --- TELEMETRY CONFIGURATION ---
+EMERGENCY_POLL_INTERVAL = float(os.getenv("TELEMETRY_EMERGENCY_POLL_INTERVAL", "2"))  # Seconds between get_emr_status queries (the robot does not push it)
+TELEMETRY_DEMAND_WINDOW = float(os.getenv("TELEMETRY_DEMAND_WINDOW", "60"))  # Seconds the robot is still queried after the last snapshot read
+BATTERY_REFRESH_INTERVAL = 30  # Ask for battery info when no notify_battery_info arrived for this long
+BATTERY_RETRY_INTERVAL = 5  # Spacing of those battery queries while the robot stays silent
+COLLECTOR_TICK = 0.5
+
+TELEMETRY_CMDS = ("notify_battery_info", "notify_emr_status", "notify_heart_beat")
+
+
+class TelemetryCollector:
+    """Keeps the robot's latest battery, emergency, pose and heartbeat state in memory.
+
+    A daemon thread listens on the shared robot session and stamps every value
+    with the time it arrived, so status endpoints can answer from the snapshot
+    without touching the robot. Battery and emergency changes are also
+    published on the event bus for /api/robot/events clients.
+
+    Listening is free, but emergency status (and battery info, when the robot
+    stops pushing it) must be asked for. Those queries only go out while
+    /api/robot/events has subscribers or the snapshot was read within
+    TELEMETRY_DEMAND_WINDOW seconds.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._lock = threading.Lock()
+        self._snapshot = {
+            "battery": None,
+            "charging_status": None,
+            "battery_at": None,
+            "emergency_status": None,
+            "emergency_msg": None,
+            "emergency_at": None,
+            "pose": None,
+            "heartbeat_code": None,
+            "heartbeat_at": None,
+        }
+        self._wanted_until = 0  # Query the robot until then (see snapshot)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"telemetry-{session.ip}", daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stopping.set()
+
+    def snapshot(self, demand=True):
+        """Copy of the latest values plus the age in seconds of each group.
+
+        A read keeps the robot queried for TELEMETRY_DEMAND_WINDOW seconds;
+        demand=False reads without that (e.g. a metrics scrape).
+        """
+        now = time.time()
+        with self._lock:
+            if demand:
+                self._wanted_until = now + TELEMETRY_DEMAND_WINDOW
+            snapshot = dict(self._snapshot)
+        for group in ("battery", "emergency", "heartbeat"):
+            stamp = snapshot[f"{group}_at"]
+            snapshot[f"{group}_age"] = None if stamp is None else round(now - stamp, 3)
+        return snapshot
+
+    def is_wanted(self):
+        """True while someone reads the telemetry: SSE subscribers or a recent snapshot"""
+        with self._lock:
+            recently_read = time.time() < self._wanted_until
+        return recently_read or event_bus.subscriber_count > 0
+
+    def age(self, group):
+        with self._lock:
+            stamp = self._snapshot[f"{group}_at"]
+        return None if stamp is None else time.time() - stamp
+
+    def refresh_battery(self, timeout):
+        """Ask the robot for battery info now and wait for it (up to timeout)"""
+        msg = self.session.request("request_battery_info", expect="notify_battery_info", timeout=timeout)
+        if msg:
+            self._record(msg)
+        return self.snapshot()
+
+    def refresh_emergency(self, timeout):
+        msg = self.session.request("get_emr_status", expect="notify_emr_status", timeout=timeout)
+        if msg:
+            self._record(msg)
+        return self.snapshot()
+
+    def _record(self, msg):
+        cmd = msg.get("cmd")
+        data = msg.get("data") or {}
+        now = time.time()
+        with self._lock:
+            if cmd == "notify_battery_info":
+                self._snapshot.update(battery=data.get("battery"), charging_status=data.get("status"), battery_at=now)
+            elif cmd == "notify_emr_status":
+                self._snapshot.update(emergency_status=data.get("status", 0), emergency_msg=msg.get("msg", ""), emergency_at=now)
+            elif cmd == "notify_heart_beat":
+                self._snapshot.update(heartbeat_code=msg.get("code"), heartbeat_at=now)
+                if "x" in data and "y" in data:
+                    self._snapshot["pose"] = {"x": data["x"], "y": data["y"], "theta": data.get("theta")}
+        if cmd == "notify_battery_info":
+            event_bus.publish("battery", {"battery": data.get("battery"), "charging": data.get("status")})
+        elif cmd == "notify_emr_status":
+            event_bus.publish("emergency", {"status": data.get("status", 0), "msg": msg.get("msg", "")})
+
+    def _poll(self, cmd):
+        try:
+            self.session.send({"cmd": cmd})
+        except Exception:
+            pass  # The session reconnects on its own; the next tick tries again
+
+    def _run(self):
+        next_emergency_poll = 0
+        next_battery_poll = 0
+        with self.session.subscribe(*TELEMETRY_CMDS) as frames:
+            while not self._stopping.is_set():
+                now = time.time()
+                if self.session.is_connected() and self.is_wanted():
+                    if now >= next_emergency_poll:
+                        next_emergency_poll = now + EMERGENCY_POLL_INTERVAL
+                        self._poll("get_emr_status")
+                    battery_age = self.age("battery")
+                    if (battery_age is None or battery_age > BATTERY_REFRESH_INTERVAL) and now >= next_battery_poll:
+                        next_battery_poll = now + BATTERY_RETRY_INTERVAL
+                        self._poll("request_battery_info")
+                msg = frames.get(timeout=COLLECTOR_TICK)
+                while msg is not None:
+                    self._record(msg)
+                    msg = frames.get(timeout=0)
+
+
+# --- COLLECTOR REGISTRY ---
+_collectors = {}
+_collectors_lock = threading.Lock()
+
+
+def get_collector(ip, port=DEFAULT_WS_PORT):
+    """Return the running telemetry collector for a robot, starting it on first use"""
+    key = (ip, int(port or DEFAULT_WS_PORT))
+    with _collectors_lock:
+        collector = _collectors.get(key)
+        if collector is None or not collector.is_alive():
+            collector = TelemetryCollector(get_session(*key))
+            _collectors[key] = collector
+        return collector
+
+
+def collect_telemetry_metrics():
+    battery = Family("robot_battery_level_percent", "gauge", "Last reported battery level")
+    charging = Family("robot_battery_charging_status", "gauge", "Last reported charging status (0 idle, 1 charging, 2 full)")
+    emergency = Family("robot_emergency_status", "gauge", "Last reported emergency stop status")
+    age = Family("robot_telemetry_age_seconds", "gauge", "Seconds since each telemetry value was received")
+    with _collectors_lock:
+        collectors = list(_collectors.items())
+    for (ip, port), collector in collectors:
+        robot = f"{ip}:{port}"
+        snapshot = collector.snapshot(demand=False)
+        battery.add(snapshot["battery"], robot=robot)
+        charging.add(snapshot["charging_status"], robot=robot)
+        emergency.add(snapshot["emergency_status"], robot=robot)
+        for group in ("battery", "emergency", "heartbeat"):
+            age.add(snapshot[f"{group}_age"], robot=robot, value=group)
+    return [battery, charging, emergency, age]
+
+
+registry.add_collector(collect_telemetry_metrics)
@@ -0,0 +1,102 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# The backend's modules read their file locations from the environment at import
+# time; point them at a scratch directory so tests never touch the real snapshots.
+_SCRATCH = tempfile.mkdtemp(prefix="robot-tests-")
+for _name, _file in (("LOG_FILE", "robot.log"), ("WAYPOINT_CACHE_FILE", "waypoint_cache.json"),
+                     ("MAP_REGISTRY_FILE", "map_registry.json"), ("DISCOVERY_CACHE_FILE", "discovery_cache.json"),
+                     ("MISSION_JOURNAL_FILE", "mission_journal.jsonl")):
+    os.environ.setdefault(_name, os.path.join(_SCRATCH, _file))
+os.environ.setdefault("LOG_CONSOLE", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import execution  # noqa: E402
+from map_registry import map_registry  # noqa: E402
+from mission_journal import mission_journal  # noqa: E402
+from robot_session import close_all_sessions  # noqa: E402
+from robot_simulator import RobotSimulator, demo_maps  # noqa: E402
+from waypoint_cache import waypoint_cache  # noqa: E402
+
+
+PATROL_MAP_IDS = ["sim-map-1", "sim-map-2"]
+
+
+def patrol_maps(count):
+    """demo_maps with a different anchor on every map, so point lists can be told apart"""
+    maps = demo_maps(count, leg_length=1.0)
+    for i in range(1, count + 1):
+        maps[f"sim-map-{i}"]["points"][0]["y"] = float(i)
+        maps[f"sim-map-{i}"]["points"][1]["y"] = float(i)
+    return maps
+
+
+@pytest.fixture
+def engine_state():
+    """Fresh control flags and caches, with nothing written to the backend's files"""
+    waypoint_cache.snapshot_path = None
+    waypoint_cache.invalidate()
+    map_registry.snapshot_path = None
+    mission_journal.path = None
+    execution.reset_navigation_events()
+    execution.forget_loaded_map()
+    execution.forget_last_arrival()
+    yield
+    execution.quit_navigation()
+    close_all_sessions()
+    execution.reset_navigation_events()
+    waypoint_cache.invalidate()
+
+
+@pytest.fixture
+def simulator(engine_state):
+    """A fast robot simulator with two patrol maps and the sim-charge station"""
+    sim = RobotSimulator(port=0, maps=patrol_maps(2), latency=0.01, nav_speed=10, heartbeat_interval=0.1)
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+class EngineRun:
+    """run_multi_map_navigation_with_charging on a thread, recording the status updates it publishes"""
+
+    def __init__(self, monkeypatch, simulator, stop_after_cycles=1, **kwargs):
+        self.steps = []
+        self.legs = []
+        self.result = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        original_update = execution.update_navigation_status
+
+        def record(status, **changes):
+            original_update(status, **changes)
+            with self._changed:
+                if "step" in changes:
+                    self.steps.append(changes["step"])
+                if "current_map" in changes:
+                    self.legs.append(changes["current_map"])
+                self._changed.notify_all()
+            if changes.get("cycle", 0) > stop_after_cycles:
+                execution.quit_navigation()
+
+        monkeypatch.setattr(execution, "update_navigation_status", record)
+        self.thread = threading.Thread(target=lambda: setattr(self, "result", execution.run_multi_map_navigation_with_charging(
+            "127.0.0.1", PATROL_MAP_IDS, "sim-charge", simulator.port, navigation_status={}, **kwargs)), daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def wait_for(self, predicate, timeout=20):
+        with self._changed:
+            assert self._changed.wait_for(lambda: predicate(self), timeout)
+
+    def join(self, timeout=60):
+        self.thread.join(timeout)
+        assert not self.thread.is_alive()
+        return self.result
+
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+import execution
+from engine_control import EngineControl
+
+from conftest import EngineRun
+
+
+@pytest.mark.parametrize("flag", ["quit", "stop"])
+def test_wait_while_paused_ends_on_quit_or_stop(flag):
+    control = EngineControl()
+    control.paused.set()
+    outcome = []
+    waiter = threading.Thread(target=lambda: outcome.append(control.wait_while_paused()))
+    waiter.start()
+    time.sleep(0.1)
+    assert waiter.is_alive()
+    getattr(control, flag).set()
+    waiter.join(1)
+    assert outcome == [False]
+
+
+def test_pause_resume_and_quit(monkeypatch, simulator):
+    simulator.nav_speed = 1  # Legs long enough to pause in the middle of one
+    execution.pause_navigation()
+    run = EngineRun(monkeypatch, simulator, stop_after_cycles=99).start()
+    run.wait_for(lambda r: "paused" in r.steps)
+    time.sleep(0.3)
+    assert run.legs == []  # Nothing moves while paused
+
+    execution.continue_navigation()
+    run.wait_for(lambda r: r.steps[-1] == "navigating")
+
+    # A pause mid-leg stops the robot where it is; the leg carries on after the resume
+    execution.pause_navigation()
+    deadline = time.time() + 5
+    while not simulator.received["request_stop_navigation"] and time.time() < deadline:
+        time.sleep(0.05)
+    assert simulator.received["request_stop_navigation"]
+    time.sleep(0.3)
+    assert run.legs == ["sim-map-1"] and run.steps[-1] == "navigating"
+
+    execution.continue_navigation()
+    run.wait_for(lambda r: len(r.legs) >= 2)
+
+    execution.quit_navigation()
+    assert run.join(10)["message"] == "Navigation quit requested"
+    assert run.steps[-1] == "done"
@@ -0,0 +1,63 @@
+import json
+
+from mission_journal import MissionJournal, fold, resume_position
+
+from conftest import PATROL_MAP_IDS, EngineRun
+
+MAP_IDS = ["a", "b", "c"]
+
+
+def journaled(*records):
+    state = fold({}, {"event": "mission_started", "mission_id": "m", "map_ids": MAP_IDS, "charge_map_id": "charge"})
+    for record in records:
+        fold(state, {"mission_id": "m", **record})
+    return state
+
+
+def leg(cycle, phase, index, success):
+    return {"event": "leg_completed", "cycle": cycle, "phase": phase, "map_index": index, "map_id": MAP_IDS[index], "success": success}
+
+
+def test_fresh_mission_starts_at_the_first_leg():
+    assert resume_position(journaled()) == (1, "forward", 0)
+
+
+def test_resume_after_a_completed_leg_moves_on():
+    assert resume_position(journaled(leg(1, "forward", 0, True))) == (1, "forward", 1)
+    assert resume_position(journaled(leg(1, "forward", 2, True))) == (1, "reverse", 0)
+
+
+def test_resume_after_a_failed_leg_runs_it_again():
+    state = journaled(leg(1, "forward", 0, True), {"event": "leg_started", "phase": "forward", "map_index": 1}, leg(1, "forward", 1, False))
+    assert resume_position(state) == (1, "forward", 1)
+
+
+def test_resume_after_the_last_leg_runs_the_end_charge():
+    assert resume_position(journaled(leg(1, "reverse", 2, True))) == (1, "end_charge", None)
+    assert resume_position(journaled(leg(1, "reverse", 2, True), {"event": "phase", "phase": "end_charge"})) == (1, "end_charge", None)
+    assert resume_position(journaled(leg(1, "reverse", 2, True), {"event": "cycle_completed", "cycle": 1})) == (2, "forward", 0)
+
+
+def test_load_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = MissionJournal(str(path))
+    journal.begin("m", "127.0.0.1", 5000, MAP_IDS, "charge")
+    journal.record("m", "leg_completed", cycle=1, phase="forward", map_index=0, map_id="a", success=True)
+    journal.sync()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"event": "leg_completed", "mission_id": "m"})[:20])
+
+    pending = MissionJournal(str(path)).resumable()
+    assert pending["mission_id"] == "m"
+    assert resume_position(pending) == (1, "forward", 1)
+
+
+def test_resume_reruns_the_failed_leg(monkeypatch, simulator):
+    # The journal says forward leg 2 of cycle 1 failed after leg 1 succeeded
+    resume = {
+        "mission_id": "resumed", "map_ids": PATROL_MAP_IDS, "charge_map_id": "sim-charge", "cycle": 1, "phase": "forward",
+        "map_index": 1, "last_leg": {"cycle": 1, "phase": "forward", "map_index": 1, "map_id": "sim-map-2", "success": False},
+    }
+    run = EngineRun(monkeypatch, simulator, resume=resume).start()
+    assert run.join()["message"] == "Navigation quit requested"
+    assert run.legs == ["sim-map-2", "sim-map-2", "sim-map-1"]
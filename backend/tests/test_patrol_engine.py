@@ -0,0 +1,10 @@
+from conftest import EngineRun
+
+
+def test_cycle_runs_every_map_forward_then_in_reverse(monkeypatch, simulator):
+    run = EngineRun(monkeypatch, simulator).start()
+    assert run.join()["message"] == "Navigation quit requested"
+    assert run.legs == ["sim-map-1", "sim-map-2", "sim-map-2", "sim-map-1"]
+    leg = ["switching_map", "relocating", "navigating"]
+    assert run.steps[:2 + 4 * len(leg) + 2] == ["idle", "charging"] + 4 * leg + ["charging", "idle"]
+    assert run.steps[-1] == "done"
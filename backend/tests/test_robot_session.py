@@ -0,0 +1,67 @@
+import threading
+import time
+
+import execution
+from robot_session import RobotSession
+from robot_simulator import RobotSimulator
+
+from conftest import patrol_maps
+
+
+def points_of(sim, map_id):
+    return sim.maps[map_id]["points"]
+
+
+def test_concurrent_point_queries_get_their_own_map(engine_state):
+    # Jitter lets the robot answer point list queries out of order, and the
+    # replies do not name their map: only one query may be in flight at a time
+    sim = RobotSimulator(port=0, maps=patrol_maps(4), latency=0.01, jitter=0.05, seed=1)
+    sim.start()
+    session = RobotSession("127.0.0.1", sim.port)
+    try:
+        assert session.wait_connected(5)
+        map_ids = [f"sim-map-{i}" for i in range(1, 5)] * 5
+        results = [None] * len(map_ids)
+
+        def query(i):
+            results[i] = execution.request_points(session, map_ids[i]).result(timeout=10)
+
+        threads = [threading.Thread(target=query, args=(i,)) for i in range(len(map_ids))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(15)
+        for map_id, reply in zip(map_ids, results):
+            assert reply["data"]["points"] == points_of(sim, map_id)
+    finally:
+        session.close()
+        sim.stop()
+
+
+def test_concurrent_calls_to_different_replies_resolve_independently(simulator):
+    session = RobotSession("127.0.0.1", simulator.port)
+    try:
+        assert session.wait_connected(5)
+        futures = {cmd: session.call(f"request_{cmd}", data, expect=f"response_{cmd}")
+                   for cmd, data in (("map_list", None), ("set_map", {"mapId": "sim-map-1"}), ("point_list", {"mapId": "sim-map-2"}))}
+        assert {m["mapId"] for m in futures["map_list"].result(5)["data"]["mapList"]} == set(simulator.maps)
+        assert futures["set_map"].result(5)["code"] == 1000
+        assert futures["point_list"].result(5)["data"]["points"] == points_of(simulator, "sim-map-2")
+    finally:
+        session.close()
+
+
+
+def test_rejected_map_switch_and_relocation_fail_fast(simulator):
+    session = RobotSession("127.0.0.1", simulator.port)
+    try:
+        assert session.wait_connected(5)
+        started = time.time()
+        # No map loaded yet, so the robot refuses to relocate (code 4002)
+        assert not execution.relocate(session, 0.0, 0.0, 0.0)
+        assert not execution.set_map(session, "missing", "no-such-map")  # code 1001
+        assert time.time() - started < 2
+        assert execution.set_map(session, "map1", "sim-map-1")
+        assert execution.relocate(session, 0.0, 1.0, 0.0)
+    finally:
+        session.close()
@@ -0,0 +1,28 @@
+import time
+
+import telemetry
+from robot_session import RobotSession
+
+
+def test_robot_is_only_queried_while_telemetry_is_read(monkeypatch, simulator):
+    monkeypatch.setattr(telemetry, "EMERGENCY_POLL_INTERVAL", 0.1)
+    monkeypatch.setattr(telemetry, "TELEMETRY_DEMAND_WINDOW", 0.5)
+    session = RobotSession("127.0.0.1", simulator.port)
+    collector = telemetry.TelemetryCollector(session)
+    try:
+        assert session.wait_connected(5)
+        time.sleep(0.5)
+        assert simulator.received["get_emr_status"] == 0  # Nobody reading yet
+
+        collector.snapshot()
+        time.sleep(0.4)
+        assert simulator.received["get_emr_status"] >= 2
+        assert collector.snapshot(demand=False)["emergency_status"] == 0
+
+        time.sleep(0.5)  # The demand window has run out
+        polled = simulator.received["get_emr_status"]
+        time.sleep(0.5)
+        assert simulator.received["get_emr_status"] == polled
+    finally:
+        collector.stop()
+        session.close()
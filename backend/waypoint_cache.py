@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cache_support import SingleFlight, save_json_snapshot
+from robot_logging import get_logger
+
+log = get_logger("waypoints")
+
+# --- WAYPOINT CACHE CONFIGURATION ---
+WAYPOINT_CACHE_TTL = int(os.getenv("WAYPOINT_CACHE_TTL", "600"))  # Seconds before a map's points are refreshed
+WAYPOINT_CACHE_FILE = os.getenv(
+    "WAYPOINT_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "waypoint_cache.json")
+)
+
+
+def content_hash(value):
+    """Short stable digest of JSON-serialisable content, used to version cached maps and points"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class WaypointCache:
+    """Point lists keyed by map id, shared by every navigation run.
+
+    Anchor/destination/charge points almost never change, so the engine reads
+    them from here and only asks the robot on a miss. Entries older than the
+    TTL are still served while a background refresh replaces them. The cache is
+    snapshotted to disk so a restart does not have to re-fetch every map.
+    """
+
+    def __init__(self, ttl=WAYPOINT_CACHE_TTL, snapshot_path=WAYPOINT_CACHE_FILE):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self._entries = {}  # map_id -> {"points": [...], "hash": content_hash(points), "fetched_at": epoch seconds}
+        self._lock = threading.Lock()
+        self._refreshes = SingleFlight("waypoint-refresh")
+
+        # Cache statistics
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        self.load()
+
+    def get(self, map_id):
+        """Return (points, age_seconds) for a cached map, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(map_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(entry["points"]), time.time() - entry["fetched_at"]
+
+    def is_fresh(self, map_id):
+        with self._lock:
+            entry = self._entries.get(map_id)
+            return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def put(self, map_id, points):
+        """Store a map's points; returns True when they differ from the cached version"""
+        if not points:
+            return False
+        points_hash = content_hash(points)
+        with self._lock:
+            previous = self._entries.get(map_id)
+            self._entries[map_id] = {"points": list(points), "hash": points_hash, "fetched_at": time.time()}
+        self.save()
+        return previous is None or previous.get("hash") != points_hash
+
+    def version(self, map_id):
+        """Content hash of a map's cached points, or None when not cached"""
+        with self._lock:
+            entry = self._entries.get(map_id)
+            return entry["hash"] if entry else None
+
+    def invalidate(self, map_id=None):
+        """Forget one map's points, or every map's when map_id is None"""
+        with self._lock:
+            if map_id is None:
+                count = len(self._entries)
+                self._entries.clear()
+            else:
+                count = 1 if self._entries.pop(map_id, None) is not None else 0
+        if count:
+            log.info(f"🗑 [WAYPOINTS] Invalidated {count} cached map(s)")
+            self.save()
+        return count
+
+    def refresh_async(self, map_id, fetch):
+        """Re-fetch a map's points on a daemon thread; fetch() returns the point list.
+
+        At most one refresh per map runs at a time. A failed refresh keeps the
+        existing entry so navigation can carry on with the last known points.
+        """
+        def refresh():
+            try:
+                points = fetch()
+                if points:
+                    changed = self.put(map_id, points)
+                    self.refreshes += 1
+                    log.info(f"🔄 [WAYPOINTS] Refreshed {len(points)} points for map {map_id}{'' if changed else ' (unchanged)'}")
+                else:
+                    self.refresh_failures += 1
+            except Exception as e:
+                self.refresh_failures += 1
+                log.warning(f"⚠️ [WAYPOINTS] Background refresh failed for map {map_id}: {e}")
+
+        return self._refreshes.start(map_id, refresh)
+
+    def load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            entries = {
+                map_id: entry for map_id, entry in snapshot.get("maps", {}).items()
+                if isinstance(entry, dict) and entry.get("points") and "fetched_at" in entry
+            }
+            for entry in entries.values():
+                entry.setdefault("hash", content_hash(entry["points"]))  # Snapshots from before versioning
+            with self._lock:
+                self._entries.update(entries)
+            log.info(f"🗺 [WAYPOINTS] Loaded {len(entries)} cached map(s) from {self.snapshot_path}")
+        except Exception as e:
+            log.warning(f"⚠️ [WAYPOINTS] Ignoring unreadable cache snapshot: {e}")
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+        def snapshot():
+            with self._lock:
+                return {"maps": dict(self._entries)}
+
+        try:
+            save_json_snapshot(self.snapshot_path, snapshot)
+        except Exception as e:
+            log.warning(f"⚠️ [WAYPOINTS] Could not write cache snapshot: {e}")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            maps = {
+                map_id: {"points": len(entry["points"]), "hash": entry["hash"], "age": round(now - entry["fetched_at"], 1)}
+                for map_id, entry in self._entries.items()
+            }
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "maps": maps,
+        }
+
+
+waypoint_cache = WaypointCache()
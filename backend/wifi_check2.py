@@ -4,8 +4,14 @@ import subprocess
 import platform
 import requests
 import json
+import logging
+import sys
 import time
 
+from robot_logging import get_logger
+
+log = get_logger("wifi")
+
 ROBOT_PORT = 5000
 SUBNET_PREFIX = "192.168.0."
 found_ip = None
@@ -145,7 +151,7 @@ def get_device_wifi_info():
 
 def test_robot_connection(robot_ip):
     """Test various connection methods to the robot"""
-    print(f"🔍 Testing robot connection methods for {robot_ip}...")
+    log.debug(f"🔍 Testing robot connection methods for {robot_ip}...")
     
     # Test common ports
     common_ports = [5000, 8080, 80, 443, 3000, 8000, 9090, 22, 23]
@@ -156,20 +162,20 @@ def test_robot_connection(robot_ip):
             sock = socket.create_connection((robot_ip, port), timeout=1)
             sock.close()
             open_ports.append(port)
-            print(f"   ✅ Port {port} is open")
+            log.debug(f"   ✅ Port {port} is open")
         except:
             pass
     
     if open_ports:
-        print(f"   Open ports found: {open_ports}")
+        log.debug(f"   Open ports found: {open_ports}")
     else:
-        print("   No common ports found open")
+        log.debug("   No common ports found open")
     
     return open_ports
 
 def get_robot_wifi_info(robot_ip):
     """Enhanced robot WiFi information retrieval"""
-    print(f"🔍 Attempting to get WiFi info from robot at {robot_ip}...")
+    log.debug(f"🔍 Attempting to get WiFi info from robot at {robot_ip}...")
     
     # First, test what ports are available
     open_ports = test_robot_connection(robot_ip)
@@ -195,18 +201,18 @@ def get_robot_wifi_info(robot_ip):
     ]
     
     for port in http_ports:
-        print(f"   🔍 Trying port {port}...")
+        log.debug(f"   🔍 Trying port {port}...")
         for endpoint in api_endpoints:
             try:
                 url = f"http://{robot_ip}:{port}{endpoint}"
-                print(f"      Testing: {url}")
+                log.debug(f"      Testing: {url}")
                 response = requests.get(url, timeout=2)
-                print(f"      Status: {response.status_code}")
+                log.debug(f"      Status: {response.status_code}")
                 
                 if response.status_code == 200:
                     try:
                         data = response.json()
-                        print(f"      Response: {json.dumps(data, indent=2)[:200]}...")
+                        log.debug(f"      Response: {json.dumps(data, indent=2)[:200]}...")
                         
                         # Try to extract WiFi info from response
                         ssid = (data.get('wifi_ssid') or 
@@ -220,35 +226,35 @@ def get_robot_wifi_info(robot_ip):
                              data.get('network', {}).get('ip') if isinstance(data.get('network'), dict) else None)
                         
                         if ssid:
-                            print(f"      ✅ Found WiFi SSID: {ssid}")
+                            log.info(f"      ✅ Found WiFi SSID: {ssid}")
                             return ssid, ip or robot_ip
                             
                     except json.JSONDecodeError:
                         # Try to parse as plain text
                         text = response.text
-                        print(f"      Response (text): {text[:200]}...")
+                        log.debug(f"      Response (text): {text[:200]}...")
                         # Look for common patterns in text responses
                         if 'ssid' in text.lower() or 'wifi' in text.lower():
-                            print(f"      ⚠️ Found text response with WiFi info, but couldn't parse")
+                            log.debug(f"      ⚠️ Found text response with WiFi info, but couldn't parse")
                         
             except requests.exceptions.RequestException as e:
-                print(f"      ❌ Request failed: {e}")
+                log.debug(f"      ❌ Request failed: {e}")
                 continue
             except Exception as e:
-                print(f"      ❌ Unexpected error: {e}")
+                log.debug(f"      ❌ Unexpected error: {e}")
                 continue
     
     # Try simple TCP connection to get basic info
     try:
-        print(f"   🔍 Trying simple TCP connection...")
+        log.debug(f"   🔍 Trying simple TCP connection...")
         sock = socket.create_connection((robot_ip, 5000), timeout=2)
         sock.send(b"GET /info HTTP/1.1\r\nHost: " + robot_ip.encode() + b"\r\n\r\n")
         response = sock.recv(1024).decode('utf-8', errors='ignore')
         sock.close()
         if response:
-            print(f"      Raw response: {response[:200]}...")
+            log.debug(f"      Raw response: {response[:200]}...")
     except Exception as e:
-        print(f"      TCP connection failed: {e}")
+        log.debug(f"      TCP connection failed: {e}")
     
     return None, robot_ip
 
@@ -353,4 +359,10 @@ def main():
         print("   4. Try scanning a different IP range if needed")
 
 if __name__ == "__main__":
+    # As a standalone tool the probe diagnostics are its output: print them
+    # straight to stdout, in order with the report, instead of the backend log
+    console = logging.StreamHandler(sys.stdout)
+    log.addHandler(console)
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
     main()
\ No newline at end of file
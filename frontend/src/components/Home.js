@@ -449,8 +449,8 @@ function Home() {
         }
     };
     
+    // Initial emergency status; later changes arrive on the event stream
     useEffect(() => {
-    let interval = null;
     const fetchEmergencyStatus = async () => {
         try {
             const res = await fetch(`${API_BASE_URL}/robot/emergency_status`);
@@ -465,9 +465,36 @@ function Home() {
         }
     };
     fetchEmergencyStatus();
-    interval = setInterval(fetchEmergencyStatus, 2000); // poll every 3 seconds
-    return () => clearInterval(interval);
 }, []);
+
+    // Live telemetry pushed by the backend replaces the battery, emergency and map polling
+    useEffect(() => {
+        const source = new EventSource(`${API_BASE_URL}/robot/events`);
+        const parse = (event) => JSON.parse(event.data);
+        source.addEventListener('battery', (event) => {
+            const data = parse(event);
+            setBatteryStatus({ loading: false, battery: data.battery, charging: data.charging, error: null });
+        });
+        source.addEventListener('emergency', (event) => {
+            const data = parse(event);
+            setEmergencyStatus({ loading: false, status: data.status, error: null });
+        });
+        source.addEventListener('map_tracking', (event) => {
+            const data = parse(event);
+            setCurrentMapInfo({
+                loading: false,
+                currentMapId: data.current_map_id,
+                currentMapName: data.current_map_name,
+                upcomingMapId1: data.upcoming_map_id_1,
+                upcomingMapName1: data.upcoming_map_name_1,
+                upcomingMapId2: data.upcoming_map_id_2,
+                upcomingMapName2: data.upcoming_map_name_2,
+                error: null
+            });
+        });
+        // EventSource reconnects on its own after errors
+        return () => source.close();
+    }, []);
     // Fetch network status once on mount; no auto-refresh
     useEffect(() => {
         fetchNetworkStatus();
@@ -480,21 +507,17 @@ function Home() {
         }
     }, [networkStatus.connected]);
 
-    // Fetch battery status when robotStatus changes or every 30s if robot is found
+    // Fetch battery status once when the robot is found; updates then arrive on the event stream
     useEffect(() => {
         if (robotStatus.found) {
             fetchBatteryStatus();
-            const interval = setInterval(fetchBatteryStatus, 30000);
-            return () => clearInterval(interval);
         }
     }, [robotStatus.found, robotStatus.ip]);
 
-    // Fetch current map info when navigation is active
+    // Fetch current map info when navigation starts; updates then arrive on the event stream
     useEffect(() => {
         if (robotStatus.connected && isbutton) {
             fetchCurrentMapInfo();
-            const interval = setInterval(fetchCurrentMapInfo, 2000); // Update every 2 seconds
-            return () => clearInterval(interval);
         } else {
             // Clear map info when not navigating
             setCurrentMapInfo({